@@ -0,0 +1,263 @@
+"""Hooks that observe a MemoryManager read by read.
+
+A memory manager with hooks calls them on every hit, fault and eviction, so a policy can be
+inspected without editing its class. While no hooks are set the policies replay batches with
+their own tight loops and the hooks cost nothing. Setting hooks makes read_pages fall back to
+one read_page call per read, which gives the same results more slowly.
+
+EvictionAgeHistogram shows how long victims stayed in memory, and PhaseTimer times the policy
+code of hits, faults and evictions. profile_sampled runs cProfile over a sample of a replay to
+find the hot spots of the simulator itself, on the fast path.
+
+    python access_hooks.py postgres_trace_tpch --policy LIRS --buffer-size 1000
+
+from src/ prints all three for a workload or trace file.
+"""
+import argparse
+import cProfile
+import pstats
+import time
+from typing import Iterable
+
+
+class AccessHooks:
+    """Callbacks for the reads of a MemoryManager. Subclasses override the events they need,
+    the others do nothing. Reads are numbered from 1, as in a FaultLog."""
+
+    def on_hit(self, read_number: int, page_number: int):
+        """Called when a read finds its page in memory"""
+
+    def on_fault(self, read_number: int, page_number: int):
+        """Called when a read faults, once the page is in memory and after any eviction"""
+
+    def on_evict(self, read_number: int, victim: int, age: int | None):
+        """Called when a fault evicts a page
+
+        :param read_number: The read that faulted
+        :type read_number: int
+        :param victim: The page evicted
+        :type victim: int
+        :param age: Reads since the victim was loaded, None if it was loaded before the hooks
+            were set
+        :type age: int | None
+        """
+
+
+class HookList(AccessHooks):
+    """Passes every event on to several hooks, in order"""
+
+    def __init__(self, hooks: Iterable[AccessHooks] = ()):
+        self.hooks = list(hooks)
+
+    def on_hit(self, read_number: int, page_number: int):
+        for hooks in self.hooks:
+            hooks.on_hit(read_number, page_number)
+
+    def on_fault(self, read_number: int, page_number: int):
+        for hooks in self.hooks:
+            hooks.on_fault(read_number, page_number)
+
+    def on_evict(self, read_number: int, victim: int, age: int | None):
+        for hooks in self.hooks:
+            hooks.on_evict(read_number, victim, age)
+
+
+def add_hooks(memory_manager, hooks: AccessHooks):
+    """Adds hooks to a memory manager, alongside any it already has
+
+    :param memory_manager: The memory manager to observe
+    :type memory_manager: MemoryManager
+    :param hooks: The hooks to add
+    :type hooks: AccessHooks
+    """
+    if memory_manager.hooks is None:
+        memory_manager.hooks = hooks
+    elif isinstance(memory_manager.hooks, HookList):
+        memory_manager.hooks.hooks.append(hooks)
+    else:
+        memory_manager.hooks = HookList([memory_manager.hooks, hooks])
+
+
+class EvictionAgeHistogram(AccessHooks):
+    """Counts evictions by how many reads the victim stayed in memory, in power of two buckets.
+
+    Bucket i holds ages from 2**i up to 2**(i + 1) - 1. Many victims evicted young mean the
+    policy keeps throwing out pages it has only just loaded, as LRU does under a scan.
+    """
+
+    def __init__(self):
+        self.counts: list[int] = []
+        # Victims loaded before the hooks were set
+        self.unknown_age: int = 0
+
+    def on_evict(self, read_number: int, victim: int, age: int | None):
+        if age is None:
+            self.unknown_age += 1
+            return
+
+        bucket = age.bit_length() - 1
+        if bucket >= len(self.counts):
+            self.counts.extend([0] * (bucket + 1 - len(self.counts)))
+        self.counts[bucket] += 1
+
+    @property
+    def evictions(self) -> int:
+        return sum(self.counts) + self.unknown_age
+
+    def histogram(self) -> dict[int, int]:
+        """The evictions of every non-empty bucket, keyed by the smallest age in the bucket"""
+        return {1 << bucket: count for bucket, count in enumerate(self.counts) if count}
+
+
+# Phases of the policy code that PhaseTimer times
+PHASES = ("hit", "fault", "evict")
+
+
+class PhaseTimer(AccessHooks):
+    """Times the policy code of the hits, faults and evictions of a memory manager.
+
+    attach wraps the manager's read_page and _evict_page with timers, so no policy has to be
+    edited. The time of a fault leaves out the eviction it caused. The timers themselves cost
+    some time per read, so compare the phases with each other rather than with untimed runs.
+    """
+
+    def __init__(self):
+        self.seconds: dict[str, float] = dict.fromkeys(PHASES, 0.0)
+        self.counts: dict[str, int] = dict.fromkeys(PHASES, 0)
+
+    def attach(self, memory_manager):
+        """Starts timing a memory manager
+
+        :param memory_manager: The memory manager to time
+        :type memory_manager: MemoryManager
+        """
+        # Reads must go through read_page to be timed
+        add_hooks(memory_manager, self)
+
+        read_page = memory_manager.read_page
+        evict_page = memory_manager._evict_page
+        seconds = self.seconds
+        counts = self.counts
+        perf_counter = time.perf_counter
+
+        def timed_evict_page() -> int:
+            start = perf_counter()
+            victim = evict_page()
+            seconds["evict"] += perf_counter() - start
+            counts["evict"] += 1
+            return victim
+
+        def timed_read_page(page_number: int) -> bool:
+            evict_seconds = seconds["evict"]
+            start = perf_counter()
+            page_fault = read_page(page_number)
+            elapsed = perf_counter() - start
+            if page_fault:
+                seconds["fault"] += elapsed - (seconds["evict"] - evict_seconds)
+                counts["fault"] += 1
+            else:
+                seconds["hit"] += elapsed
+                counts["hit"] += 1
+            return page_fault
+
+        # Instance attributes take precedence over the class's methods, including the
+        # self._evict_page() call in MemoryManager.read_page
+        memory_manager.read_page = timed_read_page
+        memory_manager._evict_page = timed_evict_page
+
+    def mean_seconds(self) -> dict[str, float]:
+        """The mean time of each phase"""
+        return {
+            phase: self.seconds[phase] / self.counts[phase] if self.counts[phase] else 0.0
+            for phase in PHASES
+        }
+
+
+def profile_sampled(memory_manager, page_accesses: Iterable[int], every: int = 10) -> pstats.Stats:
+    """Replays a trace with cProfile enabled for one chunk in every `every`.
+
+    Profiling every read would slow the whole replay down several times over. Sampling chunks
+    profiles the policy's usual fast path, while most of the trace runs at full speed.
+
+    :param memory_manager: The memory manager to replay the trace through
+    :type memory_manager: MemoryManager
+    :param page_accesses: The pages to read. TraceStreams are sampled a chunk at a time,
+        anything else is a single chunk and always profiled.
+    :type page_accesses: Iterable[int]
+    :param every: Profile the first chunk and then every this many chunks
+    :type every: int
+    :return: The profile of the sampled chunks
+    :rtype: pstats.Stats
+    """
+    if every < 1:
+        raise ValueError("every must be at least 1")
+
+    chunks = page_accesses.chunks() if hasattr(page_accesses, "chunks") else [page_accesses]
+    profiler = cProfile.Profile()
+    profiled = False
+    for index, chunk in enumerate(chunks):
+        if index % every:
+            memory_manager.read_pages(chunk)
+        else:
+            profiler.runcall(memory_manager.read_pages, chunk)
+            profiled = True
+
+    if not profiled:
+        raise ValueError("The trace is empty, there is nothing to profile")
+    return pstats.Stats(profiler)
+
+
+def main():
+    # Only the command line needs numpy and the traces
+    import numpy as np
+
+    from experiment import add_policy_arguments, policy_from_args
+    from memory_manager import BeladyMemoryManager
+    from page_access_generators import WorkloadType
+    from trace_stream import ArrayTraceStream, FileTraceStream, workload_trace_stream
+
+    parser = argparse.ArgumentParser(description="Eviction ages, phase timings and a profile of a policy")
+    parser.add_argument("trace", help="A workload name, such as postgres_trace_tpch, or a trace file")
+    add_policy_arguments(parser)
+    parser.add_argument("--buffer-size", type=int, default=1000, help="Pages that fit in memory")
+    parser.add_argument("--total-page-count", type=int, default=10000, help="Pages synthetic workloads access")
+    parser.add_argument("--total-reads", type=int, default=1000000, help="Reads of synthetic workloads")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for synthetic workloads")
+    parser.add_argument("--profile-every", type=int, default=10, help="Profile one chunk in this many")
+    parser.add_argument("--top", type=int, default=15, help="How many functions of the profile to list")
+    args = parser.parse_args()
+
+    if args.trace in WorkloadType.__members__:
+        stream = workload_trace_stream(WorkloadType[args.trace], args.total_page_count, args.total_reads, args.seed)
+    else:
+        stream = FileTraceStream(args.trace)
+    page_accesses = np.concatenate(list(stream.chunks()))
+    disk_page_count = int(page_accesses.max()) + 1 if len(page_accesses) else 0
+
+    memory_manager, kargs = policy_from_args(parser, args)
+    if issubclass(memory_manager, BeladyMemoryManager):
+        kargs = {**kargs, "page_accesses": page_accesses}
+
+    ages = EvictionAgeHistogram()
+    timer = PhaseTimer()
+    m = memory_manager(args.buffer_size, disk_page_count, hooks=ages, **kargs)
+    timer.attach(m)
+    m.run(ArrayTraceStream(page_accesses))
+
+    print(f"{m.total_reads:,} reads, {m.total_page_faults:,} faults, {ages.evictions:,} evictions")
+    print("Victim age (reads)   evictions")
+    for age, count in ages.histogram().items():
+        print(f"{age:>10,}-{2 * age - 1:<10,} {count:>10,}")
+    for phase, mean_seconds in timer.mean_seconds().items():
+        print(f"{phase:<6} {timer.counts[phase]:>12,} x {mean_seconds * 1e9:>8.0f}ns")
+
+    stats = profile_sampled(
+        memory_manager(args.buffer_size, disk_page_count, **kargs),
+        ArrayTraceStream(page_accesses),
+        args.profile_every,
+    )
+    stats.sort_stats("tottime").print_stats(args.top)
+
+
+if __name__ == "__main__":
+    main()
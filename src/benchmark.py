@@ -0,0 +1,288 @@
+"""Benchmarks of simulator throughput and memory per policy.
+
+Every (workload, buffer size, policy) cell is replayed in a fresh worker process, one at a
+time, so timings do not compete for the CPU and peak RSS belongs to that cell alone. Results
+are written as JSON and can be compared against a stored baseline, for example
+
+    python benchmark.py --output benchmark.json
+    python benchmark.py --baseline benchmark.json
+
+from src/, which exits with status 1 if any cell got slower or bigger than the tolerance.
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from experiment import policy_config
+from memory_manager import BeladyMemoryManager
+from page_access_generators import SYNTHETIC_WORKLOADS, WorkloadType
+from sweep import PolicyConfig
+from trace_stream import ArrayTraceStream, workload_trace_stream
+
+# One configuration of every policy in experiment.POLICY_CLASSES, named as the columns of the
+# default experiment
+BENCHMARK_POLICIES: list[PolicyConfig] = [
+    policy_config("Random"),
+    policy_config("FIFO"),
+    policy_config("LRU"),
+    policy_config("MRU"),
+    policy_config("LFU"),
+    policy_config("LRU-K", {"k": 2, "c_ref_period": 20}, "LRU2-20"),
+    policy_config("CLOCK"),
+    policy_config("ClockSweep"),
+    policy_config("2Q"),
+    policy_config("ARC"),
+    policy_config("LIRS"),
+    policy_config("OPT"),
+    policy_config("Hierarchy", {"lower_memory_page_count": 1000}, "ClockSweep/LRU"),
+]
+
+BENCHMARK_WORKLOADS = [WorkloadType.random, WorkloadType.zipfian, WorkloadType.loop_scan_random]
+BENCHMARK_BUFFER_SIZES = [100, 1000]
+
+# Synthetic workloads are seeded so every run replays the same reads
+BENCHMARK_SEED = 0
+
+
+def load_workload(workload: WorkloadType, total_page_count: int, total_reads: int) -> np.ndarray:
+    """The reads of a benchmark workload. Traces are cut short after total_reads."""
+    stream = workload_trace_stream(workload, total_page_count, total_reads, seed=BENCHMARK_SEED)
+    stream.max_reads = total_reads
+    return np.concatenate(list(stream.chunks()))
+
+
+def _max_rss_bytes() -> int | None:
+    try:
+        import resource
+    except ImportError:
+        # Not available on Windows
+        return None
+
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def benchmark_cell(
+    page_accesses: np.ndarray, memory_manager, kargs: dict, buffer_size: int, repeat: int = 3
+) -> dict:
+    """Times replaying a trace through one policy and measures the memory it allocates.
+
+    The replay is timed repeat times and the fastest is kept. It is then run once more under
+    tracemalloc, which slows Python down too much to time at the same run.
+
+    :param page_accesses: The pages read, in order
+    :type page_accesses: numpy.ndarray
+    :param memory_manager: The memory manager class to benchmark
+    :type memory_manager: type[MemoryManager]
+    :param kargs: Keyword arguments for the memory manager
+    :type kargs: dict
+    :param buffer_size: The number of pages that fit in memory
+    :type buffer_size: int
+    :param repeat: How many times the replay is timed
+    :type repeat: int
+    :return: The reads, the fastest time in seconds, reads per second, the fault rate and
+        the peak bytes allocated by the memory manager
+    :rtype: dict
+    """
+    disk_page_count = int(page_accesses.max()) + 1 if len(page_accesses) else 0
+    if issubclass(memory_manager, BeladyMemoryManager):
+        kargs = {**kargs, "page_accesses": page_accesses}
+
+    def replay():
+        m = memory_manager(buffer_size, disk_page_count, **kargs)
+        m.run(ArrayTraceStream(page_accesses))
+        return m
+
+    seconds = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        m = replay()
+        seconds = min(seconds, time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        replay()
+        _, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "reads": m.total_reads,
+        "seconds": seconds,
+        "reads_per_second": m.total_reads / seconds if seconds else float("inf"),
+        "fault_rate": m.total_page_faults / m.total_reads if m.total_reads else 0.0,
+        "tracemalloc_peak_bytes": peak_bytes,
+    }
+
+
+def _benchmark_in_worker(
+    workload: WorkloadType,
+    total_page_count: int,
+    total_reads: int,
+    memory_manager,
+    kargs: dict,
+    buffer_size: int,
+    repeat: int,
+) -> dict:
+    result = benchmark_cell(
+        load_workload(workload, total_page_count, total_reads), memory_manager, kargs, buffer_size, repeat
+    )
+    result["max_rss_bytes"] = _max_rss_bytes()
+    return result
+
+
+def run_benchmarks(
+    workloads: list[WorkloadType],
+    buffer_sizes: list[int],
+    policies: list[PolicyConfig],
+    total_page_count: int = 10000,
+    total_reads: int = 200000,
+    repeat: int = 3,
+) -> dict:
+    """Benchmarks every (workload, buffer size, policy) cell, each in a fresh process
+
+    :param workloads: The workloads to replay
+    :type workloads: list[WorkloadType]
+    :param buffer_sizes: The buffer sizes to replay, in pages
+    :type buffer_sizes: list[int]
+    :param policies: The policies to benchmark, as (memory manager class, kwargs, name)
+    :type policies: list[PolicyConfig]
+    :param total_page_count: The number of pages synthetic workloads access
+    :type total_page_count: int
+    :param total_reads: The number of reads of each workload
+    :type total_reads: int
+    :param repeat: How many times each replay is timed
+    :type repeat: int
+    :return: The environment the benchmarks ran in and a result per cell
+    :rtype: dict
+    """
+    results = []
+    with ProcessPoolExecutor(max_workers=1, max_tasks_per_child=1) as executor:
+        for workload in workloads:
+            for buffer_size in buffer_sizes:
+                for memory_manager, kargs, name in policies:
+                    result = executor.submit(
+                        _benchmark_in_worker,
+                        workload,
+                        total_page_count,
+                        total_reads,
+                        memory_manager,
+                        kargs,
+                        buffer_size,
+                        repeat,
+                    ).result()
+                    print(
+                        f"{workload.name} buffer size {buffer_size} {name}: "
+                        f"{result['reads_per_second']:,.0f} reads/s, "
+                        f"{result['tracemalloc_peak_bytes'] / 2**20:.1f} MiB allocated"
+                    )
+                    results.append(
+                        {"workload": workload.name, "buffer_size": buffer_size, "policy": name, **result}
+                    )
+
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "machine": platform.machine(),
+            "total_page_count": total_page_count,
+            "total_reads": total_reads,
+        },
+        "results": results,
+    }
+
+
+def compare_results(results: dict, baseline: dict, tolerance: float = 0.2) -> list[str]:
+    """Cells that got slower or allocate more than the baseline by more than the tolerance
+
+    :param results: Benchmark results from run_benchmarks
+    :type results: dict
+    :param baseline: Earlier benchmark results to compare against
+    :type baseline: dict
+    :param tolerance: The fraction a cell may regress by before it is reported
+    :type tolerance: float
+    :return: A description of every regression
+    :rtype: list[str]
+    """
+    baseline_cells = {
+        (cell["workload"], cell["buffer_size"], cell["policy"]): cell for cell in baseline["results"]
+    }
+
+    regressions = []
+    for cell in results["results"]:
+        key = (cell["workload"], cell["buffer_size"], cell["policy"])
+        if key not in baseline_cells:
+            continue
+        before = baseline_cells[key]
+        label = f"{cell['workload']} buffer size {cell['buffer_size']} {cell['policy']}"
+
+        if cell["reads_per_second"] < before["reads_per_second"] * (1 - tolerance):
+            regressions.append(
+                f"{label}: {cell['reads_per_second']:,.0f} reads/s, "
+                f"was {before['reads_per_second']:,.0f}"
+            )
+        if cell["tracemalloc_peak_bytes"] > before["tracemalloc_peak_bytes"] * (1 + tolerance):
+            regressions.append(
+                f"{label}: {cell['tracemalloc_peak_bytes']:,} bytes allocated, "
+                f"was {before['tracemalloc_peak_bytes']:,}"
+            )
+
+    return regressions
+
+
+def main():
+    policy_names = [name for _, _, name in BENCHMARK_POLICIES]
+
+    parser = argparse.ArgumentParser(description="Benchmark simulator throughput and memory per policy")
+    parser.add_argument(
+        "--workloads",
+        nargs="+",
+        default=[workload.name for workload in BENCHMARK_WORKLOADS],
+        choices=[workload.name for workload in WorkloadType],
+    )
+    parser.add_argument("--buffer-sizes", nargs="+", type=int, default=BENCHMARK_BUFFER_SIZES)
+    parser.add_argument("--policies", nargs="+", default=policy_names, choices=policy_names)
+    parser.add_argument("--total-page-count", type=int, default=10000, help="Pages synthetic workloads access")
+    parser.add_argument("--total-reads", type=int, default=200000, help="Reads of each workload")
+    parser.add_argument("--repeat", type=int, default=3, help="Times each replay is timed")
+    parser.add_argument("--output", help="Where to write the results as JSON")
+    parser.add_argument("--baseline", help="Earlier results to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed regression, as a fraction")
+    args = parser.parse_args()
+
+    workloads = [WorkloadType[name] for name in args.workloads]
+    trace_workloads = [workload.name for workload in workloads if workload not in SYNTHETIC_WORKLOADS]
+    if trace_workloads:
+        print(f"Replaying at most {args.total_reads} reads of {', '.join(trace_workloads)}")
+
+    results = run_benchmarks(
+        workloads,
+        args.buffer_sizes,
+        [policy for policy in BENCHMARK_POLICIES if policy[2] in args.policies],
+        args.total_page_count,
+        args.total_reads,
+        args.repeat,
+    )
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(results, output_file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = compare_results(results, json.load(baseline_file), args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+"""Dirty pages, write-back and the I/O time a policy costs.
+
+A fault rate treats every miss alike, but a miss that evicts a dirty page costs a disk read
+and a write, and a disk read costs far more on a hard disk than out of the OS page cache.
+DirtyPageTracker replays a trace of reads and writes through any MemoryManager and counts
+the write-backs of dirty victims. A LatencyModel then turns hits, disk reads and write-backs
+into estimated I/O time and throughput.
+"""
+import argparse
+from dataclasses import dataclass
+import random
+from typing import Iterable, Iterator
+
+import numpy as np
+
+from hierarchy import HierarchyMemoryManager
+from memory_manager import MemoryManager
+from trace_stream import DEFAULT_CHUNK_SIZE, ArrayTraceStream, FileTraceStream, TraceStream
+
+
+@dataclass(frozen=True, slots=True)
+class LatencyModel:
+    """Seconds each kind of page access takes
+
+    :param read: Reading a page that missed every buffer from disk
+    :param write: Writing a dirty page back to disk when it is evicted
+    :param hit: Finding a page in the buffer
+    :param lower_hit: Finding a page in the lower buffer of a HierarchyMemoryManager, such as
+        copying it out of the OS page cache
+    """
+
+    read: float
+    write: float
+    hit: float = 100e-9
+    lower_hit: float = 5e-6
+
+
+# Rough latencies of 8kB random I/O. Under page_cache every page fits in the OS page cache, so
+# misses and write-backs only copy a page to or from the kernel.
+LATENCY_MODELS = {
+    "ssd": LatencyModel(read=100e-6, write=50e-6),
+    "hdd": LatencyModel(read=8e-3, write=8e-3),
+    "page_cache": LatencyModel(read=5e-6, write=5e-6),
+}
+
+
+class RandomWriteStream(TraceStream):
+    """Marks each access of a trace as a write with the same probability, 1 for writes and 0 for
+    reads, for traces that do not record which accesses wrote their page
+
+    :param total_reads: The number of accesses
+    :type total_reads: int
+    :param write_fraction: The probability an access is a write
+    :type write_fraction: float
+    :param seed: Seed for the random generator. The same seed marks the same accesses.
+    :type seed: int | None
+    :param chunk_size: Accesses generated at a time
+    :type chunk_size: int
+    """
+
+    def __init__(
+        self, total_reads: int, write_fraction: float, seed: int | None = None, chunk_size: int = DEFAULT_CHUNK_SIZE
+    ):
+        if not 0 <= write_fraction <= 1:
+            raise ValueError("write_fraction must be between 0 and 1")
+        super().__init__()
+        self.total_reads = total_reads
+        self.write_fraction = write_fraction
+        self.seed = seed if seed is not None else random.getrandbits(64)
+        self.chunk_size = chunk_size
+
+    def _chunks(self) -> Iterator[np.ndarray]:
+        rng = np.random.default_rng(self.seed)
+        for start in range(0, self.total_reads, self.chunk_size):
+            yield (rng.random(min(self.chunk_size, self.total_reads - start)) < self.write_fraction).astype(np.int64)
+
+    def __len__(self) -> int:
+        return self.total_reads
+
+
+class DirtyPageTracker:
+    """Replays reads and writes through a memory manager, counting write-backs of dirty pages.
+
+    A write dirties the page, and a dirty page is written back when it is evicted. Evictions
+    are not observed one by one, which would need the slow read_page path. Instead every page
+    access is known to have faulted or not from read_pages_faulted, and a page that faults
+    again must have been evicted since it was last loaded. So a run of accesses of one page
+    from a fault up to its next fault is one stay in memory, and the stay was written back if
+    any access in it was a write. Stays that are still going when the trace ends were written
+    back if the page is no longer resident.
+
+    :param memory_manager: The buffer to replay through
+    :type memory_manager: MemoryManager
+    """
+
+    def __init__(self, memory_manager: MemoryManager):
+        self.memory_manager = memory_manager
+        self.total_writes: int = 0
+        self.write_backs: int = 0
+        # Whether each page was written during its current stay in memory
+        self._dirty = np.zeros(memory_manager.disk_page_count, dtype=bool)
+        self._finished = True
+
+    def access_pages(self, page_numbers: Iterable[int], writes: Iterable[int]) -> int:
+        """Access a batch of pages. Returns the number of page faults that occured
+
+        :param page_numbers: The page numbers accessed, in order
+        :type page_numbers: Iterable[int]
+        :param writes: Whether each access wrote the page
+        :type writes: Iterable[int]
+        :return: The number of page faults in the batch
+        :rtype: int
+        """
+        pages = np.asarray(page_numbers, dtype=np.int64)
+        writes = np.asarray(writes, dtype=bool)
+        if len(writes) != len(pages):
+            raise ValueError("Give an op for every page access")
+        if not len(pages):
+            return 0
+
+        faulted = self.memory_manager.read_pages_faulted(pages)
+        self.total_writes += int(np.count_nonzero(writes))
+        self._finished = False
+
+        order = np.argsort(pages, kind="stable")
+        sorted_pages = pages[order]
+        sorted_faulted = faulted[order]
+        first_access = np.empty(len(pages), dtype=bool)
+        first_access[0] = True
+        np.not_equal(sorted_pages[1:], sorted_pages[:-1], out=first_access[1:])
+
+        # A stay starts at every fault, the first access of a page in the batch continues the
+        # stay the page was in before the batch unless it faulted
+        stay_starts = np.flatnonzero(sorted_faulted | first_access)
+        stay_dirty = np.logical_or.reduceat(writes[order], stay_starts)
+        stay_pages = sorted_pages[stay_starts]
+        continues_stay = ~sorted_faulted[stay_starts] & first_access[stay_starts]
+        stay_dirty[continues_stay] |= self._dirty[stay_pages[continues_stay]]
+
+        # Every stay but the last of a page ended in an eviction, and so did the stay before
+        # the batch of pages whose first access faulted
+        last_stay = np.append(first_access[stay_starts[1:]], True)
+        ends_before_batch = sorted_faulted[stay_starts] & first_access[stay_starts]
+        self.write_backs += int(np.count_nonzero(stay_dirty & ~last_stay))
+        self.write_backs += int(np.count_nonzero(self._dirty[stay_pages[ends_before_batch]]))
+
+        self._dirty[stay_pages[last_stay]] = stay_dirty[last_stay]
+        return int(np.count_nonzero(faulted))
+
+    def run(self, page_accesses: Iterable[int], writes: Iterable[int]) -> int:
+        """Replay a whole trace of page accesses and whether each wrote its page
+
+        :param page_accesses: The pages accessed. TraceStreams are read a chunk at a time.
+        :type page_accesses: Iterable[int]
+        :param writes: Whether each access wrote the page, streamed alongside the pages
+        :type writes: Iterable[int]
+        :return: The number of page faults during the run
+        :rtype: int
+        """
+        if not isinstance(page_accesses, TraceStream):
+            page_accesses = ArrayTraceStream(page_accesses)
+        if not isinstance(writes, TraceStream):
+            writes = ArrayTraceStream(np.fromiter(writes, dtype=np.int64))
+
+        page_faults = 0
+        write_chunks = writes.chunks()
+        pending_writes = np.zeros(0, dtype=np.int64)
+        for chunk in page_accesses.chunks():
+            while len(pending_writes) < len(chunk):
+                write_chunk = next(write_chunks, None)
+                if write_chunk is None:
+                    raise ValueError("The trace has more page accesses than ops")
+                pending_writes = np.concatenate([pending_writes, write_chunk])
+            page_faults += self.access_pages(chunk, pending_writes[: len(chunk)])
+            pending_writes = pending_writes[len(chunk) :]
+
+        self.finish()
+        return page_faults
+
+    def finish(self):
+        """Count the write-backs of dirty pages evicted after they were last accessed"""
+        if self._finished:
+            return
+        for page in np.flatnonzero(self._dirty).tolist():
+            if not self.memory_manager.is_resident(page):
+                self.write_backs += 1
+                self._dirty[page] = False
+        self._finished = True
+
+    @property
+    def dirty_pages(self) -> int:
+        """Dirty pages still in memory, which a checkpoint would write"""
+        self.finish()
+        return int(np.count_nonzero(self._dirty))
+
+
+@dataclass(slots=True)
+class IoCost:
+    total_reads: int
+    total_writes: int
+    hits: int
+    lower_hits: int
+    disk_reads: int
+    write_backs: int
+    dirty_pages: int
+    seconds: float
+
+    @property
+    def seconds_per_access(self) -> float:
+        return self.seconds / self.total_reads if self.total_reads else 0.0
+
+    @property
+    def accesses_per_second(self) -> float:
+        """Throughput if accesses were issued one at a time"""
+        return self.total_reads / self.seconds if self.seconds else float("inf")
+
+
+def io_cost(tracker: DirtyPageTracker, latency_model: LatencyModel) -> IoCost:
+    """Estimates the I/O time of everything replayed through a tracker so far
+
+    :param tracker: The tracker the trace was replayed through
+    :type tracker: DirtyPageTracker
+    :param latency_model: The cost of each kind of access
+    :type latency_model: LatencyModel
+    :return: The accesses of each kind and the time they took
+    :rtype: IoCost
+    """
+    m = tracker.memory_manager
+    tracker.finish()
+    lower_hits = m.lower_hits if isinstance(m, HierarchyMemoryManager) else 0
+    hits = m.total_reads - m.total_page_faults - lower_hits
+    seconds = (
+        hits * latency_model.hit
+        + lower_hits * latency_model.lower_hit
+        + m.total_page_faults * latency_model.read
+        + tracker.write_backs * latency_model.write
+    )
+    return IoCost(
+        total_reads=m.total_reads,
+        total_writes=tracker.total_writes,
+        hits=hits,
+        lower_hits=lower_hits,
+        disk_reads=m.total_page_faults,
+        write_backs=tracker.write_backs,
+        dirty_pages=tracker.dirty_pages,
+        seconds=seconds,
+    )
+
+
+def main():
+    from experiment import add_policy_arguments, policy_from_args
+    from memory_manager import BeladyMemoryManager
+
+    parser = argparse.ArgumentParser(description="Estimate the I/O time of a policy on a trace")
+    parser.add_argument("trace", help="A page trace, with R and W ops on every line or not")
+    add_policy_arguments(parser)
+    parser.add_argument("--buffer-size", type=int, default=1000, help="Pages that fit in memory")
+    parser.add_argument("--latency-model", default="ssd", choices=LATENCY_MODELS)
+    parser.add_argument(
+        "--write-fraction",
+        type=float,
+        help="Mark this fraction of accesses as writes, for traces without R and W ops",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the writes of --write-fraction")
+    args = parser.parse_args()
+
+    trace = FileTraceStream(args.trace)
+    if args.write_fraction is not None:
+        writes = RandomWriteStream(len(trace), args.write_fraction, args.seed)
+    else:
+        writes = trace.writes()
+
+    memory_manager, kargs = policy_from_args(parser, args)
+    if issubclass(memory_manager, BeladyMemoryManager):
+        # The offline optimal policy needs to see the whole trace up front
+        kargs = {**kargs, "page_accesses": np.concatenate(list(trace.chunks()))}
+    tracker = DirtyPageTracker(memory_manager(args.buffer_size, trace.max_page() + 1, **kargs))
+    try:
+        tracker.run(trace, writes)
+    except ValueError as e:
+        parser.error(f"{e}. Use --write-fraction for traces without R and W ops")
+
+    cost = io_cost(tracker, LATENCY_MODELS[args.latency_model])
+    print(f"{cost.total_reads:,} accesses, {cost.total_writes:,} writes")
+    print(f"{cost.disk_reads:,} disk reads, {cost.write_backs:,} write-backs, {cost.dirty_pages:,} left dirty")
+    print(f"{cost.seconds:.3f}s of I/O, {cost.seconds_per_access * 1e6:.2f}us per access")
+    print(f"{cost.accesses_per_second:,.0f} accesses per second")
+
+
+if __name__ == "__main__":
+    main()
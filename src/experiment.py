@@ -0,0 +1,429 @@
+"""Runs a sweep described by an experiment spec, so an experiment does not mean editing code.
+
+A spec is a TOML or JSON file:
+
+    workloads = ["zipfian", "postgres_trace_tpch", "traces/pgbench_reads"]
+    buffer_fractions = { start = 0.05, stop = 0.5, step = 0.05 }
+    output = "tpch.csv"
+    results = "tpch_cells.csv"
+
+    [[policies]]
+    policy = "LRU-K"
+    name = "LRU2-20"
+    kwargs = { k = 2, c_ref_period = 20 }
+
+    [[policies]]
+    policy = "Hierarchy"
+    kwargs = { total_memory_page_count = 500, lower_policy = "LRU" }
+
+Workloads are workload names or trace files. Buffer sizes are given in pages with
+buffer_sizes, or as fractions of the pages each workload reads with buffer_fractions, either
+as a list or as an inclusive start, stop and step. Policies are looked up in POLICY_CLASSES,
+as are the policies of a hierarchy's upper_policy and lower_policy. Relative paths in a spec
+are relative to the spec, paths given on the command line to the working directory.
+
+results, a .csv or .parquet file, gets a row per cell as soon as the cell finishes, while
+output gets the usual table once the sweep is done. Parquet needs pyarrow.
+
+Nothing imports numpy until the sweep starts, so checking a spec with --dry-run is quick:
+
+    python experiment.py ../experiments/default.toml --dry-run
+"""
+import argparse
+import csv
+from dataclasses import dataclass, fields, replace
+import json
+import math
+import os
+import tomllib
+
+from hierarchy import HierarchyMemoryManager
+from memory_manager import (
+    ArcMemoryManager,
+    BeladyMemoryManager,
+    ClockMemoryManager,
+    ClockSweepMemoryManager,
+    FifoMemoryManager,
+    LfuMemoryManager,
+    LirsMemoryManager,
+    LruKMemoryManager,
+    LruMemoryManager,
+    MemoryManager,
+    MruMemoryManager,
+    RandomReplacementMemoryManager,
+    TwoQueueMemoryManager,
+)
+
+# Policies a spec can name, by the column names the rest of the simulator uses
+POLICY_CLASSES: dict[str, type[MemoryManager]] = {
+    "Random": RandomReplacementMemoryManager,
+    "FIFO": FifoMemoryManager,
+    "LRU": LruMemoryManager,
+    "MRU": MruMemoryManager,
+    "LFU": LfuMemoryManager,
+    "LRU-K": LruKMemoryManager,
+    "CLOCK": ClockMemoryManager,
+    "ClockSweep": ClockSweepMemoryManager,
+    "2Q": TwoQueueMemoryManager,
+    "ARC": ArcMemoryManager,
+    "LIRS": LirsMemoryManager,
+    "OPT": BeladyMemoryManager,
+    "Hierarchy": HierarchyMemoryManager,
+}
+
+# Keyword arguments that name a policy rather than hold a value
+_POLICY_KWARGS = ("upper_policy", "lower_policy")
+
+
+class ExperimentSpecException(Exception):
+    pass
+
+
+@dataclass
+class ExperimentSpec:
+    workloads: list[str]
+    # (memory manager class, keyword arguments, column name), as run_sweep takes them
+    policies: list[tuple[type[MemoryManager], dict, str]]
+    buffer_sizes: list[int] | None = None
+    buffer_fractions: list[float] | None = None
+    output: str = "output.csv"
+    results: str | None = None
+    total_page_count: int = 1000
+    total_reads: int = 10000
+    seed: int = 0
+    workers: int | None = None
+    backend: str = "process"
+    cache_dir: str | None = None
+    cache_size_mb: int = 64
+    latency_model: str | None = None
+    write_fraction: float = 0.0
+
+
+# Keys of a spec that are paths, other than its workloads
+_PATH_KEYS = ("output", "results", "cache_dir")
+
+
+def _value_range(value, name: str) -> list:
+    # A list, or an inclusive {start, stop, step} range
+    if isinstance(value, list):
+        return value
+    if not isinstance(value, dict) or set(value) != {"start", "stop", "step"}:
+        raise ExperimentSpecException(f"{name} must be a list or a table of start, stop and step")
+    start, stop, step = value["start"], value["stop"], value["step"]
+    if step <= 0 or stop < start:
+        raise ExperimentSpecException(f"{name} needs a positive step and stop no smaller than start")
+    # Rounded so float steps such as 0.05 do not drift or drop the stop
+    count = math.floor((stop - start) / step + 1e-9) + 1
+    return [round(start + i * step, 12) if isinstance(step, float) else start + i * step for i in range(count)]
+
+
+def _policy_class(name: str) -> type[MemoryManager]:
+    if name not in POLICY_CLASSES:
+        raise ExperimentSpecException(f"Unknown policy {name}, expected one of {', '.join(POLICY_CLASSES)}")
+    return POLICY_CLASSES[name]
+
+
+def _policy(entry: dict) -> tuple[type[MemoryManager], dict, str]:
+    unknown = set(entry) - {"policy", "name", "kwargs"}
+    if "policy" not in entry or unknown:
+        raise ExperimentSpecException(f"Policies need a policy and may have a name and kwargs, not {entry}")
+
+    kargs = dict(entry.get("kwargs", {}))
+    for key in _POLICY_KWARGS:
+        if key in kargs:
+            kargs[key] = _policy_class(kargs[key])
+    return _policy_class(entry["policy"]), kargs, entry.get("name", entry["policy"])
+
+
+def policy_config(
+    policy: str, kwargs: dict | None = None, name: str | None = None
+) -> tuple[type[MemoryManager], dict, str]:
+    """A policy of POLICY_CLASSES as run_sweep takes it, resolved as an entry of a spec's
+    policies would be
+
+    :param policy: The name of the policy in POLICY_CLASSES
+    :type policy: str
+    :param kwargs: Keyword arguments of the policy. upper_policy and lower_policy are names in
+        POLICY_CLASSES.
+    :type kwargs: dict | None
+    :param name: The column name, defaults to the policy
+    :type name: str | None
+    :return: The memory manager class, its keyword arguments and the column name
+    :rtype: tuple[type[MemoryManager], dict, str]
+    """
+    entry = {"policy": policy, "kwargs": kwargs or {}}
+    if name is not None:
+        entry["name"] = name
+    return _policy(entry)
+
+
+def add_policy_arguments(parser: argparse.ArgumentParser, default: str = "ClockSweep"):
+    """Adds the --policy and --kwargs options every command line picks a policy with"""
+    parser.add_argument("--policy", default=default, choices=POLICY_CLASSES)
+    parser.add_argument(
+        "--kwargs",
+        type=json.loads,
+        default={},
+        help='Keyword arguments of the policy as JSON, such as \'{"k": 2, "c_ref_period": 20}\'',
+    )
+
+
+def policy_from_args(
+    parser: argparse.ArgumentParser, args: argparse.Namespace
+) -> tuple[type[MemoryManager], dict]:
+    """The memory manager class and keyword arguments chosen with add_policy_arguments"""
+    if not isinstance(args.kwargs, dict):
+        parser.error("--kwargs must be a JSON object")
+    try:
+        memory_manager, kargs, _ = policy_config(args.policy, args.kwargs)
+    except ExperimentSpecException as e:
+        parser.error(str(e))
+    return memory_manager, kargs
+
+
+def parse_spec(values: dict, base_dir: str = ".") -> ExperimentSpec:
+    """Checks the values of a spec file and builds the spec from them
+
+    :param values: The values of the spec, as loaded from TOML or JSON
+    :type values: dict
+    :param base_dir: The directory relative paths in the spec are relative to
+    :type base_dir: str
+    :return: The experiment
+    :rtype: ExperimentSpec
+    """
+    values = dict(values)
+    known = {spec_field.name for spec_field in fields(ExperimentSpec)}
+    unknown = set(values) - known
+    if unknown:
+        raise ExperimentSpecException(f"Unknown spec keys: {', '.join(sorted(unknown))}")
+    if not values.get("workloads") or not values.get("policies"):
+        raise ExperimentSpecException("A spec needs workloads and policies")
+    if ("buffer_sizes" in values) == ("buffer_fractions" in values):
+        raise ExperimentSpecException("Give exactly one of buffer_sizes and buffer_fractions")
+
+    if "buffer_sizes" in values:
+        values["buffer_sizes"] = _value_range(values["buffer_sizes"], "buffer_sizes")
+        if not all(isinstance(size, int) and size > 0 for size in values["buffer_sizes"]):
+            raise ExperimentSpecException("buffer_sizes must be positive numbers of pages")
+    else:
+        values["buffer_fractions"] = _value_range(values["buffer_fractions"], "buffer_fractions")
+        if not all(0 < fraction <= 1 for fraction in values["buffer_fractions"]):
+            raise ExperimentSpecException("buffer_fractions must be between 0 and 1")
+
+    values["policies"] = [_policy(entry) for entry in values["policies"]]
+    names = [name for _, _, name in values["policies"]]
+    if len(set(names)) != len(names):
+        raise ExperimentSpecException("Every policy needs a different name, set name to tell them apart")
+
+    # Workloads that are not files are workload names, checked when the sweep starts
+    values["workloads"] = [
+        os.path.join(base_dir, workload) if os.path.isfile(os.path.join(base_dir, workload)) else workload
+        for workload in values["workloads"]
+    ]
+    values.setdefault("output", ExperimentSpec.output)
+    for key in _PATH_KEYS:
+        if values.get(key) is not None:
+            values[key] = os.path.join(base_dir, values[key])
+
+    return ExperimentSpec(**values)
+
+
+def load_spec(filename: str) -> ExperimentSpec:
+    """Loads an experiment spec from a .toml or .json file"""
+    if filename.endswith(".json"):
+        with open(filename) as spec_file:
+            values = json.load(spec_file)
+    else:
+        with open(filename, "rb") as spec_file:
+            try:
+                values = tomllib.load(spec_file)
+            except tomllib.TOMLDecodeError as e:
+                raise ExperimentSpecException(f"{filename}: {e}") from e
+    return parse_spec(values, os.path.dirname(filename))
+
+
+class CsvCellWriter:
+    """Appends a row per cell to a CSV file, flushed as each cell finishes so a killed sweep
+    keeps every cell it finished"""
+
+    def __init__(self, filename: str, metric: str, append: bool = False):
+        exists = append and os.path.exists(filename)
+        self._file = open(filename, "a" if exists else "w", newline="")
+        self._writer = csv.writer(self._file)
+        if not exists:
+            self._writer.writerow(["workload", "bufferSize", "policy", metric])
+            self._file.flush()
+
+    def write(self, workload: str, buffer_size: int, policy: str, result: float):
+        self._writer.writerow([workload, buffer_size, policy, result])
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetCellWriter:
+    """Writes cells to a Parquet file a row group at a time. A Parquet file is only readable
+    once it is closed, so prefer CSV for sweeps that may be killed."""
+
+    def __init__(self, filename: str, metric: str, append: bool = False, row_group_size: int = 256):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("Writing Parquet results requires the pyarrow package") from e
+
+        self._pa = pa
+        self._schema = pa.schema(
+            [("workload", pa.string()), ("bufferSize", pa.int64()), ("policy", pa.string()), (metric, pa.float64())]
+        )
+        previous = pq.read_table(filename) if append and os.path.exists(filename) else None
+        self._writer = pq.ParquetWriter(filename, self._schema)
+        if previous is not None:
+            # Parquet files can not be appended to, so the cells of the earlier run are copied over
+            self._writer.write_table(previous.cast(self._schema))
+        self.row_group_size = row_group_size
+        self._rows: list[tuple] = []
+
+    def write(self, workload: str, buffer_size: int, policy: str, result: float):
+        self._rows.append((workload, buffer_size, policy, result))
+        if len(self._rows) >= self.row_group_size:
+            self._flush()
+
+    def _flush(self):
+        if self._rows:
+            columns = [list(column) for column in zip(*self._rows)]
+            self._writer.write_table(self._pa.Table.from_arrays(columns, schema=self._schema))
+            self._rows = []
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+
+
+def open_cell_writer(filename: str, metric: str, append: bool = False):
+    """A writer for cells as they finish, Parquet for .parquet files and CSV otherwise"""
+    if filename.endswith(".parquet"):
+        return ParquetCellWriter(filename, metric, append)
+    return CsvCellWriter(filename, metric, append)
+
+
+def run_experiment(spec: ExperimentSpec, resume: bool = False):
+    """Runs the sweep of an experiment
+
+    :param spec: The experiment
+    :type spec: ExperimentSpec
+    :param resume: Skip cells finished by an earlier run of the same experiment
+    :type resume: bool
+    """
+    # The simulation needs numpy, so the sweep is only imported once there is one to run
+    from cost_model import LATENCY_MODELS
+    from page_access_generators import WorkloadType
+    from result_cache import ResultCache
+    from sweep import BACKENDS, run_sweep
+
+    workloads = []
+    for workload in spec.workloads:
+        if workload in WorkloadType.__members__:
+            workloads.append(WorkloadType[workload])
+        elif os.path.isfile(workload):
+            workloads.append(workload)
+        else:
+            raise ExperimentSpecException(f"{workload} is neither a workload nor a trace file")
+    if spec.latency_model is not None and spec.latency_model not in LATENCY_MODELS:
+        raise ExperimentSpecException(
+            f"Unknown latency model {spec.latency_model}, expected one of {', '.join(LATENCY_MODELS)}"
+        )
+    if spec.backend not in BACKENDS:
+        raise ExperimentSpecException(f"Unknown backend {spec.backend}, expected one of {', '.join(BACKENDS)}")
+
+    cache = None if spec.cache_dir is None else ResultCache(spec.cache_dir, spec.cache_size_mb * 2**20)
+    cell_writer = None
+    if spec.results is not None:
+        metric = "faultRate" if spec.latency_model is None else "ioMicrosecondsPerAccess"
+        cell_writer = open_cell_writer(spec.results, metric, append=resume)
+
+    try:
+        run_sweep(
+            workloads,
+            spec.buffer_sizes or [],
+            spec.policies,
+            output_filename=spec.output,
+            total_page_count=spec.total_page_count,
+            total_reads=spec.total_reads,
+            max_workers=spec.workers,
+            resume=resume,
+            seed=spec.seed,
+            cache=cache,
+            latency_model=LATENCY_MODELS.get(spec.latency_model),
+            write_fraction=spec.write_fraction,
+            working_set_fractions=spec.buffer_fractions,
+            backend=spec.backend,
+            on_cell=None if cell_writer is None else cell_writer.write,
+        )
+    finally:
+        if cell_writer is not None:
+            cell_writer.close()
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="Run the sweep of an experiment spec")
+    parser.add_argument("spec", help="A .toml or .json experiment spec")
+    parser.add_argument("--output", help="Where to write the table of results, instead of the spec's")
+    parser.add_argument("--results", help="Where to write a row per cell as it finishes, .csv or .parquet")
+    parser.add_argument("--workers", type=int, help="Worker processes, defaults to the CPU count")
+    parser.add_argument("--backend", help="process, or serial to run every cell in this process")
+    parser.add_argument("--resume", action="store_true", help="Only simulate cells missing from the output")
+    parser.add_argument("--seed", type=int, help="Seed for the synthetic workloads")
+    parser.add_argument("--cache-dir", help="Where results are cached between runs")
+    parser.add_argument("--cache-size-mb", type=int, help="Size the result cache is kept under")
+    parser.add_argument("--no-cache", action="store_true", help="Simulate every cell, ignoring cached results")
+    parser.add_argument("--latency-model", help="ssd, hdd or page_cache, to write I/O time instead of fault rates")
+    parser.add_argument("--write-fraction", type=float, help="Fraction of accesses that dirty their page")
+    parser.add_argument("--dry-run", action="store_true", help="Check the spec and list the sweep without running it")
+    args = parser.parse_args(argv)
+
+    try:
+        spec = load_spec(args.spec)
+    except (OSError, ValueError, ExperimentSpecException) as e:
+        parser.error(str(e))
+
+    overrides = {
+        key: getattr(args, key)
+        for key in (
+            "output",
+            "results",
+            "workers",
+            "backend",
+            "seed",
+            "cache_dir",
+            "cache_size_mb",
+            "latency_model",
+            "write_fraction",
+        )
+        if getattr(args, key) is not None
+    }
+    if args.no_cache:
+        overrides["cache_dir"] = None
+    spec = replace(spec, **overrides)
+
+    if args.dry_run:
+        if spec.buffer_sizes is not None:
+            buffers = f"{len(spec.buffer_sizes)} buffer sizes"
+        else:
+            buffers = f"{len(spec.buffer_fractions)} fractions of the working set"
+        print(f"{len(spec.workloads)} workloads x {buffers} x {len(spec.policies)} policies")
+        for workload in spec.workloads:
+            print(f"  {workload}")
+        for memory_manager, kargs, name in spec.policies:
+            print(f"  {name}: {memory_manager.__name__} {kargs or ''}")
+        return
+
+    try:
+        run_experiment(spec, args.resume)
+    except ExperimentSpecException as e:
+        parser.error(str(e))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+from array import array
+
+
+class FaultLog:
+    """Records which reads of a MemoryManager were page faults.
+
+    Reads are numbered from 1, so the read number of a fault is the manager's total_reads
+    right after the faulting read.
+    """
+
+    def record(self, read_number: int):
+        raise NotImplementedError()
+
+    def fault_reads(self):
+        """The read numbers of every recorded page fault, in order"""
+        raise NotImplementedError()
+
+
+class ArrayFaultLog(FaultLog):
+    """Keeps the read number of every fault in a compact array of 64 bit ints"""
+
+    def __init__(self):
+        self._fault_reads = array("q")
+        # Bind append directly so recording a fault costs a single call
+        self.record = self._fault_reads.append
+
+    def fault_reads(self) -> array:
+        return self._fault_reads
+
+    def to_numpy(self):
+        import numpy as np
+
+        return np.frombuffer(self._fault_reads, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self._fault_reads)
+
+
+class BitmapFaultLog(FaultLog):
+    """Keeps one bit per read, set if the read was a page fault.
+
+    Costs a bit per read regardless of the fault rate, which is smaller than an ArrayFaultLog
+    once more than one read in 64 faults.
+    """
+
+    def __init__(self):
+        self._bits = bytearray()
+
+    def record(self, read_number: int):
+        index = read_number - 1
+        byte = index >> 3
+        if byte >= len(self._bits):
+            # Grow geometrically so appending stays amortized constant time
+            self._bits.extend(bytes(max(byte + 1 - len(self._bits), len(self._bits))))
+        self._bits[byte] |= 1 << (index & 7)
+
+    def faulted(self, read_number: int) -> bool:
+        """Whether the given read was a page fault"""
+        index = read_number - 1
+        byte = index >> 3
+        return byte < len(self._bits) and bool(self._bits[byte] >> (index & 7) & 1)
+
+    def to_numpy(self, total_reads: int):
+        """A boolean array with an entry per read, True where the read faulted"""
+        import numpy as np
+
+        flags = np.unpackbits(np.frombuffer(self._bits, dtype=np.uint8), bitorder="little")
+        flags = flags[:total_reads].astype(bool)
+        if len(flags) < total_reads:
+            flags = np.concatenate([flags, np.zeros(total_reads - len(flags), dtype=bool)])
+        return flags
+
+    def fault_reads(self):
+        import numpy as np
+
+        flags = np.unpackbits(np.frombuffer(self._bits, dtype=np.uint8), bitorder="little")
+        return np.flatnonzero(flags) + 1
+
+
+class WindowedFaultLog(FaultLog):
+    """Counts faults per window of reads, for plotting the fault rate over time.
+
+    :param window: The number of reads in each window
+    :type window: int
+    """
+
+    def __init__(self, window: int):
+        if window <= 0:
+            raise ValueError("window must be positive")
+
+        self.window = window
+        self.counts = array("q")
+
+    def record(self, read_number: int):
+        index = (read_number - 1) // self.window
+        if index >= len(self.counts):
+            self.counts.extend(array("q", [0]) * (index + 1 - len(self.counts)))
+        self.counts[index] += 1
+
+    def fault_rates(self, total_reads: int) -> list[float]:
+        """The fault rate of every window, the last of which may be partial
+
+        :param total_reads: The number of reads the manager made, to size the last window
+        :type total_reads: int
+        """
+        window_count = -(-total_reads // self.window)
+        rates = []
+        for index in range(window_count):
+            faults = self.counts[index] if index < len(self.counts) else 0
+            reads = min(self.window, total_reads - index * self.window)
+            rates.append(faults / reads)
+        return rates
+
+    def fault_reads(self):
+        raise TypeError("A windowed fault log only keeps counts per window")
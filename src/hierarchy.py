@@ -0,0 +1,126 @@
+from memory_manager import (
+    ClockSweepMemoryManager,
+    InvalidPageNumber,
+    LruMemoryManager,
+    MemoryManager,
+    MemoryManagerException,
+)
+
+
+class HierarchyMemoryManager(MemoryManager):
+    def __init__(
+        self,
+        memory_page_count,
+        disk_page_count,
+        upper_policy: type[MemoryManager] = ClockSweepMemoryManager,
+        lower_policy: type[MemoryManager] = LruMemoryManager,
+        lower_memory_page_count: int | None = None,
+        total_memory_page_count: int | None = None,
+        exclusive: bool = False,
+        upper_kwargs: dict | None = None,
+        lower_kwargs: dict | None = None,
+        **kwargs,
+    ):
+        """Two buffers stacked on top of each other, such as shared_buffers over the OS page cache.
+
+        Reads go to the upper buffer, and only reads that miss it go to the lower buffer. A page
+        fault is a read that misses both and goes to disk, so total_page_faults counts disk reads.
+        Hooks of the hierarchy see a hit in either buffer as a hit. Evictions are seen by the
+        hooks of upper and lower.
+
+        Inclusive hierarchies load every page read from disk into both buffers, the double
+        caching of PostgreSQL over the page cache. Exclusive hierarchies keep each page in one
+        buffer: pages found in the lower buffer move up, and pages evicted from the upper
+        buffer move down.
+
+        :param memory_page_count: The number of pages that fit in the upper buffer
+        :type memory_page_count: int
+        :param upper_policy: The memory manager of the upper buffer
+        :type upper_policy: type[MemoryManager]
+        :param lower_policy: The memory manager of the lower buffer
+        :type lower_policy: type[MemoryManager]
+        :param lower_memory_page_count: The number of pages that fit in the lower buffer
+        :type lower_memory_page_count: int | None
+        :param total_memory_page_count: The number of pages that fit in both buffers, the lower
+            buffer gets whatever the upper buffer leaves. Use instead of lower_memory_page_count
+            to size the upper buffer against a fixed amount of memory.
+        :type total_memory_page_count: int | None
+        :param exclusive: Whether a page can only be in one buffer at a time
+        :type exclusive: bool
+        :param upper_kwargs: Extra keyword arguments for the upper memory manager
+        :type upper_kwargs: dict | None
+        :param lower_kwargs: Extra keyword arguments for the lower memory manager
+        :type lower_kwargs: dict | None
+        """
+        if (lower_memory_page_count is None) == (total_memory_page_count is None):
+            raise MemoryManagerException(
+                "Give exactly one of lower_memory_page_count and total_memory_page_count"
+            )
+        if lower_memory_page_count is None:
+            lower_memory_page_count = total_memory_page_count - memory_page_count
+        if lower_memory_page_count < 1:
+            raise MemoryManagerException("The lower buffer needs room for at least one page")
+
+        super().__init__(memory_page_count, disk_page_count, **kwargs)
+        self.upper = upper_policy(memory_page_count, disk_page_count, **(upper_kwargs or {}))
+        self.lower = lower_policy(lower_memory_page_count, disk_page_count, **(lower_kwargs or {}))
+        self.exclusive = exclusive
+
+        self.upper_hits: int = 0
+        self.lower_hits: int = 0
+
+    @property
+    def upper_hit_rate(self) -> float:
+        """Fraction of all reads that hit the upper buffer"""
+        return self.upper_hits / self.total_reads if self.total_reads else 0.0
+
+    @property
+    def lower_hit_rate(self) -> float:
+        """Fraction of reads that missed the upper buffer and hit the lower buffer"""
+        upper_misses = self.total_reads - self.upper_hits
+        return self.lower_hits / upper_misses if upper_misses else 0.0
+
+    def is_resident(self, page_number: int) -> bool:
+        """Whether a page is in either buffer"""
+        return self.upper.is_resident(page_number) or self.lower.is_resident(page_number)
+
+    def read_page(self, page_number: int) -> bool:
+        """Read a page through the hierarchy. Returns true if the page was read from disk
+
+        :param page_number: The page number to read
+        :type page_number: int
+        :return: Whether the read missed both buffers
+        :rtype: bool
+        """
+        if page_number >= self.disk_page_count or page_number < 0:
+            raise InvalidPageNumber("Attempting to address an invalid page number")
+
+        self.total_reads += 1
+        hooks = self._hooks
+        if not self.upper.read_page(page_number):
+            self.upper_hits += 1
+            if hooks is not None:
+                hooks.on_hit(self.total_reads, page_number)
+            return False
+
+        if self.exclusive:
+            # Move the page up if the lower buffer has it, before the upper victim moves down
+            lower_hit = self.lower.invalidate_page(page_number)
+            if self.upper.last_evicted_page is not None:
+                self.lower.read_page(self.upper.last_evicted_page)
+        else:
+            lower_hit = not self.lower.read_page(page_number)
+
+        if lower_hit:
+            self.lower_hits += 1
+            if hooks is not None:
+                hooks.on_hit(self.total_reads, page_number)
+            return False
+
+        self.total_page_faults += 1
+        if self.fault_log is not None:
+            self.fault_log.record(self.total_reads)
+        if hooks is not None:
+            hooks.on_fault(self.total_reads, page_number)
+
+        return True
@@ -0,0 +1,352 @@
+"""Replays the traces of several backends interleaved into one shared buffer.
+
+A scheduler is a generator that lazily merges per-backend TraceStreams into batches of
+(pages, streams), the pages read in order and the index of the stream that read each one.
+Only a chunk or so of every stream is buffered at a time, so memory grows with the number of
+streams rather than their length. replay_interleaved feeds the batches to a MemoryManager
+through read_pages and splits the hits and faults by stream. For example
+
+    python interleave.py reads --split-dir backends --scheduler timestamp
+
+from src/ splits a trace captured with postgresql_tracing/page_reads_by_backend.stp into a
+trace per backend and replays them in the order the reads happened.
+"""
+import argparse
+import os
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Sequence
+
+import numpy as np
+
+from memory_manager import BeladyMemoryManager, MemoryManager
+from page_ids import PageIdIndex
+from trace_stream import ArrayTraceStream, FileTraceStream, TraceStream
+
+# Reads handed to the memory manager at a time
+DEFAULT_BATCH_SIZE = 1 << 16
+
+# Approximate bytes of a trace split by backend at a time
+_SPLIT_CHUNK_BYTES = 1 << 24
+
+# A batch of interleaved reads: the pages read, in order, and the stream each read came from
+InterleavedBatch = tuple[np.ndarray, np.ndarray]
+
+
+@dataclass(slots=True)
+class StreamStats:
+    name: str
+    total_reads: int = 0
+    total_page_faults: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        return 1 - self.total_page_faults / self.total_reads if self.total_reads else 0.0
+
+
+def _as_trace_stream(stream: TraceStream | Iterable[int]) -> TraceStream:
+    if isinstance(stream, TraceStream):
+        return stream
+    return ArrayTraceStream(np.fromiter(stream, dtype=np.int64))
+
+
+class _StreamBuffer:
+    """The reads of one stream that have been pulled from it but not scheduled yet"""
+
+    def __init__(self, chunks: Iterator[np.ndarray]):
+        self._chunks = chunks
+        self.pages = np.zeros(0, dtype=np.int64)
+        self.exhausted = False
+
+    def fill(self, count: int):
+        """Pull chunks until count reads are buffered or the stream runs out"""
+        pending = [self.pages]
+        buffered = len(self.pages)
+        while buffered < count and not self.exhausted:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                self.exhausted = True
+            else:
+                pending.append(np.asarray(chunk, dtype=np.int64))
+                buffered += len(chunk)
+        if len(pending) > 1:
+            self.pages = np.concatenate(pending)
+
+    def take(self, count: int) -> np.ndarray:
+        taken, self.pages = self.pages[:count], self.pages[count:]
+        return taken
+
+    @property
+    def done(self) -> bool:
+        return self.exhausted and not len(self.pages)
+
+
+def weighted_schedule(
+    streams: Sequence[TraceStream | Iterable[int]],
+    weights: Sequence[int],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> Iterator[InterleavedBatch]:
+    """Weighted round robin: every round, each stream issues as many reads as its weight, in
+    stream order. Streams that run out drop out of the rotation.
+
+    :param streams: The pages each stream reads, in order
+    :type streams: Sequence[TraceStream | Iterable[int]]
+    :param weights: Reads each stream issues per round, at least 1
+    :type weights: Sequence[int]
+    :param batch_size: Approximate reads per batch
+    :type batch_size: int
+    :return: Batches of the interleaved pages and the stream of each read
+    :rtype: Iterator[InterleavedBatch]
+    """
+    if len(weights) != len(streams):
+        raise ValueError("Give a weight for every stream")
+    if any(weight < 1 for weight in weights):
+        raise ValueError("Weights must be at least 1")
+
+    weights = np.asarray(weights, dtype=np.int64)
+    # Where each stream's reads start within a round
+    offsets = np.concatenate([[0], np.cumsum(weights)[:-1]])
+    round_length = int(weights.sum())
+    rounds = max(1, batch_size // round_length)
+    buffers = [_StreamBuffer(_as_trace_stream(stream).chunks()) for stream in streams]
+
+    round_start = 0
+    while True:
+        pages, owners, order_keys = [], [], []
+        for stream_index, buffer in enumerate(buffers):
+            weight = int(weights[stream_index])
+            buffer.fill(rounds * weight)
+            taken = buffer.take(rounds * weight)
+            if not len(taken):
+                continue
+            positions = np.arange(len(taken))
+            pages.append(taken)
+            owners.append(np.full(len(taken), stream_index, dtype=np.int64))
+            order_keys.append(
+                (round_start + positions // weight) * round_length + offsets[stream_index] + positions % weight
+            )
+        if not pages:
+            return
+
+        order = np.argsort(np.concatenate(order_keys))
+        yield np.concatenate(pages)[order], np.concatenate(owners)[order]
+        round_start += rounds
+
+
+def round_robin_schedule(
+    streams: Sequence[TraceStream | Iterable[int]], quantum: int = 1, batch_size: int = DEFAULT_BATCH_SIZE
+) -> Iterator[InterleavedBatch]:
+    """Streams take turns issuing quantum reads each
+
+    :param streams: The pages each stream reads, in order
+    :type streams: Sequence[TraceStream | Iterable[int]]
+    :param quantum: Reads a stream issues per turn
+    :type quantum: int
+    :param batch_size: Approximate reads per batch
+    :type batch_size: int
+    :return: Batches of the interleaved pages and the stream of each read
+    :rtype: Iterator[InterleavedBatch]
+    """
+    return weighted_schedule(streams, [quantum] * len(streams), batch_size)
+
+
+def _aligned_chunks(stream: TraceStream, timestamps: TraceStream) -> Iterator[tuple[np.ndarray, np.ndarray]]:
+    # Chunks of timestamps and pages of equal length, whatever the chunking of each stream
+    page_buffer = _StreamBuffer(stream.chunks())
+    for timestamp_chunk in timestamps.chunks():
+        page_buffer.fill(len(timestamp_chunk))
+        pages = page_buffer.take(len(timestamp_chunk))
+        if len(pages) != len(timestamp_chunk):
+            raise ValueError("A stream has more timestamps than reads")
+        yield np.asarray(timestamp_chunk, dtype=np.int64), pages
+    page_buffer.fill(1)
+    if not page_buffer.done:
+        raise ValueError("A stream has more reads than timestamps")
+
+
+def timestamp_schedule(
+    streams: Sequence[TraceStream | Iterable[int]],
+    timestamps: Sequence[TraceStream | Iterable[int]],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> Iterator[InterleavedBatch]:
+    """Merges the streams in the order they were read, as recorded by a timestamp per read.
+    Reads with the same timestamp in one batch go in stream order.
+
+    Every stream's timestamps must not decrease. A batch holds every buffered read up to the
+    earliest last buffered timestamp of the streams that have more reads to come, so no read
+    still to come can belong before it.
+
+    :param streams: The pages each stream reads, in order
+    :type streams: Sequence[TraceStream | Iterable[int]]
+    :param timestamps: When each read of each stream happened
+    :type timestamps: Sequence[TraceStream | Iterable[int]]
+    :param batch_size: Reads buffered per stream before a batch is merged
+    :type batch_size: int
+    :return: Batches of the interleaved pages and the stream of each read
+    :rtype: Iterator[InterleavedBatch]
+    """
+    if len(timestamps) != len(streams):
+        raise ValueError("Give timestamps for every stream")
+
+    chunk_iterators = [
+        _aligned_chunks(_as_trace_stream(stream), _as_trace_stream(stream_timestamps))
+        for stream, stream_timestamps in zip(streams, timestamps)
+    ]
+    buffered_times = [np.zeros(0, dtype=np.int64) for _ in streams]
+    buffered_pages = [np.zeros(0, dtype=np.int64) for _ in streams]
+    exhausted = [False] * len(streams)
+    last_time = [None] * len(streams)
+
+    while True:
+        for stream_index, chunks in enumerate(chunk_iterators):
+            while not exhausted[stream_index] and len(buffered_times[stream_index]) < batch_size:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    exhausted[stream_index] = True
+                    break
+                times, pages = chunk
+                if len(times) and (
+                    np.any(times[1:] < times[:-1])
+                    or (last_time[stream_index] is not None and times[0] < last_time[stream_index])
+                ):
+                    raise ValueError(f"Timestamps of stream {stream_index} go backwards")
+                if len(times):
+                    last_time[stream_index] = times[-1]
+                buffered_times[stream_index] = np.concatenate([buffered_times[stream_index], times])
+                buffered_pages[stream_index] = np.concatenate([buffered_pages[stream_index], pages])
+
+        if not any(len(times) for times in buffered_times):
+            return
+
+        # Reads up to the horizon can not be preceded by any read still to come
+        horizons = [
+            times[-1] for times, done in zip(buffered_times, exhausted) if not done and len(times)
+        ]
+        horizon = min(horizons) if horizons else None
+
+        batch_times, batch_pages, batch_owners = [], [], []
+        for stream_index in range(len(streams)):
+            times = buffered_times[stream_index]
+            count = len(times) if horizon is None else int(np.searchsorted(times, horizon, side="right"))
+            batch_times.append(times[:count])
+            batch_pages.append(buffered_pages[stream_index][:count])
+            batch_owners.append(np.full(count, stream_index, dtype=np.int64))
+            buffered_times[stream_index] = times[count:]
+            buffered_pages[stream_index] = buffered_pages[stream_index][count:]
+
+        # Stable, so equal timestamps keep stream order and each stream keeps its own order
+        order = np.argsort(np.concatenate(batch_times), kind="stable")
+        yield np.concatenate(batch_pages)[order], np.concatenate(batch_owners)[order]
+
+
+def replay_interleaved(
+    memory_manager: MemoryManager, batches: Iterable[InterleavedBatch], names: Sequence[str]
+) -> list[StreamStats]:
+    """Replays interleaved streams into one memory manager
+
+    The batches go through read_pages_faulted, so policies keep their fast path and faults
+    can be split by stream.
+
+    :param memory_manager: The buffer every stream reads through
+    :type memory_manager: MemoryManager
+    :param batches: Interleaved reads, from one of the schedules
+    :type batches: Iterable[InterleavedBatch]
+    :param names: A name for every stream
+    :type names: Sequence[str]
+    :return: The reads and faults of every stream
+    :rtype: list[StreamStats]
+    """
+    stream_count = len(names)
+    reads = np.zeros(stream_count, dtype=np.int64)
+    page_faults = np.zeros(stream_count, dtype=np.int64)
+
+    for pages, owners in batches:
+        faulted = memory_manager.read_pages_faulted(pages)
+        reads += np.bincount(owners, minlength=stream_count)
+        page_faults += np.bincount(owners[faulted], minlength=stream_count)
+
+    return [
+        StreamStats(name, int(stream_reads), int(stream_page_faults))
+        for name, stream_reads, stream_page_faults in zip(names, reads, page_faults)
+    ]
+
+
+def split_backend_trace(filename: str, directory: str) -> list[str]:
+    """Splits a trace captured with page_reads_by_backend.stp into a timestamped trace per backend
+
+    Every line is "pid timestamp tablespace database relation fork block". The trace is read
+    a chunk at a time and each line is appended to directory/<trace>.<pid> without its pid,
+    where <trace> is the file name of the trace, so the traces of several captures can be split
+    into the same directory even though their pids repeat.
+
+    :param filename: The trace of every backend
+    :type filename: str
+    :param directory: Where to write the trace of each backend
+    :type directory: str
+    :return: The trace of each backend, in the order the backends first read a page
+    :rtype: list[str]
+    """
+    os.makedirs(directory, exist_ok=True)
+    backend_filenames: dict[str, str] = {}
+    trace_name = os.path.basename(filename)
+    with open(filename) as trace_file:
+        while lines := trace_file.readlines(_SPLIT_CHUNK_BYTES):
+            backend_lines: dict[str, list[str]] = {}
+            for line in lines:
+                if line.strip():
+                    pid, rest = line.split(maxsplit=1)
+                    backend_lines.setdefault(pid, []).append(rest)
+            for pid, rest in backend_lines.items():
+                if pid not in backend_filenames:
+                    backend_filenames[pid] = os.path.join(directory, f"{trace_name}.{pid}")
+                    open(backend_filenames[pid], "w").close()
+                with open(backend_filenames[pid], "a") as backend_file:
+                    backend_file.writelines(rest)
+
+    return list(backend_filenames.values())
+
+
+def main():
+    from experiment import add_policy_arguments, policy_from_args
+
+    parser = argparse.ArgumentParser(description="Replay several backends' traces into one shared buffer")
+    parser.add_argument("traces", nargs="+", help="A trace per backend")
+    parser.add_argument("--scheduler", default="round_robin", choices=["round_robin", "weighted", "timestamp"])
+    parser.add_argument("--quantum", type=int, default=1, help="Reads per turn for round robin")
+    parser.add_argument("--weights", type=int, nargs="+", help="Reads per round of each trace for weighted")
+    add_policy_arguments(parser)
+    parser.add_argument("--buffer-size", type=int, default=1000, help="Pages that fit in memory")
+    parser.add_argument(
+        "--split-dir", help="Split traces captured with page_reads_by_backend.stp into a trace per backend here"
+    )
+    args = parser.parse_args()
+
+    traces = args.traces
+    if args.split_dir:
+        traces = [backend_trace for trace in traces for backend_trace in split_backend_trace(trace, args.split_dir)]
+
+    # Backends of one database read the same pages, so their buffer tags share page ids
+    page_index = PageIdIndex()
+    streams = [FileTraceStream(trace, page_index=page_index) for trace in traces]
+    if args.scheduler == "timestamp":
+        batches = timestamp_schedule(streams, [stream.timestamps() for stream in streams])
+    elif args.scheduler == "weighted":
+        if not args.weights:
+            parser.error("--weights is needed for the weighted scheduler")
+        batches = weighted_schedule(streams, args.weights)
+    else:
+        batches = round_robin_schedule(streams, args.quantum)
+
+    # A pass over every stream interns all their pages up front
+    disk_page_count = max(stream.max_page() for stream in streams) + 1
+    memory_manager, kargs = policy_from_args(parser, args)
+    if issubclass(memory_manager, BeladyMemoryManager):
+        parser.error("The offline optimal policy needs the interleaved trace up front")
+    m = memory_manager(args.buffer_size, disk_page_count, **kargs)
+
+    for stats in replay_interleaved(m, batches, traces):
+        print(f"{stats.name}: {stats.total_reads:,} reads, {stats.hit_rate:.1%} hits")
+    print(f"Total: {m.total_reads:,} reads, {1 - m.total_page_faults / m.total_reads:.1%} hits")
+
+
+if __name__ == "__main__":
+    main()
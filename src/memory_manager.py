@@ -1,9 +1,14 @@
 from dataclasses import dataclass
 from functools import total_ordering
 import random
-from typing import Dict, Set
-from collections import deque
+from typing import Dict, Iterable, Set
+from collections import deque, OrderedDict
+import heapq
 import math
+from array import array
+
+from access_hooks import AccessHooks
+from fault_log import ArrayFaultLog, FaultLog
 
 
 class MemoryManagerException(Exception):
@@ -15,11 +20,11 @@ class InvalidPageNumber(Exception):
 
 
 @total_ordering
-@dataclass
+@dataclass(slots=True)
 class PageRead:
     page: int
     time: int
-    frequency: int
+    frequency: int = 0
     sort_mode: str = "time"
 
     def __eq__(self, other):
@@ -39,7 +44,24 @@ class PageRead:
 
 class MemoryManager:
 
-    def __init__(self, memory_page_count: int, disk_page_count: int):
+    def __init__(
+        self,
+        memory_page_count: int,
+        disk_page_count: int,
+        fault_log: FaultLog | None = None,
+        hooks: AccessHooks | None = None,
+    ):
+        """
+        :param memory_page_count: The number of pages that fit in memory
+        :type memory_page_count: int
+        :param disk_page_count: The number of pages on disk
+        :type disk_page_count: int
+        :param fault_log: Where to record which reads faulted. None only keeps the totals.
+        :type fault_log: FaultLog | None
+        :param hooks: Called on every hit, fault and eviction. Reads go through read_page
+            one at a time while hooks are set, None keeps the policy's fast path.
+        :type hooks: AccessHooks | None
+        """
         self.memory_page_count = memory_page_count
         self.disk_page_count = disk_page_count
         self._memory_pages: Set[int] = set()
@@ -47,7 +69,33 @@ class MemoryManager:
         # Operations to keep track of
         self.total_reads: int = 0
         self.total_page_faults: int = 0
-        self.page_faults: list[int] = []
+        self.fault_log = fault_log
+        # Page evicted by the last faulting read_page, None if memory had room
+        self.last_evicted_page: int | None = None
+        # Read number each page was loaded at, kept while hooks are set to age the victims
+        self._load_reads: Dict[int, int] = {}
+        self._hooks = hooks
+
+    @property
+    def hooks(self) -> AccessHooks | None:
+        """Called on every hit, fault and eviction, None when nothing is listening"""
+        return self._hooks
+
+    @hooks.setter
+    def hooks(self, hooks: AccessHooks | None):
+        if self._hooks is None:
+            # Load reads went stale while no hooks were set, pages loaded before are evicted
+            # without an age
+            self._load_reads.clear()
+        self._hooks = hooks
+
+    @property
+    def page_faults(self) -> list[int]:
+        """The read numbers of every page fault. The manager must have been given a fault log
+        that keeps them, such as an ArrayFaultLog."""
+        if self.fault_log is None:
+            raise MemoryManagerException("Page faults are not recorded without a fault log")
+        return list(self.fault_log.fault_reads())
 
     def read_page(self, page_number: int) -> bool:
         """Read a page with the given page number. Returns true if a page fault occured
@@ -61,28 +109,155 @@ class MemoryManager:
             raise InvalidPageNumber("Attempting to address an invalid page number")
 
         self.total_reads += 1
+        hooks = self._hooks
         # Check if the page is in memory
         if page_number in self._memory_pages:
+            if hooks is not None:
+                hooks.on_hit(self.total_reads, page_number)
             return False
 
         # Evict a page from memory if necessary
+        self.last_evicted_page = None
         if len(self._memory_pages) >= self.memory_page_count:
-            page_to_evict = self._evict_page()
+            self.last_evicted_page = self._evict_page()
+            if hooks is not None:
+                load_read = self._load_reads.pop(self.last_evicted_page, None)
+                age = None if load_read is None else self.total_reads - load_read
+                hooks.on_evict(self.total_reads, self.last_evicted_page, age)
 
         # Add page to memory
         self._memory_pages.add(page_number)
         self.total_page_faults += 1
-        self.page_faults.append(self.total_reads)
+        if self.fault_log is not None:
+            self.fault_log.record(self.total_reads)
+        if hooks is not None:
+            self._load_reads[page_number] = self.total_reads
+            hooks.on_fault(self.total_reads, page_number)
 
         return True
 
+    def read_pages(self, page_numbers: Iterable[int]) -> int:
+        """Read a batch of pages. Returns the number of page faults that occured
+
+        The page numbers are bounds checked up front, vectorized for NumPy arrays, and the
+        batch is then replayed by the policy's own inner loop instead of one read_page call
+        per page. While hooks are set the batch is read one read_page call at a time, so
+        every event reaches them.
+
+        :param page_numbers: The page numbers to read, in order
+        :type page_numbers: Iterable[int]
+        :return: The number of page faults in the batch
+        :rtype: int
+        """
+        if hasattr(page_numbers, "tolist"):
+            # NumPy arrays, checked without iterating in Python
+            if len(page_numbers) and (
+                page_numbers.min() < 0 or page_numbers.max() >= self.disk_page_count
+            ):
+                raise InvalidPageNumber("Attempting to address an invalid page number")
+            page_numbers = page_numbers.tolist()
+        else:
+            page_numbers = list(page_numbers)
+            if page_numbers and (
+                min(page_numbers) < 0 or max(page_numbers) >= self.disk_page_count
+            ):
+                raise InvalidPageNumber("Attempting to address an invalid page number")
+
+        page_faults_before = self.total_page_faults
+        if self._hooks is not None:
+            MemoryManager._read_pages(self, page_numbers)
+        else:
+            self._read_pages(page_numbers)
+        return self.total_page_faults - page_faults_before
+
+    def read_pages_faulted(self, page_numbers: Iterable[int]):
+        """Read a batch of pages like read_pages. Returns which reads of the batch faulted
+
+        Faults are caught with a temporary fault log, so the policy's inner loop is used as
+        is, and passed on to the memory manager's own fault log if it has one.
+
+        :param page_numbers: The page numbers to read, in order
+        :type page_numbers: Iterable[int]
+        :return: A boolean array with an entry per read, True where the read faulted
+        :rtype: numpy.ndarray
+        """
+        import numpy as np
+
+        fault_log = self.fault_log
+        batch_fault_log = ArrayFaultLog()
+        first_read = self.total_reads + 1
+        self.fault_log = batch_fault_log
+        try:
+            self.read_pages(page_numbers)
+        finally:
+            self.fault_log = fault_log
+
+        fault_reads = batch_fault_log.to_numpy()
+        if fault_log is not None:
+            for read_number in fault_reads.tolist():
+                fault_log.record(read_number)
+
+        faulted = np.zeros(self.total_reads - first_read + 1, dtype=bool)
+        faulted[fault_reads - first_read] = True
+        return faulted
+
+    def is_resident(self, page_number: int) -> bool:
+        """Whether a page is in memory"""
+        return page_number in self._memory_pages
+
+    def run(self, page_accesses: Iterable[int]) -> tuple[int, int]:
+        """Replay a whole trace. Returns the number of page hits and page faults
+
+        :param page_accesses: The pages to read. TraceStreams are read a chunk at a time.
+        :type page_accesses: Iterable[int]
+        :return: The number of page hits and the number of page faults during the run
+        :rtype: tuple[int, int]
+        """
+        reads_before = self.total_reads
+        page_faults = 0
+
+        if hasattr(page_accesses, "chunks"):
+            for chunk in page_accesses.chunks():
+                page_faults += self.read_pages(chunk)
+        else:
+            page_faults += self.read_pages(page_accesses)
+
+        return self.total_reads - reads_before - page_faults, page_faults
+
+    def _read_pages(self, page_numbers: list[int]):
+        """Read pages that have already been bounds checked. Policies override this with a tight loop"""
+        read_page = self.read_page
+        for page_number in page_numbers:
+            read_page(page_number)
+
+    def invalidate_page(self, page_number: int) -> bool:
+        """Drop a page from memory without evicting it, as when a cache hierarchy moves the page
+        to another tier. Returns whether the page was in memory
+
+        :param page_number: The page number to drop
+        :type page_number: int
+        :return: Whether the page was in memory
+        :rtype: bool
+        """
+        if page_number not in self._memory_pages:
+            return False
+
+        self._memory_pages.remove(page_number)
+        self._load_reads.pop(page_number, None)
+        self._forget_page(page_number)
+        return True
+
     def _evict_page(self) -> int:
         raise NotImplementedError()
 
+    def _forget_page(self, page_number: int):
+        """Remove a page dropped by invalidate_page from the policy's bookkeeping"""
+        raise NotImplementedError()
+
 
 class RandomReplacementMemoryManager(MemoryManager):
-    def __init__(self, memory_page_count, disk_page_count):
-        super().__init__(memory_page_count, disk_page_count)
+    def __init__(self, memory_page_count, disk_page_count, **kwargs):
+        super().__init__(memory_page_count, disk_page_count, **kwargs)
 
     def _evict_page(self) -> int:
         """Always returns the 0'th page for replacement"""
@@ -90,11 +265,37 @@ class RandomReplacementMemoryManager(MemoryManager):
         self._memory_pages.remove(page_to_evict)
         return page_to_evict
 
+    def _forget_page(self, page_number: int):
+        pass
+
+    def _read_pages(self, page_numbers: list[int]):
+        memory_pages = self._memory_pages
+        memory_page_count = self.memory_page_count
+        record_fault = self.fault_log.record if self.fault_log is not None else None
+        total_reads = self.total_reads
+        total_page_faults = self.total_page_faults
+
+        for page_number in page_numbers:
+            total_reads += 1
+            if page_number in memory_pages:
+                continue
+
+            if len(memory_pages) >= memory_page_count:
+                self._evict_page()
+
+            memory_pages.add(page_number)
+            total_page_faults += 1
+            if record_fault is not None:
+                record_fault(total_reads)
+
+        self.total_reads = total_reads
+        self.total_page_faults = total_page_faults
+
 
 class FifoMemoryManager(MemoryManager):
-    def __init__(self, memory_page_count, disk_page_count):
+    def __init__(self, memory_page_count, disk_page_count, **kwargs):
         self._input_queue = deque()
-        super().__init__(memory_page_count, disk_page_count)
+        super().__init__(memory_page_count, disk_page_count, **kwargs)
 
     def read_page(self, page_number: int, *args, **kwargs):
         page_fault = super(FifoMemoryManager, self).read_page(page_number, *args, **kwargs)
@@ -113,78 +314,166 @@ class FifoMemoryManager(MemoryManager):
 
         return page_at_head
 
+    def _forget_page(self, page_number: int):
+        # Linear in the queue length, invalidation is rare compared to reads
+        self._input_queue.remove(page_number)
+
+    def _read_pages(self, page_numbers: list[int]):
+        memory_pages = self._memory_pages
+        input_queue = self._input_queue
+        memory_page_count = self.memory_page_count
+        record_fault = self.fault_log.record if self.fault_log is not None else None
+        total_reads = self.total_reads
+        total_page_faults = self.total_page_faults
+
+        for page_number in page_numbers:
+            total_reads += 1
+            if page_number in memory_pages:
+                continue
+
+            if len(memory_pages) >= memory_page_count:
+                memory_pages.remove(input_queue.popleft())
+
+            memory_pages.add(page_number)
+            input_queue.append(page_number)
+            total_page_faults += 1
+            if record_fault is not None:
+                record_fault(total_reads)
+
+        self.total_reads = total_reads
+        self.total_page_faults = total_page_faults
+
 
 class LruMemoryManager(MemoryManager):
-    def __init__(self, memory_page_count, disk_page_count):
-        self._recency_statistics: dict[int, PageRead] = {}
-        super().__init__(memory_page_count, disk_page_count)
+    def __init__(self, memory_page_count, disk_page_count, **kwargs):
+        # Resident pages ordered from least to most recently used
+        self._recency_list: OrderedDict[int, None] = OrderedDict()
+        super().__init__(memory_page_count, disk_page_count, **kwargs)
 
     def read_page(self, page_number: int, *args, **kwargs):
         page_fault = super(LruMemoryManager, self).read_page(page_number, *args, **kwargs)
 
-        # Minus 1 for read epoch because the superclass read will add 1
-        read_epoch = self.total_reads - 1
-
         if page_fault:
-            # We need to add this record to the stastics
-            self._recency_statistics[page_number] = PageRead(page_number, read_epoch, frequency=0)
+            # Newly loaded pages are the most recently used
+            self._recency_list[page_number] = None
 
         else:
-            # We need to update the statistic because this has been used more recently.
-            self._recency_statistics[page_number].time = read_epoch
+            # Move the page to the most recently used end of the list
+            self._recency_list.move_to_end(page_number)
 
         return page_fault
 
     def _evict_page(self) -> int:
-        """Evict most recently used page"""
+        """Evict least recently used page"""
 
-        lru_page = min(self._recency_statistics, key=self._recency_statistics.get)
+        lru_page, _ = self._recency_list.popitem(last=False)
         # Remove the memory page
         self._memory_pages.remove(lru_page)
-        # Remove the page from the statistics as we're no longer tracking it.
-        self._recency_statistics.pop(lru_page)
 
         return lru_page
 
+    def _forget_page(self, page_number: int):
+        self._recency_list.pop(page_number)
+
+    def _read_pages(self, page_numbers: list[int]):
+        memory_pages = self._memory_pages
+        recency_list = self._recency_list
+        move_to_end = recency_list.move_to_end
+        memory_page_count = self.memory_page_count
+        record_fault = self.fault_log.record if self.fault_log is not None else None
+        total_reads = self.total_reads
+        total_page_faults = self.total_page_faults
+
+        for page_number in page_numbers:
+            total_reads += 1
+            if page_number in memory_pages:
+                move_to_end(page_number)
+                continue
+
+            if len(memory_pages) >= memory_page_count:
+                memory_pages.remove(recency_list.popitem(last=False)[0])
+
+            memory_pages.add(page_number)
+            recency_list[page_number] = None
+            total_page_faults += 1
+            if record_fault is not None:
+                record_fault(total_reads)
+
+        self.total_reads = total_reads
+        self.total_page_faults = total_page_faults
+
 
 class MruMemoryManager(MemoryManager):
-    def __init__(self, memory_page_count, disk_page_count):
-        self._recency_statistics: dict[int, PageRead] = {}
-        super().__init__(memory_page_count, disk_page_count)
+    def __init__(self, memory_page_count, disk_page_count, **kwargs):
+        # Resident pages ordered from least to most recently used
+        self._recency_list: OrderedDict[int, None] = OrderedDict()
+        super().__init__(memory_page_count, disk_page_count, **kwargs)
 
     def read_page(self, page_number: int, *args, **kwargs):
         page_fault = super(MruMemoryManager, self).read_page(page_number, *args, **kwargs)
 
-        # Minus 1 for read epoch because the superclass read will add 1
-        read_epoch = self.total_reads - 1
-
         if page_fault:
-            # We need to add this record to the stastics
-            self._recency_statistics[page_number] = PageRead(page_number, read_epoch, frequency=0)
+            # Newly loaded pages are the most recently used
+            self._recency_list[page_number] = None
 
         else:
-            # We need to update the statistic because this has been used more recently.
-            self._recency_statistics[page_number].time = read_epoch
+            # Move the page to the most recently used end of the list
+            self._recency_list.move_to_end(page_number)
 
         return page_fault
 
     def _evict_page(self) -> int:
         """Evict most recently used page"""
 
-        mru_page = max(self._recency_statistics, key=self._recency_statistics.get)
+        # Eviction happens before the faulting page is loaded, so the tail
+        # of the list is the most recently used resident page.
+        mru_page, _ = self._recency_list.popitem(last=True)
         # Remove the memory page
         self._memory_pages.remove(mru_page)
-        # Remove the page from the statistics as we're no longer tracking it.
-        self._recency_statistics.pop(mru_page)
 
         return mru_page
 
+    def _forget_page(self, page_number: int):
+        self._recency_list.pop(page_number)
+
+    def _read_pages(self, page_numbers: list[int]):
+        memory_pages = self._memory_pages
+        recency_list = self._recency_list
+        move_to_end = recency_list.move_to_end
+        memory_page_count = self.memory_page_count
+        record_fault = self.fault_log.record if self.fault_log is not None else None
+        total_reads = self.total_reads
+        total_page_faults = self.total_page_faults
+
+        for page_number in page_numbers:
+            total_reads += 1
+            if page_number in memory_pages:
+                move_to_end(page_number)
+                continue
+
+            if len(memory_pages) >= memory_page_count:
+                memory_pages.remove(recency_list.popitem(last=True)[0])
+
+            memory_pages.add(page_number)
+            recency_list[page_number] = None
+            total_page_faults += 1
+            if record_fault is not None:
+                record_fault(total_reads)
+
+        self.total_reads = total_reads
+        self.total_page_faults = total_page_faults
+
 
 class LfuMemoryManager(MemoryManager):
-    def __init__(self, memory_page_count, disk_page_count):
-        self._inactive_page_statistics: dict[int, PageRead] = {}
-        self._active_page_statistics: dict[int, PageRead] = {}
-        super().__init__(memory_page_count, disk_page_count)
+    def __init__(self, memory_page_count, disk_page_count, **kwargs):
+        # Reference counts are kept for every page ever read, resident or not
+        self._frequencies = array("q", bytes(8 * disk_page_count))
+        # Time each resident page was loaded, used to break frequency ties
+        self._load_times: dict[int, int] = {}
+        # Min-heap of (frequency, load time, page). Entries are invalidated lazily
+        # when a page is referenced again or evicted.
+        self._frequency_heap: list[tuple[int, int, int]] = []
+        super().__init__(memory_page_count, disk_page_count, **kwargs)
 
     def read_page(self, page_number: int, *args, **kwargs):
         page_fault = super(LfuMemoryManager, self).read_page(page_number, *args, **kwargs)
@@ -192,82 +481,130 @@ class LfuMemoryManager(MemoryManager):
         # Minus 1 for read epoch because the superclass read will add 1
         read_epoch = self.total_reads - 1
 
+        frequency = self._frequencies[page_number] + 1
+        self._frequencies[page_number] = frequency
+
         if page_fault:
-            page_read_stats = self._inactive_page_statistics.get(page_number)
-            if not page_read_stats:
-                # No page found in old stats, so we must increase it.
-                page_read_stats = PageRead(page_number, read_epoch, 0, sort_mode="frequency")
-
-            # increase page frequency
-            page_read_stats.frequency += 1
-
-            # add to the active pages
-            self._active_page_statistics[page_number] = page_read_stats
-            # drop from inactive pages
-            try:
-                self._inactive_page_statistics.pop(page_number)
-            except:
-                # swallow key errors here
-                pass
+            self._load_times[page_number] = read_epoch
 
-        else:
-            # Increase the frequency of active pages
-            self._active_page_statistics[page_number].frequency += 1
+        heapq.heappush(
+            self._frequency_heap, (frequency, self._load_times[page_number], page_number)
+        )
+
+        if len(self._frequency_heap) > 2 * len(self._load_times) + 64:
+            self._compact_frequency_heap()
 
         return page_fault
 
+    def _compact_frequency_heap(self):
+        """Rebuild the heap from the resident pages, dropping stale entries"""
+        self._frequency_heap[:] = [
+            (self._frequencies[page], load_time, page)
+            for page, load_time in self._load_times.items()
+        ]
+        heapq.heapify(self._frequency_heap)
+
     def _evict_page(self) -> int:
-        """Evict most recently used page"""
+        """Evict least frequently used page, ties go to the page loaded earliest"""
+
+        while True:
+            frequency, load_time, lfu_page = heapq.heappop(self._frequency_heap)
+            if (
+                self._load_times.get(lfu_page) == load_time
+                and self._frequencies[lfu_page] == frequency
+            ):
+                break
 
-        lfu_page = min(self._active_page_statistics, key=self._active_page_statistics.get)
         # Remove the memory page
         self._memory_pages.remove(lfu_page)
-        # Remove the page from the statistics as we're no longer tracking it.
-        lfu_page_stats = self._active_page_statistics.pop(lfu_page)
-        # Add it back to inactive page tracker
-        self._inactive_page_statistics[lfu_page_stats.page] = lfu_page_stats
+        # The frequency is retained in case the page is read again.
+        self._load_times.pop(lfu_page)
 
         return lfu_page
 
+    def _forget_page(self, page_number: int):
+        # Heap entries of the page are stale once its load time is gone
+        self._load_times.pop(page_number)
 
-class LruKPageStats():
+    def _read_pages(self, page_numbers: list[int]):
+        memory_pages = self._memory_pages
+        frequencies = self._frequencies
+        load_times = self._load_times
+        frequency_heap = self._frequency_heap
+        heappush = heapq.heappush
+        memory_page_count = self.memory_page_count
+        record_fault = self.fault_log.record if self.fault_log is not None else None
+        total_reads = self.total_reads
+        total_page_faults = self.total_page_faults
 
-    def __init__(self, page:int, k:int):
-        # Page number
-        self.page = page
-        # History of page references
-        self.history = [0] * k
-        # Max references to hold onto
-        self.k = k
-        # Correlated reference period
-        self.c_reference_period = -1
-        # Last time this page was referenced
-        self.last = -1
+        for page_number in page_numbers:
+            read_epoch = total_reads
+            total_reads += 1
 
-    def recalculate_history(self, new_read_time: int):
+            if page_number not in memory_pages:
+                if len(memory_pages) >= memory_page_count:
+                    self._evict_page()
 
-        # TODO: I think we need to check if history is uninitialized
-        if(self.history[0] == 0):
-            self.history[0] = new_read_time
+                memory_pages.add(page_number)
+                load_times[page_number] = read_epoch
+                total_page_faults += 1
+                if record_fault is not None:
+                    record_fault(total_reads)
 
-        else:
-            page_c_ref_period = self.last - self.history[0]
-            for i in range(1, self.k):
-                if(self.history[self.k-i-1] == 0):
-                    # don't calculate history if it is based on zero
-                    continue
-                self.history[self.k-i] = self.history[self.k-i-1] + page_c_ref_period
+            frequency = frequencies[page_number] + 1
+            frequencies[page_number] = frequency
+            heappush(frequency_heap, (frequency, load_times[page_number], page_number))
 
-        self.history[0] = new_read_time
+            if len(frequency_heap) > 2 * len(load_times) + 64:
+                self._compact_frequency_heap()
 
+        self.total_reads = total_reads
+        self.total_page_faults = total_page_faults
 
 
 class LruKMemoryManager(MemoryManager):
-    def __init__(self, memory_page_count, disk_page_count, k:int = 1, c_ref_period:int = 0):
+    def __init__(
+        self,
+        memory_page_count,
+        disk_page_count,
+        k: int = 1,
+        c_ref_period: int = 0,
+        retained_information_period: int | None = None,
+        **kwargs,
+    ):
+        """LRU-K replacement as described by O'Neil, O'Neil and Weikum.
+
+        Page statistics are kept in flat arrays indexed by page number rather than an object
+        per page, 8 * (k + 1) bytes per disk page: the k most recent uncorrelated references
+        and the time of the last reference.
+
+        :param k: The number of backward references tracked per page
+        :type k: int
+        :param c_ref_period: The correlated reference period
+        :type c_ref_period: int
+        :param retained_information_period: How many reads the history of a non-resident page
+            is kept after its last reference. None keeps history forever.
+        :type retained_information_period: int | None
+        """
         self._k = k
-        self._page_stats: dict[int, LruKPageStats] = {} 
         self._c_ref_period = c_ref_period
-        super().__init__(memory_page_count, disk_page_count)
+        self._retained_information_period = retained_information_period
+        # History of page references, k entries per page starting at page * k. Zero is unset.
+        self._history = array("q", bytes(8 * k * disk_page_count))
+        # Last time each page was referenced, -1 if the page has no history
+        self._last = array("q", [-1]) * disk_page_count
+        # Min-heap of (k-th backward reference, most recent reference, page) for resident
+        # pages. Entries are invalidated lazily when a page's history changes or it is evicted.
+        self._history_heap: list[tuple[int, int, int]] = []
+        # Min-heap of (time the page leaves its correlated reference period, history entry)
+        # for resident pages found ineligible during an eviction
+        self._correlated_heap: list[tuple[int, tuple[int, int, int]]] = []
+        # Min-heap of the history entries set aside in the correlated heap, to find the oldest
+        # when every resident page is inside its correlated reference period
+        self._parked_heap: list[tuple[int, int, int]] = []
+        # Min-heap of (last reference, page) for evicted pages whose history is retained
+        self._retained_heap: list[tuple[int, int]] = []
+        super().__init__(memory_page_count, disk_page_count, **kwargs)
 
     def read_page(self, page_number: int, *args, **kwargs):
         page_fault = super(LruKMemoryManager, self).read_page(page_number, *args, **kwargs)
@@ -276,51 +613,829 @@ class LruKMemoryManager(MemoryManager):
         read_time = self.total_reads - 1
 
         if page_fault:
-            page_stats = self._page_stats.get(page_number)
-            if not page_stats:
-                # Page is currently not tracked in statistics
-                page_stats = LruKPageStats(page_number, self._k)
-                self._page_stats[page_number] = page_stats
-
-
-            # shift history
-            for i in range(1, self._k):
-                page_stats.history[self._k-i] = page_stats.history[self._k-i-1]
-            page_stats.history[0] = read_time
-            page_stats.last = read_time
-
+            self._load_page_history(page_number, read_time)
 
         else:
             # Page was already in memory, we need to update statistics
-            page_stats = self._page_stats[page_number]
+            if read_time - self._last[page_number] > self._c_ref_period:
+                # We are outside of the crp, record in history
+                self._recalculate_history(page_number, read_time, self._last[page_number])
 
-            if read_time - page_stats.last > self._c_ref_period:
-                # We are outside of the crp, record in history 
-                page_stats.recalculate_history(read_time)
-            
             # Update the last access time
-            page_stats.last = read_time
+            self._last[page_number] = read_time
 
         return page_fault
 
+    def _load_page_history(self, page_number: int, read_time: int):
+        """Update the history of a page that was just loaded into memory"""
+        history = self._history
+        start = page_number * self._k
+
+        # shift history
+        for i in range(start + self._k - 1, start, -1):
+            history[i] = history[i - 1]
+        history[start] = read_time
+        self._last[page_number] = read_time
+
+        self._push_history(page_number)
+
+        if self._retained_information_period is not None:
+            self._purge_retained_history(read_time)
+
+    def _recalculate_history(self, page_number: int, new_read_time: int, last_read_time: int):
+        """Record an uncorrelated reference. The correlated reference period that just ended
+        counts as a single reference, so older references shift forward by its length, and
+        references that are still zero stay unset. Takes the time of the page's previous
+        reference, as its last time may already be updated."""
+        history = self._history
+        start = page_number * self._k
+
+        if history[start] != 0:
+            page_c_ref_period = last_read_time - history[start]
+            for i in range(start + self._k - 1, start, -1):
+                if history[i - 1] == 0:
+                    # don't calculate history if it is based on zero
+                    continue
+                history[i] = history[i - 1] + page_c_ref_period
+
+        history[start] = new_read_time
+        self._push_history(page_number)
+
+    def _read_pages(self, page_numbers: list[int]):
+        memory_pages = self._memory_pages
+        last = self._last
+        c_ref_period = self._c_ref_period
+        recalculate_history = self._recalculate_history
+        memory_page_count = self.memory_page_count
+        record_fault = self.fault_log.record if self.fault_log is not None else None
+        total_reads = self.total_reads
+        total_page_faults = self.total_page_faults
+
+        for page_number in page_numbers:
+            read_time = total_reads
+            total_reads += 1
+
+            if page_number in memory_pages:
+                if read_time - last[page_number] > c_ref_period:
+                    # We are outside of the crp, record in history
+                    recalculate_history(page_number, read_time, last[page_number])
+                last[page_number] = read_time
+                continue
+
+            if len(memory_pages) >= memory_page_count:
+                # Eviction looks at the read count to apply the correlated reference period
+                self.total_reads = total_reads
+                self._evict_page()
+
+            memory_pages.add(page_number)
+            total_page_faults += 1
+            if record_fault is not None:
+                record_fault(total_reads)
+            self._load_page_history(page_number, read_time)
+
+        self.total_reads = total_reads
+        self.total_page_faults = total_page_faults
+
+    def _history_entry(self, page_number: int) -> tuple[int, int, int]:
+        start = page_number * self._k
+        return (self._history[start + self._k - 1], self._history[start], page_number)
+
+    def _push_history(self, page_number: int):
+        heapq.heappush(self._history_heap, self._history_entry(page_number))
+
+        if len(self._history_heap) > 2 * len(self._memory_pages) + 64:
+            # Rebuild the heap from resident pages, dropping stale entries
+            self._history_heap[:] = [self._history_entry(page) for page in self._memory_pages]
+            heapq.heapify(self._history_heap)
+            self._correlated_heap.clear()
+            self._parked_heap.clear()
+
+    def _purge_retained_history(self, read_time: int):
+        """Forget the history of evicted pages not referenced within the retained information period"""
+        expiry = read_time - self._retained_information_period
+
+        while self._retained_heap and self._retained_heap[0][0] < expiry:
+            last, page = heapq.heappop(self._retained_heap)
+            if page not in self._memory_pages and self._last[page] == last:
+                start = page * self._k
+                self._history[start : start + self._k] = array("q", bytes(8 * self._k))
+                self._last[page] = -1
+
+    def has_history(self, page_number: int) -> bool:
+        """Whether the history of a page is being tracked"""
+        return self._last[page_number] != -1
+
     def _evict_page(self) -> int:
-        """Evict most recently used page"""
+        """Evict the page with the oldest k-th backward reference.
+
+        Pages referenced within the correlated reference period are not eligible. Ties,
+        such as pages with fewer than k references, go to the page whose most recent
+        uncorrelated reference is oldest, the subsidiary LRU rule of the LRU-K paper, so the
+        heap orders them and an eviction never scans the resident pages. When every page is
+        inside its correlated reference period, the same order picks among all of them.
+        """
 
         read_time = self.total_reads
-        minimum = read_time
-        victim = list(self._memory_pages)[0] # Select some arbitrary victim
 
-        for page in self._memory_pages:
-            page_stat = self._page_stats[page]
+        # Pages whose correlated reference period has passed become candidates again
+        while self._correlated_heap and self._correlated_heap[0][0] <= read_time:
+            heapq.heappush(self._history_heap, heapq.heappop(self._correlated_heap)[1])
 
-            if read_time - page_stat.last > self._c_ref_period and page_stat.history[self._k-1] < minimum:
-                # Select a page if it is out of correlated reference period and it has max k distance
-                # Tracking min because we're looking for the earliest time, hence oldest reference
-                minimum = page_stat.history[self._k-1]
-                victim = page
+        victim = None
+        while self._history_heap:
+            entry = heapq.heappop(self._history_heap)
+            page = entry[2]
+
+            if page not in self._memory_pages or self._history_entry(page) != entry:
+                # Stale entry
+                continue
 
+            if read_time - self._last[page] > self._c_ref_period:
+                # Select a page if it is out of correlated reference period
+                victim = page
+                break
+
+            # Set the page aside until its correlated reference period has passed
+            eligible_time = self._last[page] + self._c_ref_period + 1
+            heapq.heappush(self._correlated_heap, (eligible_time, entry))
+            heapq.heappush(self._parked_heap, entry)
+
+        if victim is None:
+            # Every resident page is inside its correlated reference period and was set aside
+            # since its history last changed, so the oldest valid parked entry is the oldest
+            while True:
+                entry = heapq.heappop(self._parked_heap)
+                if entry[2] in self._memory_pages and self._history_entry(entry[2]) == entry:
+                    victim = entry[2]
+                    break
+
+        elif len(self._parked_heap) > 2 * len(self._memory_pages) + 64:
+            # Drop parked entries that are stale or back in the history heap
+            self._parked_heap[:] = [entry for _, entry in self._correlated_heap]
+            heapq.heapify(self._parked_heap)
 
         # Remove the memory page
         self._memory_pages.remove(victim)
 
-        return victim
\ No newline at end of file
+        if self._retained_information_period is not None:
+            heapq.heappush(self._retained_heap, (self._last[victim], victim))
+
+        return victim
+
+    def _forget_page(self, page_number: int):
+        # Heap entries of non-resident pages are skipped, the history is kept as on eviction
+        if self._retained_information_period is not None:
+            heapq.heappush(self._retained_heap, (self._last[page_number], page_number))
+
+
+class LruKVariantSimulator:
+    def __init__(self, disk_page_count: int, variants: list[tuple[int, dict]]):
+        """Replays a trace through many LRU-K variants at once, such as every (k, c_ref_period)
+        pair and buffer size of a tuning sweep.
+
+        The trace is decoded once, and the last reference time of every page is kept once for
+        all variants since it does not depend on the policy. Each read works out how long ago
+        the page was last referenced and hands that to every variant, so hits inside a
+        variant's correlated reference period cost it only a set lookup.
+
+        Variants can not have a retained information period, as expiring history also resets
+        the last reference time.
+
+        :param disk_page_count: The number of pages on disk
+        :type disk_page_count: int
+        :param variants: The buffer size and LruKMemoryManager keyword arguments of each variant
+        :type variants: list[tuple[int, dict]]
+        """
+        self.disk_page_count = disk_page_count
+        self.total_reads = 0
+        self._last = array("q", [-1]) * disk_page_count
+
+        self.memory_managers: list[LruKMemoryManager] = []
+        for memory_page_count, kargs in variants:
+            if kargs.get("retained_information_period") is not None:
+                raise MemoryManagerException("Variants with a retained information period can not share history")
+
+            m = LruKMemoryManager(memory_page_count, disk_page_count, **kargs)
+            m._last = self._last
+            self.memory_managers.append(m)
+
+    def run(self, page_accesses: Iterable[int]):
+        """Replay a whole trace through every variant. TraceStreams are read a chunk at a time."""
+        if hasattr(page_accesses, "chunks"):
+            for chunk in page_accesses.chunks():
+                self.read_pages(chunk)
+        else:
+            self.read_pages(page_accesses)
+
+    def read_pages(self, page_numbers: Iterable[int]):
+        """Read a batch of pages through every variant"""
+        page_numbers = page_numbers.tolist() if hasattr(page_numbers, "tolist") else list(page_numbers)
+        if page_numbers and (min(page_numbers) < 0 or max(page_numbers) >= self.disk_page_count):
+            raise InvalidPageNumber("Attempting to address an invalid page number")
+
+        last = self._last
+        variants = [(m._memory_pages, m._c_ref_period, m) for m in self.memory_managers]
+        read_time = self.total_reads
+
+        for page_number in page_numbers:
+            last_read_time = last[page_number]
+            gap = read_time - last_read_time
+            last[page_number] = read_time
+
+            for memory_pages, c_ref_period, m in variants:
+                if page_number in memory_pages:
+                    if gap > c_ref_period:
+                        # We are outside of the crp, record in history
+                        m._recalculate_history(page_number, read_time, last_read_time)
+                    continue
+
+                if len(memory_pages) >= m.memory_page_count:
+                    # Eviction looks at the read count to apply the correlated reference period
+                    m.total_reads = read_time + 1
+                    m._evict_page()
+
+                memory_pages.add(page_number)
+                m.total_page_faults += 1
+                m._load_page_history(page_number, read_time)
+
+            read_time += 1
+
+        self.total_reads = read_time
+        for m in self.memory_managers:
+            m.total_reads = read_time
+
+
+class ClockMemoryManager(MemoryManager):
+    def __init__(self, memory_page_count, disk_page_count, max_usage_count: int = 1, **kwargs):
+        """CLOCK replacement. Every frame has a usage count, set when its page is loaded and
+        incremented up to max_usage_count on every hit. The clock hand sweeps the frames,
+        decrementing usage counts, and evicts the first page it finds with a count of zero.
+
+        With a max_usage_count of 1 the count is the classic reference bit.
+
+        :param max_usage_count: The largest usage count a frame can have
+        :type max_usage_count: int
+        """
+        self._max_usage_count = max_usage_count
+        # Page held in each frame, frames are filled in order until memory is full
+        self._frames: list[int] = []
+        self._usage_counts: list[int] = []
+        # Frame holding each resident page
+        self._frame_of_page: dict[int, int] = {}
+        self._clock_hand = 0
+        # Frames freed by evictions and invalidations
+        self._free_frames: list[int] = []
+        super().__init__(memory_page_count, disk_page_count, **kwargs)
+
+    def read_page(self, page_number: int, *args, **kwargs):
+        page_fault = super(ClockMemoryManager, self).read_page(page_number, *args, **kwargs)
+
+        if page_fault:
+            self._load_frame(page_number)
+
+        else:
+            frame = self._frame_of_page[page_number]
+            if self._usage_counts[frame] < self._max_usage_count:
+                self._usage_counts[frame] += 1
+
+        return page_fault
+
+    def _load_frame(self, page_number: int):
+        if self._free_frames:
+            frame = self._free_frames.pop()
+            self._frames[frame] = page_number
+            self._usage_counts[frame] = 1
+            self._frame_of_page[page_number] = frame
+        else:
+            # Memory is not full yet, take the next unused frame
+            self._frames.append(page_number)
+            self._usage_counts.append(1)
+            self._frame_of_page[page_number] = len(self._frames) - 1
+
+    def _evict_page(self) -> int:
+        """Sweep the clock hand until a frame with a usage count of zero is found"""
+
+        frame_count = len(self._frames)
+        usage_counts = self._usage_counts
+        while True:
+            frame = self._clock_hand
+            self._clock_hand = (frame + 1) % frame_count
+            if usage_counts[frame] == 0:
+                break
+            usage_counts[frame] -= 1
+
+        victim = self._frames[frame]
+        self._free_frames.append(frame)
+        self._frame_of_page.pop(victim)
+        self._memory_pages.remove(victim)
+
+        return victim
+
+    def _forget_page(self, page_number: int):
+        # Memory is no longer full, so the sweep can not reach the freed frame before reuse
+        frame = self._frame_of_page.pop(page_number)
+        self._frames[frame] = -1
+        self._usage_counts[frame] = 0
+        self._free_frames.append(frame)
+
+    def _read_pages(self, page_numbers: list[int]):
+        memory_pages = self._memory_pages
+        frame_of_page = self._frame_of_page
+        usage_counts = self._usage_counts
+        max_usage_count = self._max_usage_count
+        load_frame = self._load_frame
+        memory_page_count = self.memory_page_count
+        record_fault = self.fault_log.record if self.fault_log is not None else None
+        total_reads = self.total_reads
+        total_page_faults = self.total_page_faults
+
+        for page_number in page_numbers:
+            total_reads += 1
+            if page_number in memory_pages:
+                frame = frame_of_page[page_number]
+                if usage_counts[frame] < max_usage_count:
+                    usage_counts[frame] += 1
+                continue
+
+            if len(memory_pages) >= memory_page_count:
+                self._evict_page()
+
+            memory_pages.add(page_number)
+            load_frame(page_number)
+            total_page_faults += 1
+            if record_fault is not None:
+                record_fault(total_reads)
+
+        self.total_reads = total_reads
+        self.total_page_faults = total_page_faults
+
+
+class ClockSweepMemoryManager(ClockMemoryManager):
+    # BM_MAX_USAGE_COUNT in PostgreSQL's buffer manager
+    MAX_USAGE_COUNT = 5
+
+    def __init__(self, memory_page_count, disk_page_count, **kwargs):
+        """PostgreSQL's clock sweep, as in StrategyGetBuffer. Loading a buffer sets its usage
+        count to 1, each pin increments it up to 5, and the sweep decrements it until a buffer
+        with a usage count of zero is found."""
+        super().__init__(
+            memory_page_count, disk_page_count, max_usage_count=self.MAX_USAGE_COUNT, **kwargs
+        )
+
+
+class TwoQueueMemoryManager(MemoryManager):
+    def __init__(
+        self,
+        memory_page_count,
+        disk_page_count,
+        kin_fraction: float = 0.25,
+        kout_fraction: float = 0.5,
+        **kwargs,
+    ):
+        """Full 2Q replacement as described by Johnson and Shasha.
+
+        Pages read for the first time enter A1in, a FIFO. Pages evicted from A1in are
+        remembered in A1out, a FIFO of page numbers only, and pages read again while in A1out
+        are promoted to Am, an LRU list.
+
+        :param kin_fraction: Share of memory A1in may hold before it is evicted from first
+        :type kin_fraction: float
+        :param kout_fraction: Number of evicted pages remembered in A1out, as a share of memory
+        :type kout_fraction: float
+        """
+        self._kin = max(1, int(memory_page_count * kin_fraction))
+        self._kout = max(1, int(memory_page_count * kout_fraction))
+        # Resident pages read once, oldest first
+        self._a1in: OrderedDict[int, None] = OrderedDict()
+        # Page numbers recently evicted from A1in, oldest first
+        self._a1out: OrderedDict[int, None] = OrderedDict()
+        # Resident pages read again after leaving A1in, least recently used first
+        self._am: OrderedDict[int, None] = OrderedDict()
+        super().__init__(memory_page_count, disk_page_count, **kwargs)
+
+    def read_page(self, page_number: int, *args, **kwargs):
+        # Whether the page was remembered has to be known before an eviction updates A1out
+        remembered = page_number in self._a1out
+        page_fault = super(TwoQueueMemoryManager, self).read_page(page_number, *args, **kwargs)
+
+        if not page_fault:
+            if page_number in self._am:
+                self._am.move_to_end(page_number)
+            # Pages in A1in are left in place
+
+        elif remembered:
+            self._a1out.pop(page_number, None)
+            self._am[page_number] = None
+
+        else:
+            self._a1in[page_number] = None
+
+        return page_fault
+
+    def _evict_page(self) -> int:
+        """Evict from A1in once it is over its share of memory, otherwise from Am"""
+
+        if len(self._a1in) > self._kin or not self._am:
+            victim, _ = self._a1in.popitem(last=False)
+            # Remember the page in case it is read again soon
+            self._a1out[victim] = None
+            if len(self._a1out) > self._kout:
+                self._a1out.popitem(last=False)
+        else:
+            victim, _ = self._am.popitem(last=False)
+
+        self._memory_pages.remove(victim)
+
+        return victim
+
+    def _forget_page(self, page_number: int):
+        if page_number in self._a1in:
+            del self._a1in[page_number]
+        else:
+            del self._am[page_number]
+
+    def _read_pages(self, page_numbers: list[int]):
+        memory_pages = self._memory_pages
+        a1in = self._a1in
+        a1out = self._a1out
+        am = self._am
+        evict_page = self._evict_page
+        memory_page_count = self.memory_page_count
+        record_fault = self.fault_log.record if self.fault_log is not None else None
+        total_reads = self.total_reads
+        total_page_faults = self.total_page_faults
+
+        for page_number in page_numbers:
+            total_reads += 1
+            if page_number in memory_pages:
+                if page_number in am:
+                    am.move_to_end(page_number)
+                continue
+
+            remembered = page_number in a1out
+            if len(memory_pages) >= memory_page_count:
+                evict_page()
+
+            memory_pages.add(page_number)
+            if remembered:
+                a1out.pop(page_number, None)
+                am[page_number] = None
+            else:
+                a1in[page_number] = None
+            total_page_faults += 1
+            if record_fault is not None:
+                record_fault(total_reads)
+
+        self.total_reads = total_reads
+        self.total_page_faults = total_page_faults
+
+
+class ArcMemoryManager(MemoryManager):
+    def __init__(self, memory_page_count, disk_page_count, **kwargs):
+        """Adaptive Replacement Cache as described by Megiddo and Modha.
+
+        T1 and T2 hold resident pages read once and more than once. B1 and B2 remember the
+        page numbers recently evicted from each, and hits on them adapt the target size p of
+        T1 towards whichever list would have kept the page.
+        """
+        self._t1: OrderedDict[int, None] = OrderedDict()
+        self._t2: OrderedDict[int, None] = OrderedDict()
+        self._b1: OrderedDict[int, None] = OrderedDict()
+        self._b2: OrderedDict[int, None] = OrderedDict()
+        # Target size of T1
+        self._p = 0.0
+        # Page being read when an eviction happens, the replacement depends on it
+        self._incoming_page = -1
+        super().__init__(memory_page_count, disk_page_count, **kwargs)
+
+    def read_page(self, page_number: int, *args, **kwargs):
+        self._incoming_page = page_number
+        page_fault = super(ArcMemoryManager, self).read_page(page_number, *args, **kwargs)
+
+        if not page_fault:
+            # Pages read again move to the most recently used end of T2
+            if page_number in self._t1:
+                del self._t1[page_number]
+                self._t2[page_number] = None
+            else:
+                self._t2.move_to_end(page_number)
+
+        else:
+            if self.last_evicted_page is None:
+                # Memory only has room while the ghost lists are in use after invalidate_page
+                self._update_directory(page_number)
+
+            if page_number in self._b1 or page_number in self._b2:
+                self._b1.pop(page_number, None)
+                self._b2.pop(page_number, None)
+                self._t2[page_number] = None
+            else:
+                self._t1[page_number] = None
+
+        return page_fault
+
+    def _replace(self, page_number: int) -> int:
+        """Move the least recently used page of T1 or T2 to its ghost list"""
+        t1_size = len(self._t1)
+        if self._t1 and (
+            t1_size > self._p or (page_number in self._b2 and t1_size == self._p) or not self._t2
+        ):
+            victim, _ = self._t1.popitem(last=False)
+            self._b1[victim] = None
+        else:
+            victim, _ = self._t2.popitem(last=False)
+            self._b2[victim] = None
+
+        self._memory_pages.remove(victim)
+
+        return victim
+
+    def _update_directory(self, page_number: int):
+        """Adapt p on a ghost hit, or trim the ghost lists to make room for a new page"""
+        c = self.memory_page_count
+
+        if page_number in self._b1:
+            self._p = min(c, self._p + max(len(self._b2) / len(self._b1), 1))
+
+        elif page_number in self._b2:
+            self._p = max(0, self._p - max(len(self._b1) / len(self._b2), 1))
+
+        elif len(self._t1) + len(self._b1) >= c:
+            if self._b1:
+                self._b1.popitem(last=False)
+
+        elif len(self._t1) + len(self._t2) + len(self._b1) + len(self._b2) >= 2 * c:
+            self._b2.popitem(last=False)
+
+    def _evict_page(self) -> int:
+        """Make room for the incoming page"""
+
+        page_number = self._incoming_page
+
+        if (
+            len(self._t1) >= self.memory_page_count
+            and page_number not in self._b1
+            and page_number not in self._b2
+        ):
+            # T1 fills memory, evict from it without remembering the page
+            victim, _ = self._t1.popitem(last=False)
+            self._memory_pages.remove(victim)
+            return victim
+
+        self._update_directory(page_number)
+        return self._replace(page_number)
+
+    def _forget_page(self, page_number: int):
+        # The page moved elsewhere rather than being evicted, so it is not remembered
+        if page_number in self._t1:
+            del self._t1[page_number]
+        else:
+            del self._t2[page_number]
+
+
+class LirsMemoryManager(MemoryManager):
+    def __init__(
+        self,
+        memory_page_count,
+        disk_page_count,
+        hir_fraction: float = 0.01,
+        nonresident_limit: int | None = None,
+        **kwargs,
+    ):
+        """Low Inter-reference Recency Set replacement as described by Jiang and Zhang.
+
+        Pages are LIR (low inter-reference recency) or HIR. LIR pages are always resident.
+        Resident HIR pages wait in queue Q and are evicted first. Stack S orders pages by
+        recency and keeps non-resident HIR pages, so a page read again while still in S has
+        a small inter-reference recency and becomes LIR.
+
+        :param hir_fraction: Share of memory for resident HIR pages, at least one page
+        :type hir_fraction: float
+        :param nonresident_limit: Number of non-resident pages kept in S. Defaults to twice
+            the memory size.
+        :type nonresident_limit: int | None
+        """
+        if memory_page_count < 2:
+            raise MemoryManagerException("LIRS needs room for at least one LIR and one HIR page")
+
+        hir_page_count = max(1, int(memory_page_count * hir_fraction))
+        self._lir_capacity = memory_page_count - hir_page_count
+        self._nonresident_limit = (
+            nonresident_limit if nonresident_limit is not None else 2 * memory_page_count
+        )
+        # Stack S, bottom first. The bottom page is always LIR.
+        self._stack: OrderedDict[int, None] = OrderedDict()
+        # Queue Q of resident HIR pages, front first
+        self._hir_queue: OrderedDict[int, None] = OrderedDict()
+        self._lir_pages: Set[int] = set()
+        # Non-resident HIR pages in S, in the order they were evicted
+        self._nonresident: OrderedDict[int, None] = OrderedDict()
+        super().__init__(memory_page_count, disk_page_count, **kwargs)
+
+    def read_page(self, page_number: int, *args, **kwargs):
+        page_fault = super(LirsMemoryManager, self).read_page(page_number, *args, **kwargs)
+        stack = self._stack
+
+        if not page_fault and page_number in self._lir_pages:
+            stack.move_to_end(page_number)
+            self._prune_stack()
+
+        elif not page_fault:
+            # Resident HIR page
+            if page_number in stack:
+                stack.move_to_end(page_number)
+                self._hir_queue.pop(page_number)
+                self._promote(page_number)
+            else:
+                stack[page_number] = None
+                self._hir_queue.move_to_end(page_number)
+
+        elif len(self._lir_pages) < self._lir_capacity:
+            # Memory is filling up, pages start out as LIR until the LIR set is full
+            self._nonresident.pop(page_number, None)
+            stack[page_number] = None
+            stack.move_to_end(page_number)
+            self._lir_pages.add(page_number)
+            self._prune_stack()
+
+        elif page_number in stack:
+            # Non-resident HIR page read again while in S
+            self._nonresident.pop(page_number)
+            stack.move_to_end(page_number)
+            self._promote(page_number)
+
+        else:
+            stack[page_number] = None
+            self._hir_queue[page_number] = None
+
+        return page_fault
+
+    def _promote(self, page_number: int):
+        """Make a page at the top of S LIR, demoting the LIR page at the bottom of S to HIR"""
+        self._lir_pages.add(page_number)
+        self._prune_stack()
+
+        if len(self._lir_pages) > self._lir_capacity:
+            bottom, _ = self._stack.popitem(last=False)
+            self._lir_pages.remove(bottom)
+            self._hir_queue[bottom] = None
+            self._prune_stack()
+
+    def _prune_stack(self):
+        """Remove HIR pages from the bottom of S until the bottom page is LIR"""
+        stack = self._stack
+        while stack:
+            bottom = next(iter(stack))
+            if bottom in self._lir_pages:
+                break
+            stack.popitem(last=False)
+            self._nonresident.pop(bottom, None)
+
+    def _evict_page(self) -> int:
+        """Evict the resident HIR page at the front of Q"""
+
+        victim, _ = self._hir_queue.popitem(last=False)
+        self._memory_pages.remove(victim)
+
+        if victim in self._stack:
+            # Keep the page in S as a non-resident HIR page
+            self._nonresident[victim] = None
+            if len(self._nonresident) > self._nonresident_limit:
+                forgotten, _ = self._nonresident.popitem(last=False)
+                del self._stack[forgotten]
+
+        return victim
+
+    def _forget_page(self, page_number: int):
+        # The page moved elsewhere, so its recency is dropped along with it. Losing an LIR
+        # page leaves room for the next page loaded or promoted to become LIR without a
+        # demotion, and S may have HIR pages at the bottom until then.
+        self._lir_pages.discard(page_number)
+        self._hir_queue.pop(page_number, None)
+        self._stack.pop(page_number, None)
+        self._prune_stack()
+
+
+def next_use_indices(page_accesses):
+    """For every read of a trace, the index of the next read of the same page.
+
+    Reads of a page that is never read again get len(page_accesses). Computed with a stable
+    sort by page rather than a Python loop, so it takes well under a second on a 2M read trace.
+
+    :param page_accesses: The pages read, in order
+    :type page_accesses: Sequence[int] | numpy.ndarray
+    :return: The index of the next use of every read
+    :rtype: numpy.ndarray
+    """
+    import numpy as np
+
+    pages = np.asarray(page_accesses)
+    next_use = np.full(len(pages), len(pages), dtype=np.int64)
+    if len(pages) < 2:
+        return next_use
+
+    # Reads of the same page are adjacent and in trace order after a stable sort
+    order = np.argsort(pages, kind="stable")
+    same_page = pages[order[1:]] == pages[order[:-1]]
+    next_use[order[:-1][same_page]] = order[1:][same_page]
+    return next_use
+
+
+class BeladyMemoryManager(MemoryManager):
+    def __init__(self, memory_page_count, disk_page_count, page_accesses, next_use=None, **kwargs):
+        """Belady's offline optimal policy (OPT), which evicts the page whose next read is
+        furthest in the future. It has to be given the whole trace up front, and reads must
+        follow the trace from its start.
+
+        :param page_accesses: The trace that will be read
+        :type page_accesses: Sequence[int] | numpy.ndarray
+        :param next_use: Next use indices of the trace from next_use_indices, to share them
+            between managers replaying the same trace. Computed if not given.
+        :type next_use: numpy.ndarray | None
+        """
+        import numpy as np
+
+        self._trace = np.asarray(page_accesses)
+        if next_use is None:
+            next_use = next_use_indices(self._trace)
+        self._next_use = array("q", np.asarray(next_use, dtype=np.int64).tobytes())
+        # Index of the next read of each resident page
+        self._next_reads = array("q", bytes(8 * disk_page_count))
+        # Max-heap of (-next read, page). Entries are invalidated lazily when a page is
+        # read again or evicted.
+        self._next_read_heap: list[tuple[int, int]] = []
+        super().__init__(memory_page_count, disk_page_count, **kwargs)
+
+    def read_page(self, page_number: int, *args, **kwargs):
+        position = self.total_reads
+        if position >= len(self._trace) or self._trace[position] != page_number:
+            raise MemoryManagerException(f"Read {position} of page {page_number} does not follow the trace")
+
+        page_fault = super(BeladyMemoryManager, self).read_page(page_number, *args, **kwargs)
+
+        next_read = self._next_use[position]
+        self._next_reads[page_number] = next_read
+        heapq.heappush(self._next_read_heap, (-next_read, page_number))
+
+        if len(self._next_read_heap) > 2 * len(self._memory_pages) + 64:
+            self._compact_next_read_heap()
+
+        return page_fault
+
+    def _compact_next_read_heap(self):
+        """Rebuild the heap from the resident pages, dropping stale entries"""
+        self._next_read_heap[:] = [(-self._next_reads[page], page) for page in self._memory_pages]
+        heapq.heapify(self._next_read_heap)
+
+    def _evict_page(self) -> int:
+        """Evict the page read furthest in the future"""
+
+        while True:
+            negative_next_read, opt_page = heapq.heappop(self._next_read_heap)
+            if opt_page in self._memory_pages and self._next_reads[opt_page] == -negative_next_read:
+                break
+
+        self._memory_pages.remove(opt_page)
+
+        return opt_page
+
+    def _forget_page(self, page_number: int):
+        # Heap entries of non-resident pages are skipped
+        pass
+
+    def _read_pages(self, page_numbers: list[int]):
+        position = self.total_reads
+        if self._trace[position : position + len(page_numbers)].tolist() != page_numbers:
+            raise MemoryManagerException(f"Reads from {position} do not follow the trace")
+
+        memory_pages = self._memory_pages
+        next_use = self._next_use
+        next_reads = self._next_reads
+        next_read_heap = self._next_read_heap
+        heappush = heapq.heappush
+        memory_page_count = self.memory_page_count
+        record_fault = self.fault_log.record if self.fault_log is not None else None
+        total_reads = self.total_reads
+        total_page_faults = self.total_page_faults
+
+        for page_number in page_numbers:
+            next_read = next_use[total_reads]
+            total_reads += 1
+
+            if page_number not in memory_pages:
+                if len(memory_pages) >= memory_page_count:
+                    self._evict_page()
+
+                memory_pages.add(page_number)
+                total_page_faults += 1
+                if record_fault is not None:
+                    record_fault(total_reads)
+
+            next_reads[page_number] = next_read
+            heappush(next_read_heap, (-next_read, page_number))
+
+            if len(next_read_heap) > 2 * len(memory_pages) + 64:
+                self._compact_next_read_heap()
+
+        self.total_reads = total_reads
+        self.total_page_faults = total_page_faults
@@ -1,7 +1,13 @@
 from enum import Enum, auto
-from random import randint, gauss
 import json
+import os
 from functools import lru_cache
+from typing import Iterator
+
+import numpy as np
+
+from page_ids import PageIdIndex, is_tagged_line, line_prefix, parse_tagged_lines, strip_prefix
+from trace_format import converted_trace_filename, is_binary_trace, is_json_trace, open_binary_trace
 
 class WorkloadType(Enum):
     scan = auto()
@@ -12,59 +18,260 @@ class WorkloadType(Enum):
     postgres_trace_tpcc_high_concurrency = auto()
     postgres_trace_tpch = auto()
     pgbench = auto()
+    zipfian = auto()
+    hot_cold = auto()
+    loop_scan_random = auto()
+
+
+# Workloads produced by a generator rather than read from a trace
+SYNTHETIC_WORKLOADS = {
+    WorkloadType.scan,
+    WorkloadType.random,
+    WorkloadType.gaussian,
+    WorkloadType.zipfian,
+    WorkloadType.hot_cold,
+    WorkloadType.loop_scan_random,
+}
+
+# postgresql_tracing/data, found from this file so traces load from any working directory
+TRACE_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "postgresql_tracing", "data")
+
+# Traces gathered from PostgreSQL in postgresql_tracing/data
+TRACE_FILES = {
+    WorkloadType.postgres_trace_tpcc: os.path.join(TRACE_DATA_DIR, "tpcc", "benchbase-disk-reads-default-configuration"),
+    WorkloadType.postgres_trace_tpcc_high_concurrency: os.path.join(TRACE_DATA_DIR, "tpcc", "benchbase-disk-reads-high-concurrency"),
+    WorkloadType.postgres_trace_tpcc_medium_concurrency: os.path.join(TRACE_DATA_DIR, "tpcc", "benchbase-disk-reads-medium-concurrency"),
+    WorkloadType.postgres_trace_tpch: os.path.join(TRACE_DATA_DIR, "tpch", "benchbase_tpch_reads"),
+    WorkloadType.pgbench: os.path.join(TRACE_DATA_DIR, "pages_requested"),
+}
+
+# Synthetic traces are generated this many reads at a time to bound temporary memory
+GENERATION_CHUNK_SIZE = 1 << 22
 
 
-@lru_cache(maxsize=256)
 def generate_page_accesses(
-    total_page_count: int, total_reads: int, workload: WorkloadType
+    total_page_count: int, total_reads: int, workload: WorkloadType, seed: int | None = None
 ) -> list[int]:
     """Generates a list of page accesses as if it was a linear scan.
 
+    Traces and seeded synthetic workloads are cached, since they are the same every time.
+    Unseeded synthetic workloads are generated afresh on every call.
+
     :param total_page_count: The total number of pages that the scan will access.
     :type total_page_count: int
     :param total_reads: The total number of reads that will occur
     :type total_reads: int
     :param workload: The type of page accesses that will occur
     :type workload: WorkloadType
+    :param seed: Seed for synthetic workloads
+    :type seed: int | None
     :return: A list of len(total_reads) containing the pages to be read.
     :rtype: list[int]
     """
+    if workload in SYNTHETIC_WORKLOADS and seed is None:
+        return _generate_page_accesses.__wrapped__(total_page_count, total_reads, workload, seed)
+    return _generate_page_accesses(total_page_count, total_reads, workload, seed)
+
+
+@lru_cache(maxsize=256)
+def _generate_page_accesses(
+    total_page_count: int, total_reads: int, workload: WorkloadType, seed: int | None
+) -> list[int]:
     read_order = []
 
-    if workload == WorkloadType.scan:
-        for i in range(total_reads):
-            read_order.append(i % total_page_count)
-    elif workload == WorkloadType.random:
-        for i in range(total_reads):
-            read_order.append(randint(0, total_page_count - 1))
-    elif workload == WorkloadType.gaussian:
-        middle = int(total_page_count / 2)
-        # 3 standard deviations should encapsulate almost all our data.
-        std_deviation_size = int(middle / 3)
-
-        while len(read_order) != total_reads:
-            page_number = int(gauss(mu=middle, sigma=std_deviation_size))
-
-            if page_number >= 0 and page_number < total_page_count:
-                # Only take the page number if it fits in our bounds
-                read_order.append(page_number)
-    elif workload == WorkloadType.postgres_trace_tpcc:
-        read_order = read_trace_from_file("../postgresql_tracing/data/tpcc/benchbase-disk-reads-default-configuration")
-    elif workload == WorkloadType.postgres_trace_tpcc_high_concurrency:
-        read_order = read_trace_from_file("../postgresql_tracing/data/tpcc/benchbase-disk-reads-high-concurrency")
-    elif workload == WorkloadType.postgres_trace_tpcc_medium_concurrency:
-        read_order = read_trace_from_file("../postgresql_tracing/data/tpcc/benchbase-disk-reads-medium-concurrency")
-    elif workload == WorkloadType.postgres_trace_tpch:
-        read_order =  read_trace_from_file("../postgresql_tracing/data/tpch/benchbase_tpch_reads")
-    elif workload == WorkloadType.pgbench:
-        read_order = json.loads(open('../postgresql_tracing/data/pages_requested').read())
+    if workload in SYNTHETIC_WORKLOADS:
+        read_order = generate_page_access_array(total_page_count, total_reads, workload, seed).tolist()
+    elif workload in TRACE_FILES:
+        read_order = read_trace_from_file(TRACE_FILES[workload])
     return read_order[0:2000000]
 
 
-def read_trace_from_file(filename: str) -> []:
-    output = []
+def read_trace_from_file(filename: str) -> list[int]:
+    """Reads a trace of page numbers, or of buffer tags interned to dense page ids"""
+    if _binary_trace_filename(filename):
+        return read_trace_array(filename).tolist()
+
+    if is_json_trace(filename):
+        with open(filename) as trace_file:
+            return json.load(trace_file)
+
     with open(filename) as trace_file:
-        for line in trace_file:
-            output.append(int(line))
+        lines = [line for line in trace_file if line.strip()]
+
+    if lines:
+        lines = strip_prefix(lines, line_prefix(lines[0]))
+    if lines and is_tagged_line(lines[0]):
+        return PageIdIndex().intern(parse_tagged_lines(lines)).tolist()
+    return [int(line) for line in lines]
+
+
+def read_trace_array(filename: str) -> np.ndarray:
+    """Reads a trace as a NumPy array.
+
+    Binary traces, or text traces that have been converted with trace_format.py, are memory
+    mapped without parsing or copying.
+
+    :param filename: The trace to read
+    :type filename: str
+    :return: The pages read, in order
+    :rtype: np.ndarray
+    """
+    binary_filename = _binary_trace_filename(filename)
+    if binary_filename:
+        return open_binary_trace(binary_filename).pages
+
+    return np.asarray(read_trace_from_file(filename), dtype=np.int64)
+
+
+def _binary_trace_filename(filename: str) -> str | None:
+    """The binary version of a trace, if there is one"""
+    converted_filename = converted_trace_filename(filename)
+    if converted_filename:
+        return converted_filename
+    if os.path.exists(filename) and is_binary_trace(filename):
+        return filename
+    return None
+
+
+def generate_page_access_array(
+    total_page_count: int,
+    total_reads: int,
+    workload: WorkloadType,
+    seed: int | None = None,
+    *,
+    zipf_exponent: float = 1.0,
+    hot_page_fraction: float = 0.2,
+    hot_access_fraction: float = 0.8,
+    loop_page_fraction: float = 0.1,
+    loop_access_fraction: float = 0.5,
+) -> np.ndarray:
+    """Generates a synthetic workload as a NumPy array, vectorized in chunks.
+
+    :param total_page_count: The total number of pages that the workload will access.
+    :type total_page_count: int
+    :param total_reads: The total number of reads that will occur
+    :type total_reads: int
+    :param workload: The type of page accesses that will occur, must be synthetic
+    :type workload: WorkloadType
+    :param seed: Seed for the random generator. The same seed gives the same workload.
+    :type seed: int | None
+    :param zipf_exponent: Skew of the zipfian workload. Page i is read in proportion to 1/(i+1)^s.
+    :type zipf_exponent: float
+    :param hot_page_fraction: Fraction of pages that are hot in the hot/cold workload
+    :type hot_page_fraction: float
+    :param hot_access_fraction: Fraction of reads that go to hot pages in the hot/cold workload
+    :type hot_access_fraction: float
+    :param loop_page_fraction: Fraction of pages scanned in a loop in the loop/random workload
+    :type loop_page_fraction: float
+    :param loop_access_fraction: Fraction of reads that continue the loop in the loop/random
+        workload, the rest are uniformly random
+    :type loop_access_fraction: float
+    :return: An int32 array of len(total_reads), or int64 if page numbers do not fit in int32.
+    :rtype: np.ndarray
+    """
+    dtype = np.int32 if total_page_count <= np.iinfo(np.int32).max else np.int64
+    read_order = np.empty(total_reads, dtype=dtype)
+
+    start = 0
+    for chunk in generate_page_access_chunks(
+        total_page_count,
+        total_reads,
+        workload,
+        seed,
+        zipf_exponent=zipf_exponent,
+        hot_page_fraction=hot_page_fraction,
+        hot_access_fraction=hot_access_fraction,
+        loop_page_fraction=loop_page_fraction,
+        loop_access_fraction=loop_access_fraction,
+    ):
+        read_order[start : start + len(chunk)] = chunk
+        start += len(chunk)
+
+    return read_order
+
+
+def generate_page_access_chunks(
+    total_page_count: int,
+    total_reads: int,
+    workload: WorkloadType,
+    seed: int | None = None,
+    chunk_size: int = GENERATION_CHUNK_SIZE,
+    *,
+    zipf_exponent: float = 1.0,
+    hot_page_fraction: float = 0.2,
+    hot_access_fraction: float = 0.8,
+    loop_page_fraction: float = 0.1,
+    loop_access_fraction: float = 0.5,
+) -> Iterator[np.ndarray]:
+    """Generates a synthetic workload lazily, one NumPy array of at most chunk_size reads at a time.
+
+    Takes the same parameters as generate_page_access_array. For the same seed the
+    concatenated chunks are the workload generate_page_access_array returns, whatever the
+    chunk size.
+    """
+    if workload not in SYNTHETIC_WORKLOADS:
+        raise ValueError(f"{workload.name} is not a synthetic workload")
+
+    dtype = np.int32 if total_page_count <= np.iinfo(np.int32).max else np.int64
+    # Independent generators for choosing between access patterns and for each pattern's pages.
+    # Each draws its values in sequence, so the workload does not depend on the chunk size.
+    rng, hot_rng, cold_rng = [
+        np.random.default_rng(seed_sequence)
+        for seed_sequence in np.random.SeedSequence(seed).spawn(3)
+    ]
+
+    if workload == WorkloadType.zipfian:
+        # Inverse transform sampling over the bounded zipf distribution
+        weights = np.arange(1, total_page_count + 1, dtype=np.float64) ** -zipf_exponent
+        zipf_cdf = np.cumsum(weights)
+        zipf_cdf /= zipf_cdf[-1]
+
+    hot_page_count = min(max(1, int(total_page_count * hot_page_fraction)), total_page_count)
+    # Every page is hot if the fraction covers them all
+    cold_page_start = hot_page_count if hot_page_count < total_page_count else 0
+    loop_page_count = max(1, int(total_page_count * loop_page_fraction))
+    loop_position = 0
+
+    for start in range(0, total_reads, chunk_size):
+        chunk = np.empty(min(chunk_size, total_reads - start), dtype=dtype)
+
+        if workload == WorkloadType.scan:
+            chunk[:] = np.arange(start, start + len(chunk), dtype=np.int64) % total_page_count
+        elif workload == WorkloadType.random:
+            chunk[:] = rng.integers(0, total_page_count, size=len(chunk))
+        elif workload == WorkloadType.gaussian:
+            middle = int(total_page_count / 2)
+            # 3 standard deviations should encapsulate almost all our data.
+            std_deviation_size = int(middle / 3)
+
+            filled = 0
+            while filled != len(chunk):
+                samples = rng.normal(middle, std_deviation_size, size=len(chunk) - filled)
+                # Truncate like int() and only take page numbers that fit in our bounds
+                samples = np.trunc(samples)
+                samples = samples[(samples >= 0) & (samples < total_page_count)]
+                chunk[filled : filled + len(samples)] = samples
+                filled += len(samples)
+        elif workload == WorkloadType.zipfian:
+            chunk[:] = np.searchsorted(zipf_cdf, rng.random(len(chunk)), side="right")
+            # Guard against floating point error at the top of the distribution
+            np.minimum(chunk, total_page_count - 1, out=chunk)
+        elif workload == WorkloadType.hot_cold:
+            hot = rng.random(len(chunk)) < hot_access_fraction
+            chunk[:] = np.where(
+                hot,
+                hot_rng.integers(0, hot_page_count, size=len(chunk)),
+                cold_rng.integers(cold_page_start, total_page_count, size=len(chunk)),
+            )
+        elif workload == WorkloadType.loop_scan_random:
+            looping = rng.random(len(chunk)) < loop_access_fraction
+            # Each looping read continues the scan where the previous one left off
+            loop_steps = np.cumsum(looping) - 1 + loop_position
+            loop_position += int(np.count_nonzero(looping))
+            chunk[:] = np.where(
+                looping,
+                loop_steps % loop_page_count,
+                cold_rng.integers(0, total_page_count, size=len(chunk)),
+            )
 
-    return output
+        yield chunk
@@ -0,0 +1,309 @@
+"""Dense page ids for traces that name pages by relation.
+
+page_reads.stp prints every read as "tablespace database relation fork block", the buffer tag
+PostgreSQL looks pages up by. Block numbers restart at 0 in every relation fork, so the
+simulator can not use them as page numbers directly. A PageIdIndex interns each tag to a dense
+page id, numbered in the order pages are first read, and remembers which relation fork each
+page belongs to so hit ratios can be broken down per relation.
+
+Traces of a single backend may start every line with a timestamp, so they can be merged with
+the traces of other backends in the order the reads happened. Lines may then have an R or W
+op before the page, for traces that record which accesses dirty the page.
+"""
+import argparse
+from array import array
+from typing import Iterable, Sequence
+
+import numpy as np
+
+# (tablespace, database, relation, fork) of a relation fork, as PostgreSQL's RelFileNode and ForkNumber
+RelationFork = tuple[int, int, int, int]
+
+# Names of PostgreSQL's fork numbers
+FORK_NAMES = {0: "main", 1: "fsm", 2: "vm", 3: "init"}
+
+# Columns of a tagged read
+TAG_FIELDS = 5
+
+# A relation fork maps blocks to page ids with an array as long as its largest block while that
+# is at most this many entries per page read, or this many entries whatever the pages read, and
+# with a dict once it is not
+DENSE_BLOCKS_PER_PAGE = 4
+DENSE_MIN_BLOCKS = 1024
+
+
+def is_tagged_line(line: str) -> bool:
+    """Whether a line of a text trace is a buffer tag rather than a bare page number"""
+    return len(line.split()) == TAG_FIELDS
+
+
+# Ops a line can have before its page, and whether they write the page
+OPS = {"R": False, "W": True}
+
+
+def line_prefix(line: str) -> tuple[bool, bool]:
+    """Whether a line of a text trace starts with a timestamp, and whether it then has an op,
+    before its page number or buffer tag"""
+    fields = line.split()
+    if fields[0] in OPS:
+        return False, True
+    if len(fields) > 1 and fields[1] in OPS:
+        return True, True
+    return len(fields) in (2, TAG_FIELDS + 1), False
+
+
+def strip_prefix(lines: Sequence[str], prefix: tuple[bool, bool]) -> list[str]:
+    """The lines of a text trace without the timestamp and op line_prefix found"""
+    count = sum(prefix)
+    if not count:
+        return list(lines)
+    return [line.split(maxsplit=count)[count] for line in lines]
+
+
+def parse_tagged_lines(lines: Sequence[str]) -> np.ndarray:
+    """Parses lines of "tablespace database relation fork block" into an array of tags
+
+    :param lines: The lines of a text trace, without blank lines
+    :type lines: Sequence[str]
+    :return: An array with a row per read and a column per field
+    :rtype: numpy.ndarray
+    """
+    fields = np.array(" ".join(lines).split(), dtype=np.int64)
+    if len(fields) != len(lines) * TAG_FIELDS:
+        raise ValueError(f"Every line of a tagged trace needs {TAG_FIELDS} fields")
+    return fields.reshape(-1, TAG_FIELDS)
+
+
+def _first_appearance_order(keys: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # The distinct rows of keys in the order they first appear, and each row's index among them
+    unique_keys, first, inverse = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+    order = np.argsort(first, kind="stable")
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    return unique_keys[order], rank[inverse.reshape(-1)]
+
+
+class PageIdIndex:
+    """Interns (tablespace, database, relation, fork, block) tags to dense page ids.
+
+    Ids are handed out in the order pages are first read, so the same trace always gets the
+    same ids however it is chunked, and the largest id is the number of distinct pages read.
+    Each relation fork keeps an array from block number to page id, which is compact because
+    the blocks read of a relation are mostly contiguous from 0. A relation fork whose blocks
+    read are too far apart for that, such as a few blocks at the end of a large table, keeps a
+    dict instead, so memory follows the pages read rather than the largest block number.
+    """
+
+    def __init__(self):
+        self.relations: list[RelationFork] = []
+        self._relation_ids: dict[RelationFork, int] = {}
+        # Page id of every block of each relation fork, -1 if it was not read, or a dict of the
+        # blocks read of a sparse relation fork
+        self._block_pages: list[np.ndarray | dict[int, int]] = []
+        # Pages read of each relation fork
+        self._relation_page_counts: list[int] = []
+        # Relation fork and block of every page id
+        self._page_relations = array("q")
+        self._page_blocks = array("q")
+
+    def __len__(self) -> int:
+        return len(self._page_relations)
+
+    def _relation_id(self, relation: RelationFork) -> int:
+        relation_id = self._relation_ids.get(relation)
+        if relation_id is None:
+            relation_id = self._relation_ids[relation] = len(self.relations)
+            self.relations.append(relation)
+            self._block_pages.append(np.full(0, -1, dtype=np.int64))
+            self._relation_page_counts.append(0)
+        return relation_id
+
+    def _lookup(self, relation_ids: np.ndarray, blocks: np.ndarray) -> np.ndarray:
+        pages = np.full(len(blocks), -1, dtype=np.int64)
+        order = np.argsort(relation_ids, kind="stable")
+        for group in np.split(order, np.flatnonzero(np.diff(relation_ids[order])) + 1):
+            block_pages = self._block_pages[relation_ids[group[0]]]
+            group_blocks = blocks[group]
+            if isinstance(block_pages, dict):
+                pages[group] = np.fromiter(
+                    (block_pages.get(block, -1) for block in group_blocks.tolist()),
+                    dtype=np.int64,
+                    count=len(group),
+                )
+            else:
+                known = group_blocks < len(block_pages)
+                pages[group[known]] = block_pages[group_blocks[known]]
+        return pages
+
+    def _add_blocks(self, relation_id: int, blocks: np.ndarray, pages: np.ndarray):
+        # Give blocks of a relation fork that were not read before their page ids
+        block_pages = self._block_pages[relation_id]
+        page_count = self._relation_page_counts[relation_id] = (
+            self._relation_page_counts[relation_id] + len(blocks)
+        )
+
+        if isinstance(block_pages, np.ndarray):
+            size = int(blocks.max()) + 1
+            if size > len(block_pages):
+                max_size = max(DENSE_MIN_BLOCKS, DENSE_BLOCKS_PER_PAGE * page_count)
+                if size > max_size:
+                    known = np.flatnonzero(block_pages >= 0)
+                    block_pages = dict(zip(known.tolist(), block_pages[known].tolist()))
+                else:
+                    grown_size = min(max(size, 2 * len(block_pages)), max_size)
+                    grown = np.full(grown_size, -1, dtype=np.int64)
+                    grown[: len(block_pages)] = block_pages
+                    block_pages = grown
+                self._block_pages[relation_id] = block_pages
+
+        if isinstance(block_pages, dict):
+            block_pages.update(zip(blocks.tolist(), pages.tolist()))
+        else:
+            block_pages[blocks] = pages
+
+    def intern(self, tags: np.ndarray) -> np.ndarray:
+        """The page ids of a chunk of tagged reads, giving new pages the next free ids
+
+        :param tags: A row per read of tablespace, database, relation, fork and block
+        :type tags: numpy.ndarray
+        :return: The page id of every read
+        :rtype: numpy.ndarray
+        """
+        tags = np.asarray(tags, dtype=np.int64).reshape(-1, TAG_FIELDS)
+        if not len(tags):
+            return np.zeros(0, dtype=np.int64)
+        if tags.min() < 0:
+            raise ValueError("Buffer tags can not be negative")
+
+        chunk_relations, relation_index = _first_appearance_order(tags[:, :4])
+        relation_ids = np.array(
+            [self._relation_id(tuple(relation)) for relation in chunk_relations.tolist()], dtype=np.int64
+        )[relation_index]
+        blocks = tags[:, 4]
+
+        pages = self._lookup(relation_ids, blocks)
+        unknown = np.flatnonzero(pages < 0)
+        if len(unknown):
+            new_pages, _ = _first_appearance_order(np.column_stack([relation_ids[unknown], blocks[unknown]]))
+            new_ids = np.arange(len(self), len(self) + len(new_pages))
+            for relation_id in np.unique(new_pages[:, 0]).tolist():
+                in_relation = new_pages[:, 0] == relation_id
+                self._add_blocks(relation_id, new_pages[in_relation, 1], new_ids[in_relation])
+
+            self._page_relations.frombytes(new_pages[:, 0].astype(np.int64).tobytes())
+            self._page_blocks.frombytes(new_pages[:, 1].astype(np.int64).tobytes())
+            pages[unknown] = self._lookup(relation_ids[unknown], blocks[unknown])
+
+        return pages
+
+    def page_relations(self) -> np.ndarray:
+        """The index in relations of the relation fork of every page id"""
+        return np.frombuffer(self._page_relations, dtype=np.int64)
+
+    def page_blocks(self) -> np.ndarray:
+        """The block number of every page id within its relation fork"""
+        return np.frombuffer(self._page_blocks, dtype=np.int64)
+
+    def tag(self, page: int) -> tuple[int, int, int, int, int]:
+        """The (tablespace, database, relation, fork, block) a page id was interned from"""
+        return (*self.relations[self._page_relations[page]], self._page_blocks[page])
+
+    def tags(self, pages: np.ndarray) -> np.ndarray:
+        """The tags of an array of page ids, a row per page as intern takes them"""
+        pages = np.asarray(pages, dtype=np.int64)
+        relations = np.asarray(self.relations, dtype=np.int64).reshape(-1, 4)
+        return np.column_stack([relations[self.page_relations()[pages]], self.page_blocks()[pages]])
+
+    def to_metadata(self) -> dict:
+        """The index as JSON serializable values, to store with a binary trace"""
+        return {
+            "relations": [list(relation) for relation in self.relations],
+            "page_relations": self._page_relations.tolist(),
+            "page_blocks": self._page_blocks.tolist(),
+        }
+
+    @classmethod
+    def from_metadata(cls, metadata: dict) -> "PageIdIndex":
+        """Rebuilds an index stored with to_metadata"""
+        index = cls()
+        relations = np.asarray(metadata["page_relations"], dtype=np.int64)
+        blocks = np.asarray(metadata["page_blocks"], dtype=np.int64)
+        for relation in metadata["relations"]:
+            index._relation_id(tuple(relation))
+        if len(relations):
+            tags = np.column_stack([np.asarray(index.relations, dtype=np.int64)[relations], blocks])
+            index.intern(tags)
+        return index
+
+
+def relation_hit_ratios(
+    page_accesses: Iterable[int], fault_reads: Iterable[int], page_index: PageIdIndex
+) -> dict[RelationFork, tuple[int, float]]:
+    """Breaks the hit ratio of a simulation down by relation fork
+
+    :param page_accesses: The page ids read, in order
+    :type page_accesses: Iterable[int]
+    :param fault_reads: The read numbers of the page faults, as recorded by a FaultLog
+    :type fault_reads: Iterable[int]
+    :param page_index: The index the page ids were interned with
+    :type page_index: PageIdIndex
+    :return: The reads and hit ratio of every relation fork that was read, most read first
+    :rtype: dict[RelationFork, tuple[int, float]]
+    """
+    relations = page_index.page_relations()[np.asarray(page_accesses, dtype=np.int64)]
+    fault_reads = np.asarray(fault_reads, dtype=np.int64)
+
+    reads = np.bincount(relations, minlength=len(page_index.relations))
+    faults = np.bincount(relations[fault_reads - 1], minlength=len(page_index.relations))
+
+    return {
+        page_index.relations[relation_id]: (
+            int(reads[relation_id]),
+            float((reads[relation_id] - faults[relation_id]) / reads[relation_id]),
+        )
+        for relation_id in np.argsort(-reads, kind="stable").tolist()
+        if reads[relation_id]
+    }
+
+
+def relation_name(relation: RelationFork) -> str:
+    """A relation fork as its file under the data directory, like base/16384/2619_fsm"""
+    tablespace, database, relfilenode, fork = relation
+    suffix = f"_{FORK_NAMES.get(fork, fork)}" if fork else ""
+    # 1663 is pg_default and 1664 is pg_global, other tablespaces are linked in pg_tblspc
+    if tablespace == 1663:
+        return f"base/{database}/{relfilenode}{suffix}"
+    if tablespace == 1664:
+        return f"global/{relfilenode}{suffix}"
+    return f"pg_tblspc/{tablespace}/{database}/{relfilenode}{suffix}"
+
+
+def main():
+    from experiment import add_policy_arguments, policy_from_args
+    from sweep import simulate_relation_hit_ratios
+    from trace_stream import FileTraceStream
+
+    parser = argparse.ArgumentParser(description="Hit ratio of every relation in a trace of buffer tags")
+    parser.add_argument("trace", help="A trace printed by page_reads.stp, or its binary version")
+    add_policy_arguments(parser)
+    parser.add_argument("--buffer-size", type=int, default=1000, help="Pages that fit in memory")
+    parser.add_argument("--top", type=int, default=20, help="How many of the most read relations to list")
+    args = parser.parse_args()
+
+    trace_filename = FileTraceStream(args.trace).binary_filename()
+    if trace_filename is None:
+        from trace_format import convert_text_trace
+
+        trace_filename = convert_text_trace(args.trace)
+
+    memory_manager, kargs = policy_from_args(parser, args)
+    try:
+        hit_ratios = simulate_relation_hit_ratios(trace_filename, memory_manager, kargs, args.buffer_size)
+    except ValueError as e:
+        parser.error(str(e))
+    for relation, (reads, hit_ratio) in list(hit_ratios.items())[: args.top]:
+        print(f"{relation_name(relation):<32} {reads:>12,} reads {hit_ratio:>8.1%} hits")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+import functools
+import hashlib
+import inspect
+import json
+import os
+import sys
+from typing import Iterable
+
+import numpy as np
+
+# Bump when simulation results change meaning, so older cached results are not reused
+CACHE_VERSION = 3
+
+# Bytes of a trace hashed at a time
+_HASH_CHUNK_SIZE = 1 << 24
+
+
+def trace_hash(page_accesses: np.ndarray) -> str:
+    """A content hash of a trace, independent of where it is stored and its integer width"""
+    pages = np.asarray(page_accesses)
+    digest = hashlib.blake2b(digest_size=20)
+    step = _HASH_CHUNK_SIZE // 8
+    for start in range(0, len(pages), step):
+        digest.update(np.ascontiguousarray(pages[start : start + step], dtype="<i8").tobytes())
+    return digest.hexdigest()
+
+
+def _json_default(value):
+    # Policy kwargs may hold classes, such as the tiers of a HierarchyMemoryManager
+    if isinstance(value, type):
+        return f"{value.__module__}.{value.__qualname__}"
+    return repr(value)
+
+
+@functools.lru_cache(maxsize=None)
+def _source_digest(source: object) -> str:
+    return hashlib.blake2b(inspect.getsource(source).encode(), digest_size=20).hexdigest()
+
+
+def policy_source_digest(memory_manager: type, kargs: dict, sources: Iterable = ()) -> str:
+    """A hash of the source of a policy's classes, including its base classes and classes
+    passed in its keyword arguments, such as the tiers of a HierarchyMemoryManager. Changing a
+    policy's code changes the hash, so its results cached before the change are not reused,
+    while the results of other policies defined next to it still are.
+
+    :param memory_manager: The memory manager class
+    :type memory_manager: type[MemoryManager]
+    :param kargs: Keyword arguments for the memory manager
+    :type kargs: dict
+    :param sources: Modules, classes or functions that computed the result from the policy's
+        decisions, such as a miss ratio curve or a cost model
+    :type sources: Iterable
+    :return: A hex digest of the policy's source
+    :rtype: str
+    """
+    classes = [memory_manager] + [value for value in kargs.values() if isinstance(value, type)]
+    policy_classes = {
+        cls: None
+        for policy_class in classes
+        for cls in policy_class.__mro__
+        if getattr(sys.modules.get(cls.__module__), "__file__", None) is not None
+    }
+    digest = hashlib.blake2b(digest_size=20)
+    for source in [*policy_classes, *sources]:
+        digest.update(_source_digest(source).encode())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """Simulation results kept on disk between runs.
+
+    Results are keyed by a content hash of the trace, the policy class and its source, its
+    keyword arguments and the buffer size, so a sweep only simulates cells it has not seen
+    before. Each result is a small JSON file. Once the cache grows past max_bytes the least
+    recently used results are removed until it is back under three quarters of max_bytes, so
+    trimming does not happen on every write of a full cache.
+
+    :param directory: Where to keep the results
+    :type directory: str
+    :param max_bytes: The largest size the cache grows to
+    :type max_bytes: int
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 64 * 2**20):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._size = sum(os.path.getsize(path) for path in self._entry_paths())
+
+    @staticmethod
+    def key(
+        trace_digest: str,
+        memory_manager: type,
+        kargs: dict,
+        buffer_size: int,
+        metric: dict | None = None,
+        sources: Iterable = (),
+    ) -> str:
+        """The cache key of a simulation
+
+        :param trace_digest: The trace_hash of the trace
+        :type trace_digest: str
+        :param memory_manager: The memory manager class
+        :type memory_manager: type[MemoryManager]
+        :param kargs: Keyword arguments for the memory manager
+        :type kargs: dict
+        :param buffer_size: The number of pages that fit in memory
+        :type buffer_size: int
+        :param metric: What was measured, if not the fault rate, such as the I/O cost model
+        :type metric: dict | None
+        :param sources: Modules, classes or functions that computed the result besides the
+            policy, whose source is part of the key
+        :type sources: Iterable
+        :return: A hex digest identifying the simulation
+        :rtype: str
+        """
+        simulation = [
+            CACHE_VERSION,
+            trace_digest,
+            _json_default(memory_manager),
+            policy_source_digest(memory_manager, kargs, sources),
+            kargs,
+            buffer_size,
+        ]
+        if metric is not None:
+            simulation.append(metric)
+        description = json.dumps(
+            simulation,
+            sort_keys=True,
+            default=_json_default,
+        )
+        return hashlib.blake2b(description.encode(), digest_size=20).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def _entry_paths(self):
+        for root, _, filenames in os.walk(self.directory):
+            for filename in filenames:
+                if filename.endswith(".json"):
+                    yield os.path.join(root, filename)
+
+    def get(self, key: str) -> float | None:
+        """The cached fault rate for a key, or None if it is not cached"""
+        path = self._path(key)
+        try:
+            with open(path) as entry_file:
+                fault_rate = json.load(entry_file)["fault_rate"]
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            return None
+
+        # Mark the result as recently used
+        os.utime(path)
+        return fault_rate
+
+    def put(self, key: str, fault_rate: float, **description):
+        """Cache the fault rate of a simulation
+
+        :param key: The key from ResultCache.key
+        :type key: str
+        :param fault_rate: The fault rate of the simulation
+        :type fault_rate: float
+        :param description: What was simulated, kept alongside the result for reference
+        """
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        encoded = json.dumps({"fault_rate": fault_rate, **description}, default=_json_default)
+        partial_path = path + ".partial"
+        with open(partial_path, "w") as entry_file:
+            entry_file.write(encoded)
+
+        if os.path.exists(path):
+            self._size -= os.path.getsize(path)
+        os.replace(partial_path, path)
+        self._size += len(encoded)
+
+        if self._size > self.max_bytes:
+            self._evict()
+
+    def _evict(self):
+        """Remove the least recently used results until the cache is under three quarters full"""
+        entries = sorted(
+            (os.path.getmtime(path), os.path.getsize(path), path) for path in self._entry_paths()
+        )
+        self._size = sum(size for _, size, _ in entries)
+
+        for _, size, path in entries:
+            if self._size <= self.max_bytes * 3 // 4:
+                break
+            os.remove(path)
+            self._size -= size
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self._entry_paths())
@@ -0,0 +1,176 @@
+from bisect import bisect_right
+from typing import Iterable, Sequence
+
+
+class MissRatioCurve:
+    """Page faults for every buffer size of an LRU buffer, built from a stack distance histogram.
+
+    A read with stack distance d is a hit in any LRU buffer holding at least d pages, so the
+    faults for a buffer of size C are the cold misses plus every read with a distance above C.
+    """
+
+    def __init__(self, distance_counts: dict[int, float], cold_misses: float, total_reads: int):
+        self.cold_misses = cold_misses
+        self.total_reads = total_reads
+        # Number of reads at each stack distance, the reuse distance histogram of the trace
+        self.distance_counts = dict(distance_counts)
+        self._distances = sorted(distance_counts)
+
+        # Number of reads with a stack distance strictly greater than self._distances[i]
+        self._reads_beyond: list[float] = [0.0] * len(self._distances)
+        running_total = 0.0
+        for i in range(len(self._distances) - 1, -1, -1):
+            self._reads_beyond[i] = running_total
+            running_total += distance_counts[self._distances[i]]
+        self._reads_with_distance = running_total
+
+    def page_faults(self, buffer_size: int) -> float:
+        """Number of page faults an LRU buffer of the given size would take on the trace
+
+        :param buffer_size: The number of pages held in memory
+        :type buffer_size: int
+        :return: The number of page faults, fractional for sampled curves
+        :rtype: float
+        """
+        i = bisect_right(self._distances, buffer_size)
+        if i == 0:
+            return self.cold_misses + self._reads_with_distance
+        return self.cold_misses + self._reads_beyond[i - 1]
+
+    def fault_rate(self, buffer_size: int) -> float:
+        """Fraction of reads that fault in an LRU buffer of the given size"""
+        return self.page_faults(buffer_size) / self.total_reads
+
+
+def _stack_distance_counts(page_accesses: Sequence[int]) -> tuple[dict[int, int], int]:
+    """Histogram of LRU stack distances and the number of cold misses in one pass.
+
+    Every page has a marker at the time of its last access, kept in a Fenwick tree over
+    access times. The stack distance of a read is one more than the number of markers after
+    the previous access to the same page, which is the number of distinct pages read since.
+    The tree operations are inlined as this loop runs once per access.
+    """
+    size = len(page_accesses) + 1
+    tree = [0] * size
+    last_access: dict[int, int] = {}
+    distance_counts: dict[int, int] = {}
+    cold_misses = 0
+
+    for time, page in enumerate(page_accesses, start=1):
+        previous = last_access.get(page)
+
+        if previous is None:
+            cold_misses += 1
+        else:
+            # Count markers at or before the previous access
+            markers = 0
+            index = previous
+            while index > 0:
+                markers += tree[index]
+                index &= index - 1
+
+            distance = len(last_access) - markers + 1
+            distance_counts[distance] = distance_counts.get(distance, 0) + 1
+
+            # Move the page's marker from the previous access to this one
+            index = previous
+            while index < size:
+                tree[index] -= 1
+                index += index & -index
+
+        index = time
+        while index < size:
+            tree[index] += 1
+            index += index & -index
+        last_access[page] = time
+
+    return distance_counts, cold_misses
+
+
+def lru_miss_ratio_curve(page_accesses: Iterable[int]) -> MissRatioCurve:
+    """Exact LRU miss ratio curve for every buffer size in a single O(n log n) pass
+
+    :param page_accesses: The pages read, in order. Sized iterables such as a TraceStream are
+        iterated once without being materialized.
+    :type page_accesses: Iterable[int]
+    :return: The miss ratio curve for the trace
+    :rtype: MissRatioCurve
+    """
+    if not hasattr(page_accesses, "__len__"):
+        page_accesses = list(page_accesses)
+    distance_counts, cold_misses = _stack_distance_counts(page_accesses)
+    return MissRatioCurve(distance_counts, cold_misses, len(page_accesses))
+
+
+# Pages are sampled by hashing them into this many buckets
+SHARDS_MODULUS = 1 << 24
+
+
+def _shards_hash(page: int) -> int:
+    # Multiplicative hash, keeping the top 24 of 32 bits
+    return ((page * 2654435761) & 0xFFFFFFFF) >> 8
+
+
+def shards_miss_ratio_curve(page_accesses: Iterable[int], sample_rate: float = 0.01) -> MissRatioCurve:
+    """Approximate LRU miss ratio curve using fixed rate SHARDS spatial sampling.
+
+    Only reads of pages whose hash falls under the sample rate are tracked. Distances and
+    counts measured on the sample are scaled back up by the sample rate, and the difference
+    between expected and observed sampled reads is folded into the smallest distance as in
+    the SHARDS_adj correction (Waldspurger et al., FAST '15).
+
+    :param page_accesses: The pages read, in order
+    :type page_accesses: Iterable[int]
+    :param sample_rate: Fraction of pages to sample, between 0 and 1
+    :type sample_rate: float
+    :return: The approximate miss ratio curve for the trace
+    :rtype: MissRatioCurve
+    """
+    if not 0 < sample_rate <= 1:
+        raise ValueError("sample_rate must be in (0, 1]")
+
+    threshold = int(sample_rate * SHARDS_MODULUS)
+    total_reads = 0
+    sampled_accesses = []
+    for page in page_accesses:
+        total_reads += 1
+        if _shards_hash(page) < threshold:
+            sampled_accesses.append(page)
+
+    return sampled_miss_ratio_curve(sampled_accesses, total_reads, sample_rate)
+
+
+def shards_sample_mask(pages, sample_rate: float):
+    """Which reads of a NumPy array of pages shards_miss_ratio_curve would sample"""
+    import numpy as np
+
+    hashes = ((np.asarray(pages).astype(np.uint64) * np.uint64(2654435761)) & np.uint64(0xFFFFFFFF)) >> np.uint64(8)
+    return hashes < int(sample_rate * SHARDS_MODULUS)
+
+
+def sampled_miss_ratio_curve(
+    sampled_accesses: Sequence[int], total_reads: int, sample_rate: float
+) -> MissRatioCurve:
+    """Scale the stack distances of reads sampled with the SHARDS hash back up to the whole trace
+
+    :param sampled_accesses: The sampled reads, in order
+    :type sampled_accesses: Sequence[int]
+    :param total_reads: The number of reads in the whole trace
+    :type total_reads: int
+    :param sample_rate: The fraction of pages that were sampled
+    :type sample_rate: float
+    :return: The approximate miss ratio curve for the trace
+    :rtype: MissRatioCurve
+    """
+    sampled_counts, sampled_cold_misses = _stack_distance_counts(sampled_accesses)
+
+    scale = 1 / sample_rate
+    distance_counts: dict[int, float] = {}
+    for distance, count in sampled_counts.items():
+        scaled_distance = max(1, round(distance * scale))
+        distance_counts[scaled_distance] = distance_counts.get(scaled_distance, 0) + count * scale
+
+    adjustment = total_reads - len(sampled_accesses) * scale
+    distance_counts[1] = distance_counts.get(1, 0) + adjustment
+
+    return MissRatioCurve(distance_counts, sampled_cold_misses * scale, total_reads)
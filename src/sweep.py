@@ -0,0 +1,567 @@
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+import csv
+import dataclasses
+import hashlib
+import json
+import os
+import shutil
+from typing import Callable
+
+import numpy as np
+
+import cost_model
+import stack_distance
+from cost_model import DirtyPageTracker, LatencyModel, RandomWriteStream, io_cost
+from fault_log import ArrayFaultLog
+from memory_manager import (
+    BeladyMemoryManager,
+    MemoryManager,
+    LruMemoryManager,
+    LruKMemoryManager,
+    LruKVariantSimulator,
+)
+from page_access_generators import TRACE_FILES, WorkloadType
+from page_ids import RelationFork, relation_hit_ratios
+from result_cache import ResultCache, trace_hash
+from stack_distance import lru_miss_ratio_curve
+from trace_format import BinaryTraceWriter, open_binary_trace
+from trace_stream import ArrayTraceStream, FileTraceStream, workload_trace_stream
+
+# (memory manager class, keyword arguments, column name)
+PolicyConfig = tuple[type[MemoryManager], dict, str]
+
+# A named workload, or the filename of a trace
+Workload = WorkloadType | str
+
+# Called with the workload name, buffer size, policy name and result of every cell as it finishes
+CellCallback = Callable[[str, int, str, float], None]
+
+# Where the cells of a sweep run
+BACKENDS = ("process", "serial")
+
+
+def workload_name(workload: Workload) -> str:
+    """The name of a workload in the output, the file name of a trace"""
+    if isinstance(workload, WorkloadType):
+        return workload.name
+    return os.path.basename(workload)
+
+
+def workload_labels(workloads: list[Workload]) -> dict[Workload, str]:
+    """The name of each workload in the output. Traces in different directories with the same
+    file name are told apart by their full path."""
+    names = [workload_name(workload) for workload in workloads]
+    labels = {}
+    for workload, name in zip(workloads, names):
+        if isinstance(workload, str) and names.count(name) > 1:
+            labels[workload] = os.path.abspath(workload)
+        else:
+            labels[workload] = name
+    return labels
+
+
+class SerialExecutor:
+    """Runs every task in the calling process as it is submitted, for debugging and profiling
+    cells, or machines where worker processes only add overhead"""
+
+    def submit(self, fn, *args) -> Future:
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+def is_lru_equivalent(memory_manager: type[MemoryManager], kargs: dict) -> bool:
+    """Whether a policy makes the same decisions as LRU, so it can be read off a miss ratio curve"""
+    if memory_manager is LruMemoryManager:
+        return True
+    # LRU-1 without a correlated reference period evicts the least recently used page
+    return (
+        memory_manager is LruKMemoryManager
+        and kargs.get("k", 1) == 1
+        and kargs.get("c_ref_period", 0) == 0
+        and kargs.get("retained_information_period") is None
+    )
+
+
+def prepare_trace(
+    workload: Workload,
+    trace_dir: str,
+    total_page_count: int,
+    total_reads: int,
+    seed: int | None = None,
+) -> str:
+    """Makes sure a workload is available as a binary trace that worker processes can memory map.
+
+    Traces that have already been converted are used in place. Anything else is streamed
+    into trace_dir once, and reused from there if the sweep is resumed. The file name holds a
+    hash of what the trace was made from: the parameters of a synthetic workload, or the path,
+    size and modification time of a trace file. A resume with other parameters or an edited
+    trace streams it again rather than replaying the old trace.
+
+    :param workload: A named workload, or the filename of a trace
+    :type workload: WorkloadType | str
+    :return: The filename of the binary trace
+    :rtype: str
+    """
+    if isinstance(workload, str) or workload in TRACE_FILES:
+        filename = TRACE_FILES.get(workload, workload)
+        stream = FileTraceStream(filename)
+        binary_filename = stream.binary_filename()
+        if binary_filename:
+            return binary_filename
+        # Traces with the same file name in different directories are streamed apart
+        file_stat = os.stat(filename)
+        origin = [os.path.abspath(filename), file_stat.st_size, file_stat.st_mtime_ns]
+    else:
+        stream = workload_trace_stream(workload, total_page_count, total_reads, seed)
+        origin = [workload.name, total_page_count, total_reads, seed]
+
+    origin_digest = hashlib.blake2b(json.dumps(origin).encode(), digest_size=4).hexdigest()
+    trace_filename = os.path.join(trace_dir, f"{workload_name(workload)}-{origin_digest}.trace")
+    if os.path.exists(trace_filename):
+        return trace_filename
+
+    os.makedirs(trace_dir, exist_ok=True)
+    partial_filename = trace_filename + ".partial"
+    width = 4 if stream.max_page() <= 2**31 - 1 else 8
+    with BinaryTraceWriter(partial_filename, width, {"source": workload_name(workload)}) as writer:
+        for chunk in stream.chunks():
+            writer.write(chunk)
+        if isinstance(stream, FileTraceStream) and stream.page_index is not None:
+            writer.metadata["page_index"] = stream.page_index.to_metadata()
+    os.replace(partial_filename, trace_filename)
+
+    return trace_filename
+
+
+def simulate_cell(
+    trace_filename: str, memory_manager: type[MemoryManager], kargs: dict, buffer_size: int
+) -> float:
+    """Replays a binary trace against one policy and buffer size, returning the fault rate"""
+    trace = open_binary_trace(trace_filename)
+    if issubclass(memory_manager, BeladyMemoryManager):
+        # The offline optimal policy needs to see the whole trace up front
+        kargs = {**kargs, "page_accesses": trace.pages}
+    m = memory_manager(
+        memory_page_count=buffer_size, disk_page_count=trace.metadata["max_page"] + 1, **kargs
+    )
+
+    m.run(ArrayTraceStream(trace.pages))
+
+    return m.total_page_faults / m.total_reads
+
+
+def simulate_cost_cell(
+    trace_filename: str,
+    memory_manager: type[MemoryManager],
+    kargs: dict,
+    buffer_size: int,
+    latency_model: LatencyModel,
+    write_fraction: float,
+    write_seed: int,
+) -> float:
+    """Replays a binary trace against one policy and buffer size with a fraction of the accesses
+    writing their page, returning the estimated I/O time per access in microseconds"""
+    trace = open_binary_trace(trace_filename)
+    if issubclass(memory_manager, BeladyMemoryManager):
+        kargs = {**kargs, "page_accesses": trace.pages}
+    m = memory_manager(
+        memory_page_count=buffer_size, disk_page_count=trace.metadata["max_page"] + 1, **kargs
+    )
+
+    tracker = DirtyPageTracker(m)
+    tracker.run(ArrayTraceStream(trace.pages), RandomWriteStream(len(trace), write_fraction, write_seed))
+
+    return io_cost(tracker, latency_model).seconds_per_access * 1e6
+
+
+def simulate_relation_hit_ratios(
+    trace_filename: str, memory_manager: type[MemoryManager], kargs: dict, buffer_size: int
+) -> dict[RelationFork, tuple[int, float]]:
+    """Replays a binary trace of buffer tags against one policy and buffer size, returning the
+    reads and hit ratio of every relation fork, most read first"""
+    trace = open_binary_trace(trace_filename)
+    page_index = trace.page_index
+    if page_index is None:
+        raise ValueError(f"{trace_filename} does not record which relation its pages belong to")
+
+    if issubclass(memory_manager, BeladyMemoryManager):
+        kargs = {**kargs, "page_accesses": trace.pages}
+    fault_log = ArrayFaultLog()
+    m = memory_manager(
+        memory_page_count=buffer_size,
+        disk_page_count=trace.metadata["max_page"] + 1,
+        fault_log=fault_log,
+        **kargs,
+    )
+
+    m.run(ArrayTraceStream(trace.pages))
+
+    return relation_hit_ratios(trace.pages, fault_log.to_numpy(), page_index)
+
+
+def simulate_lru_k_variants(trace_filename: str, buffer_size: int, variants: list[dict]) -> list[float]:
+    """Fault rates of many LRU-K configurations at one buffer size from a single pass over a binary trace"""
+    trace = open_binary_trace(trace_filename)
+    simulator = LruKVariantSimulator(
+        trace.metadata["max_page"] + 1, [(buffer_size, kargs) for kargs in variants]
+    )
+
+    simulator.run(ArrayTraceStream(trace.pages))
+
+    return [m.total_page_faults / m.total_reads for m in simulator.memory_managers]
+
+
+def simulate_lru_curve(trace_filename: str, buffer_sizes: list[int]) -> list[float]:
+    """Fault rates of LRU for every buffer size from a single pass over a binary trace"""
+    curve = lru_miss_ratio_curve(ArrayTraceStream(open_binary_trace(trace_filename).pages))
+    return [curve.fault_rate(buffer_size) for buffer_size in buffer_sizes]
+
+
+def cell_sources(
+    memory_manager: type[MemoryManager], kargs: dict, latency_model: LatencyModel | None = None
+) -> tuple:
+    """The code besides the policy that simulates a cell of run_sweep. Its source is part of the
+    cell's cache key, so editing it does not reuse results it computed before.
+
+    :param memory_manager: The memory manager class
+    :type memory_manager: type[MemoryManager]
+    :param kargs: Keyword arguments for the memory manager
+    :type kargs: dict
+    :param latency_model: The latency model of the sweep, if any
+    :type latency_model: LatencyModel | None
+    :return: The modules, classes and functions that compute the cell
+    :rtype: tuple
+    """
+    if latency_model is not None:
+        return simulate_cost_cell, cost_model
+    if is_lru_equivalent(memory_manager, kargs):
+        return simulate_lru_curve, stack_distance
+    if memory_manager is LruKMemoryManager and kargs.get("retained_information_period") is None:
+        return simulate_lru_k_variants, LruKVariantSimulator
+    return (simulate_cell,)
+
+
+def working_set_buffer_sizes(trace_filename: str, fractions: list[float]) -> list[int]:
+    """Buffer sizes as fractions of the pages a binary trace reads, at least one page each.
+    Fractions that round to the same size give it once."""
+    working_set = len(np.unique(open_binary_trace(trace_filename).pages))
+    buffer_sizes = [max(1, round(fraction * working_set)) for fraction in fractions]
+    return list(dict.fromkeys(buffer_sizes))
+
+
+def _metric_record(metric: dict | None) -> dict | None:
+    """What a sweep measured, as it is kept alongside its results to compare with later runs"""
+    if metric is None:
+        return None
+    return {**metric, "latency_model": dataclasses.asdict(metric["latency_model"])}
+
+
+def _load_completed_cells(
+    output_filename: str,
+    progress_filename: str,
+    run_filename: str,
+    trace_digests: dict[str, str],
+    metric: dict | None,
+) -> dict[tuple[str, int, str], float]:
+    """Cells of a previous run, from its output file and the progress log of an unfinished run.
+
+    Only cells of the same traces, by content hash, measured the same way are kept. Buffer
+    sizes from working set fractions then follow from the trace.
+
+    :param trace_digests: The trace_hash of the trace of each workload label
+    :type trace_digests: dict[str, str]
+    :param metric: The _metric_record of this run
+    :type metric: dict | None
+    """
+    completed = {}
+
+    run = None
+    if os.path.exists(run_filename):
+        with open(run_filename) as run_file:
+            run = json.load(run_file)
+    if os.path.exists(output_filename) and run is not None and run["metric"] == metric:
+        with open(output_filename, newline="") as csv_file:
+            for row in csv.DictReader(csv_file):
+                workload, buffer_size = row.pop("workload"), int(row.pop("bufferSize"))
+                if run["trace_digests"].get(workload) != trace_digests.get(workload):
+                    continue
+                for name, fault_rate in row.items():
+                    if fault_rate:
+                        completed[(workload, buffer_size, name)] = float(fault_rate)
+
+    if os.path.exists(progress_filename):
+        with open(progress_filename) as progress_file:
+            for line in progress_file:
+                try:
+                    cell = json.loads(line)
+                except json.JSONDecodeError:
+                    # The last line may be cut short if the previous run was killed
+                    continue
+                if cell.get("trace_digest") != trace_digests.get(cell["workload"]):
+                    continue
+                if cell.get("metric") != metric:
+                    continue
+                completed[(cell["workload"], cell["buffer_size"], cell["policy"])] = cell["fault_rate"]
+
+    return completed
+
+
+def run_sweep(
+    workloads: list[Workload],
+    buffer_sizes: list[int],
+    policies: list[PolicyConfig],
+    output_filename: str = "output.csv",
+    total_page_count: int = 1000,
+    total_reads: int = 10000,
+    max_workers: int | None = None,
+    resume: bool = False,
+    seed: int | None = None,
+    cache: ResultCache | None = None,
+    latency_model: LatencyModel | None = None,
+    write_fraction: float = 0.0,
+    working_set_fractions: list[float] | None = None,
+    backend: str = "process",
+    on_cell: CellCallback | None = None,
+):
+    """Simulates every (workload, buffer size, policy) cell in parallel and writes the fault rates.
+
+    Each workload is written to a binary trace once and memory mapped by the workers, so traces
+    are never pickled. Finished cells are appended to a progress log next to the output as they
+    complete, and the output has one row per workload and buffer size with a column per policy.
+
+    With a latency model the cells are the estimated I/O time per access in microseconds
+    instead, counting disk reads and the write-backs of dirty pages, so policies that evict
+    dirty pages less often compare better than their fault rate alone suggests.
+
+    :param workloads: The workloads to simulate, named workloads or trace filenames
+    :type workloads: list[WorkloadType | str]
+    :param buffer_sizes: The buffer sizes to simulate, in pages
+    :type buffer_sizes: list[int]
+    :param policies: The policies to simulate, as (memory manager class, kwargs, column name)
+    :type policies: list[PolicyConfig]
+    :param output_filename: Where to write the CSV results
+    :type output_filename: str
+    :param total_page_count: The number of pages synthetic workloads access
+    :type total_page_count: int
+    :param total_reads: The number of reads in synthetic workloads
+    :type total_reads: int
+    :param max_workers: Number of worker processes, defaults to the number of CPUs
+    :type max_workers: int | None
+    :param resume: Skip cells found in the existing output or the progress log of an
+        unfinished run, if they were simulated on the same traces with the same metric
+    :type resume: bool
+    :param seed: Seed for synthetic workloads. Unseeded workloads differ on every run, so
+        their results are never found in the cache.
+    :type seed: int | None
+    :param cache: Results of earlier runs. Cells found in it are not simulated, and newly
+        simulated cells are added to it.
+    :type cache: ResultCache | None
+    :param latency_model: Write the I/O time per access under this model rather than the
+        fault rate
+    :type latency_model: LatencyModel | None
+    :param write_fraction: With a latency model, the fraction of accesses that write their
+        page. The same accesses are writes for every policy, drawn with seed or 0.
+    :type write_fraction: float
+    :param working_set_fractions: Size the buffer of each workload as these fractions of the
+        pages it reads, instead of buffer_sizes
+    :type working_set_fractions: list[float] | None
+    :param backend: "process" runs cells in worker processes, "serial" runs them one after
+        another in this process
+    :type backend: str
+    :param on_cell: Called with every cell of this run as it finishes, including cells found
+        in the cache, but not cells resumed from an earlier run
+    :type on_cell: CellCallback | None
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend}, expected one of {', '.join(BACKENDS)}")
+
+    progress_filename = output_filename + ".progress"
+    # Which traces and metric the cells of the output were simulated with
+    run_filename = output_filename + ".run"
+    trace_dir = output_filename + ".traces"
+
+    if not resume:
+        for stale in (progress_filename, run_filename, trace_dir):
+            if os.path.isdir(stale):
+                shutil.rmtree(stale)
+            elif os.path.exists(stale):
+                os.remove(stale)
+
+    metric = None
+    if latency_model is not None:
+        write_seed = seed if seed is not None else 0
+        metric = {"latency_model": latency_model, "write_fraction": write_fraction, "write_seed": write_seed}
+    metric_record = _metric_record(metric)
+
+    labels = workload_labels(workloads)
+
+    # Prepare every trace before starting, so a missing trace fails the sweep before any work
+    trace_filenames: dict[Workload, str] = {}
+    trace_digests: dict[Workload, str] = {}
+    for workload in workloads:
+        trace_filenames[workload] = prepare_trace(
+            workload, trace_dir, total_page_count, total_reads, seed
+        )
+        trace_digests[workload] = trace_hash(open_binary_trace(trace_filenames[workload]).pages)
+    label_digests = {labels[workload]: trace_digests[workload] for workload in workloads}
+
+    completed = {}
+    if resume:
+        completed = _load_completed_cells(
+            output_filename, progress_filename, run_filename, label_digests, metric_record
+        )
+
+    def complete(workload_label: str, buffer_size: int, name: str, result: float):
+        completed[(workload_label, buffer_size, name)] = result
+        if on_cell is not None:
+            on_cell(workload_label, buffer_size, name, result)
+
+    workload_buffer_sizes: dict[Workload, list[int]] = {}
+    for workload in workloads:
+        if working_set_fractions is None:
+            workload_buffer_sizes[workload] = buffer_sizes
+        else:
+            # The working set is only known once the trace is
+            workload_buffer_sizes[workload] = working_set_buffer_sizes(
+                trace_filenames[workload], working_set_fractions
+            )
+
+    tasks = []
+    # LRU-K configurations of each workload and buffer size, simulated together
+    lru_k_variants: dict[tuple[Workload, int], list[tuple[str, dict]]] = {}
+    for workload in workloads:
+        for memory_manager, kargs, name in policies:
+            remaining = [
+                buffer_size
+                for buffer_size in workload_buffer_sizes[workload]
+                if (labels[workload], buffer_size, name) not in completed
+            ]
+            if not remaining:
+                continue
+
+            if cache is not None:
+                for buffer_size in list(remaining):
+                    fault_rate = cache.get(
+                        ResultCache.key(
+                            trace_digests[workload],
+                            memory_manager,
+                            kargs,
+                            buffer_size,
+                            metric,
+                            cell_sources(memory_manager, kargs, latency_model),
+                        )
+                    )
+                    if fault_rate is not None:
+                        complete(labels[workload], buffer_size, name, fault_rate)
+                        remaining.remove(buffer_size)
+                if not remaining:
+                    continue
+
+            if latency_model is not None:
+                # Write-backs depend on which pages each policy evicts, not only how many
+                for buffer_size in remaining:
+                    tasks.append(
+                        (
+                            workload,
+                            [(buffer_size, name)],
+                            simulate_cost_cell,
+                            (memory_manager, kargs, buffer_size, latency_model, write_fraction, write_seed),
+                        )
+                    )
+            elif is_lru_equivalent(memory_manager, kargs):
+                # A single pass gives LRU fault rates for every buffer size
+                cells = [(buffer_size, name) for buffer_size in remaining]
+                tasks.append((workload, cells, simulate_lru_curve, (remaining,)))
+            elif memory_manager is LruKMemoryManager and kargs.get("retained_information_period") is None:
+                for buffer_size in remaining:
+                    lru_k_variants.setdefault((workload, buffer_size), []).append((name, kargs))
+            else:
+                for buffer_size in remaining:
+                    tasks.append(
+                        (workload, [(buffer_size, name)], simulate_cell, (memory_manager, kargs, buffer_size))
+                    )
+
+    for (workload, buffer_size), variants in lru_k_variants.items():
+        cells = [(buffer_size, name) for name, _ in variants]
+        tasks.append(
+            (workload, cells, simulate_lru_k_variants, (buffer_size, [kargs for _, kargs in variants]))
+        )
+
+    policy_configs = {name: (memory_manager, kargs) for memory_manager, kargs, name in policies}
+    executor = ProcessPoolExecutor(max_workers) if backend == "process" else SerialExecutor()
+    with executor, open(progress_filename, "a") as progress_file:
+        futures = {
+            executor.submit(simulate, trace_filenames[workload], *args): (workload, cells)
+            for workload, cells, simulate, args in tasks
+        }
+
+        for future in as_completed(futures):
+            workload, cells = futures[future]
+            workload_label = labels[workload]
+            fault_rates = future.result()
+            if not isinstance(fault_rates, list):
+                fault_rates = [fault_rates]
+
+            for (buffer_size, name), fault_rate in zip(cells, fault_rates):
+                print(f"{workload_label} buffer size {buffer_size} {name}: {fault_rate}")
+                complete(workload_label, buffer_size, name, fault_rate)
+                if cache is not None:
+                    memory_manager, kargs = policy_configs[name]
+                    cache.put(
+                        ResultCache.key(
+                            trace_digests[workload],
+                            memory_manager,
+                            kargs,
+                            buffer_size,
+                            metric,
+                            cell_sources(memory_manager, kargs, latency_model),
+                        ),
+                        fault_rate,
+                        workload=workload_label,
+                        policy=name,
+                        kwargs=kargs,
+                        buffer_size=buffer_size,
+                    )
+                progress_file.write(
+                    json.dumps(
+                        {
+                            "workload": workload_label,
+                            "buffer_size": buffer_size,
+                            "policy": name,
+                            "fault_rate": fault_rate,
+                            "trace_digest": trace_digests[workload],
+                            "metric": metric_record,
+                        }
+                    )
+                    + "\n"
+                )
+            progress_file.flush()
+
+    header = ["workload", "bufferSize"] + [name for _, _, name in policies]
+    with open(output_filename, "w", newline="") as csv_file:
+        csv_writer = csv.writer(csv_file, delimiter=",", quotechar='"', quoting=csv.QUOTE_MINIMAL)
+        csv_writer.writerow(header)
+
+        for workload in workloads:
+            for buffer_size in workload_buffer_sizes[workload]:
+                csv_writer.writerow(
+                    [labels[workload], buffer_size]
+                    + [completed[(labels[workload], buffer_size, name)] for _, _, name in policies]
+                )
+    with open(run_filename, "w") as run_file:
+        json.dump({"metric": metric_record, "trace_digests": label_digests}, run_file)
+
+    # The sweep finished, so there is nothing left to resume
+    os.remove(progress_filename)
+    if os.path.isdir(trace_dir):
+        shutil.rmtree(trace_dir)
@@ -0,0 +1,112 @@
+import numpy as np
+import pytest
+
+from access_hooks import AccessHooks, EvictionAgeHistogram, HookList, PhaseTimer, add_hooks, profile_sampled
+from hierarchy import HierarchyMemoryManager
+from memory_manager import ArcMemoryManager, FifoMemoryManager, LirsMemoryManager, LruMemoryManager
+from trace_stream import ArrayTraceStream
+
+
+class EventLog(AccessHooks):
+    def __init__(self):
+        self.events = []
+
+    def on_hit(self, read_number, page_number):
+        self.events.append(("hit", read_number, page_number))
+
+    def on_fault(self, read_number, page_number):
+        self.events.append(("fault", read_number, page_number))
+
+    def on_evict(self, read_number, victim, age):
+        self.events.append(("evict", read_number, victim, age))
+
+
+def test_hooks_see_every_event():
+    log = EventLog()
+    m = FifoMemoryManager(2, 4, hooks=log)
+    m.read_pages(np.array([0, 1, 0, 2, 3]))
+
+    assert log.events == [
+        ("fault", 1, 0),
+        ("fault", 2, 1),
+        ("hit", 3, 0),
+        ("evict", 4, 0, 3),
+        ("fault", 4, 2),
+        ("evict", 5, 1, 3),
+        ("fault", 5, 3),
+    ]
+
+
+@pytest.mark.parametrize("memory_manager", [LruMemoryManager, ArcMemoryManager, LirsMemoryManager])
+def test_hooks_do_not_change_results(memory_manager):
+    page_accesses = np.random.default_rng(0).zipf(1.2, 3000) % 100
+    m = memory_manager(20, 100)
+    m.run(ArrayTraceStream(page_accesses))
+
+    ages = EvictionAgeHistogram()
+    hooked = memory_manager(20, 100, hooks=ages)
+    hooked.run(ArrayTraceStream(page_accesses))
+
+    assert hooked.total_page_faults == m.total_page_faults
+    assert ages.evictions == m.total_page_faults - 20
+    assert ages.unknown_age == 0
+
+
+def test_pages_loaded_before_the_hooks_have_no_age():
+    m = LruMemoryManager(1, 3)
+    m.read_page(0)
+    ages = EvictionAgeHistogram()
+    m.hooks = ages
+    m.read_pages([1, 2])
+
+    assert ages.unknown_age == 1
+    assert ages.histogram() == {1: 1}
+
+
+def test_add_hooks_keeps_existing_hooks():
+    first, second, third = EventLog(), EventLog(), EventLog()
+    m = LruMemoryManager(1, 2, hooks=first)
+    add_hooks(m, second)
+    add_hooks(m, third)
+    m.read_page(0)
+
+    assert isinstance(m.hooks, HookList)
+    assert first.events == second.events == third.events == [("fault", 1, 0)]
+
+
+def test_eviction_age_buckets():
+    ages = EvictionAgeHistogram()
+    for age in [1, 2, 3, 4, 7, 8, None]:
+        ages.on_evict(0, 0, age)
+
+    assert ages.histogram() == {1: 1, 2: 2, 4: 2, 8: 1}
+    assert ages.evictions == 7
+
+
+def test_phase_timer_counts_phases():
+    timer = PhaseTimer()
+    m = LruMemoryManager(2, 4)
+    timer.attach(m)
+    m.read_pages([0, 1, 0, 2, 3])
+
+    assert timer.counts == {"hit": 1, "fault": 4, "evict": 2}
+    assert m.total_page_faults == 4
+    assert all(seconds >= 0 for seconds in timer.mean_seconds().values())
+
+
+def test_hierarchy_hooks_count_either_buffer_as_a_hit():
+    log = EventLog()
+    m = HierarchyMemoryManager(1, 4, lower_memory_page_count=2, hooks=log)
+    m.read_pages([0, 1, 0])
+
+    assert [event[0] for event in log.events] == ["fault", "fault", "hit"]
+
+
+def test_profile_sampled_profiles_some_chunks():
+    m = LruMemoryManager(10, 100)
+    stats = profile_sampled(m, ArrayTraceStream(np.arange(100) % 50, chunk_size=10), every=3)
+
+    assert m.total_reads == 100
+    # Chunks 0, 3, 6 and 9 were profiled
+    read_pages_calls = [calls for (_, _, name), (calls, *_) in stats.stats.items() if name == "_read_pages"]
+    assert read_pages_calls == [4]
@@ -0,0 +1,43 @@
+import numpy as np
+
+from benchmark import benchmark_cell, compare_results, load_workload
+from memory_manager import BeladyMemoryManager, LruMemoryManager
+from page_access_generators import WorkloadType
+
+
+def cell(policy, reads_per_second, peak_bytes):
+    return {
+        "workload": "random",
+        "buffer_size": 10,
+        "policy": policy,
+        "reads_per_second": reads_per_second,
+        "tracemalloc_peak_bytes": peak_bytes,
+    }
+
+
+def test_benchmark_cell():
+    page_accesses = load_workload(WorkloadType.random, 50, 1000)
+    assert len(page_accesses) == 1000
+
+    result = benchmark_cell(page_accesses, LruMemoryManager, {}, 10, repeat=2)
+    assert result["reads"] == 1000
+    assert result["reads_per_second"] > 0
+    assert 0 < result["fault_rate"] <= 1
+    assert result["tracemalloc_peak_bytes"] > 0
+
+
+def test_benchmark_cell_gives_belady_the_trace():
+    result = benchmark_cell(np.array([0, 1, 2, 0, 1]), BeladyMemoryManager, {}, 2, repeat=1)
+    assert result["fault_rate"] == 4 / 5
+
+
+def test_compare_results():
+    baseline = {"results": [cell("LRU", 1000, 1000), cell("FIFO", 1000, 1000)]}
+    results = {
+        "results": [cell("LRU", 900, 1100), cell("FIFO", 700, 1300), cell("ARC", 1, 10**9)]
+    }
+
+    # Only FIFO regressed beyond the tolerance, ARC has nothing to compare against
+    regressions = compare_results(results, baseline, tolerance=0.2)
+    assert len(regressions) == 2
+    assert all("FIFO" in regression for regression in regressions)
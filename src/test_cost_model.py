@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+from cost_model import LATENCY_MODELS, DirtyPageTracker, LatencyModel, RandomWriteStream, io_cost
+from hierarchy import HierarchyMemoryManager
+from memory_manager import (
+    ArcMemoryManager,
+    ClockSweepMemoryManager,
+    FifoMemoryManager,
+    LirsMemoryManager,
+    LruMemoryManager,
+)
+from trace_stream import ArrayTraceStream, FileTraceStream
+
+
+def write_backs_one_read_at_a_time(memory_manager, page_accesses, writes):
+    # Follows every eviction with read_page, the slow path DirtyPageTracker avoids
+    dirty = set()
+    write_backs = 0
+    for page, write in zip(page_accesses, writes):
+        if memory_manager.read_page(page):
+            victim = memory_manager.last_evicted_page
+            if victim is not None and victim in dirty:
+                dirty.remove(victim)
+                write_backs += 1
+        if write:
+            dirty.add(page)
+    return write_backs, len(dirty)
+
+
+@pytest.mark.parametrize(
+    "memory_manager",
+    [LruMemoryManager, FifoMemoryManager, ClockSweepMemoryManager, ArcMemoryManager, LirsMemoryManager],
+)
+def test_write_backs_match_eviction_by_eviction(memory_manager):
+    rng = np.random.default_rng(3)
+    page_accesses = rng.zipf(1.3, 5000) % 200
+    writes = rng.random(5000) < 0.3
+
+    tracker = DirtyPageTracker(memory_manager(30, 200))
+    tracker.run(
+        ArrayTraceStream(page_accesses, chunk_size=77),
+        ArrayTraceStream(writes.astype(np.int64), chunk_size=101),
+    )
+
+    expected = write_backs_one_read_at_a_time(memory_manager(30, 200), page_accesses.tolist(), writes.tolist())
+    assert (tracker.write_backs, tracker.dirty_pages) == expected
+    assert tracker.total_writes == int(writes.sum())
+
+
+def test_io_cost_adds_up_latencies():
+    # Page 1 is written, then evicted by page 2 and read back, evicting page 2
+    tracker = DirtyPageTracker(LruMemoryManager(1, 3))
+    tracker.run([1, 1, 2, 1], [0, 1, 0, 0])
+
+    cost = io_cost(tracker, LatencyModel(read=10, write=100, hit=1))
+    assert (cost.hits, cost.disk_reads, cost.write_backs, cost.dirty_pages) == (1, 3, 1, 0)
+    assert cost.seconds == 1 + 3 * 10 + 100
+    assert cost.seconds_per_access == cost.seconds / 4
+
+
+def test_io_cost_of_a_hierarchy_counts_lower_hits():
+    tracker = DirtyPageTracker(HierarchyMemoryManager(1, 4, total_memory_page_count=3))
+    tracker.run([0, 1, 0, 0], [0, 0, 0, 0])
+
+    cost = io_cost(tracker, LATENCY_MODELS["ssd"])
+    assert (cost.hits, cost.lower_hits, cost.disk_reads) == (1, 1, 2)
+
+
+def test_random_writes_are_seeded():
+    writes = np.concatenate(list(RandomWriteStream(1000, 0.25, seed=7, chunk_size=64).chunks()))
+    assert len(writes) == 1000
+    assert set(writes.tolist()) == {0, 1}
+    assert np.array_equal(writes, np.concatenate(list(RandomWriteStream(1000, 0.25, seed=7).chunks())))
+
+    with pytest.raises(ValueError):
+        RandomWriteStream(10, 1.5)
+
+
+def test_trace_ops_are_streamed_as_writes(tmp_path):
+    trace_filename = tmp_path / "reads"
+    trace_filename.write_text("1 R 3\n2 W 4\n3 R 3\n4 W 5\n5 R 6\n6 R 4\n")
+
+    trace = FileTraceStream(str(trace_filename))
+    assert list(trace) == [3, 4, 3, 5, 6, 4]
+    assert list(trace.writes()) == [0, 1, 0, 1, 0, 0]
+
+    # Pages 4 and 5 are both evicted after being written
+    tracker = DirtyPageTracker(LruMemoryManager(2, 7))
+    assert tracker.run(trace, trace.writes()) == 5
+    assert tracker.write_backs == 2
@@ -0,0 +1,154 @@
+import csv
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from experiment import ExperimentSpecException, load_spec, main, parse_spec, policy_config
+from hierarchy import HierarchyMemoryManager
+from memory_manager import FifoMemoryManager, LruKMemoryManager, LruMemoryManager
+
+SPEC = """
+workloads = ["scan", "reads"]
+buffer_fractions = { start = 0.25, stop = 0.75, step = 0.25 }
+total_page_count = 20
+total_reads = 200
+backend = "serial"
+results = "cells.csv"
+
+[[policies]]
+policy = "FIFO"
+
+[[policies]]
+policy = "LRU-K"
+name = "LRU2"
+kwargs = { k = 2, c_ref_period = 0 }
+"""
+
+
+def read_csv(filename):
+    with open(filename, newline="") as csv_file:
+        return list(csv.DictReader(csv_file))
+
+
+def test_parse_spec_resolves_policies_and_ranges():
+    spec = parse_spec(
+        {
+            "workloads": ["zipfian"],
+            "buffer_sizes": {"start": 50, "stop": 150, "step": 50},
+            "policies": [
+                {"policy": "LRU-K", "name": "LRU2-20", "kwargs": {"k": 2, "c_ref_period": 20}},
+                {"policy": "Hierarchy", "kwargs": {"total_memory_page_count": 500, "lower_policy": "FIFO"}},
+            ],
+        }
+    )
+
+    assert spec.buffer_sizes == [50, 100, 150]
+    assert spec.policies == [
+        (LruKMemoryManager, {"k": 2, "c_ref_period": 20}, "LRU2-20"),
+        (HierarchyMemoryManager, {"total_memory_page_count": 500, "lower_policy": FifoMemoryManager}, "Hierarchy"),
+    ]
+
+
+def test_policy_config_resolves_names_like_a_spec():
+    assert policy_config("Hierarchy", {"lower_policy": "FIFO"}, "ClockSweep/FIFO") == (
+        HierarchyMemoryManager,
+        {"lower_policy": FifoMemoryManager},
+        "ClockSweep/FIFO",
+    )
+    assert policy_config("LRU") == (LruMemoryManager, {}, "LRU")
+    with pytest.raises(ExperimentSpecException):
+        policy_config("LRU2-20")
+
+
+def test_fraction_ranges_keep_their_stop():
+    spec = parse_spec(
+        {
+            "workloads": ["zipfian"],
+            "buffer_fractions": {"start": 0.05, "stop": 0.5, "step": 0.05},
+            "policies": [{"policy": "LRU"}],
+        }
+    )
+    assert len(spec.buffer_fractions) == 10
+    assert spec.buffer_fractions[-1] == 0.5
+
+
+@pytest.mark.parametrize(
+    "values",
+    [
+        {"workloads": ["zipfian"], "policies": [{"policy": "LRU"}]},
+        {"workloads": ["zipfian"], "buffer_sizes": [10], "policies": [{"policy": "Unknown"}]},
+        {"workloads": ["zipfian"], "buffer_sizes": [10], "policies": [{"policy": "LRU"}, {"policy": "LRU"}]},
+        {"workloads": ["zipfian"], "buffer_sizes": [10], "policies": [{"policy": "LRU"}], "buffer_size": 10},
+        {"workloads": ["zipfian"], "buffer_fractions": [1.5], "policies": [{"policy": "LRU"}]},
+    ],
+)
+def test_parse_spec_rejects_bad_specs(values):
+    with pytest.raises(ExperimentSpecException):
+        parse_spec(values)
+
+
+def test_spec_paths_are_relative_to_the_spec(tmp_path):
+    (tmp_path / "reads").write_text("1\n2\n")
+    spec_filename = tmp_path / "spec.json"
+    spec_filename.write_text(
+        json.dumps({"workloads": ["reads", "zipfian"], "buffer_sizes": [1], "policies": [{"policy": "LRU"}]})
+    )
+
+    spec = load_spec(str(spec_filename))
+    assert spec.workloads == [str(tmp_path / "reads"), "zipfian"]
+    assert spec.output == str(tmp_path / "output.csv")
+    assert spec.policies == [(LruMemoryManager, {}, "LRU")]
+
+
+def test_experiment_streams_cells_and_writes_the_table(tmp_path):
+    (tmp_path / "reads").write_text("".join(f"{page}\n" for page in [0, 1, 2, 3, 0, 1, 2, 3]))
+    spec_filename = tmp_path / "spec.toml"
+    spec_filename.write_text(SPEC)
+
+    main([str(spec_filename)])
+
+    # scan reads all 20 pages, the trace reads 4
+    rows = read_csv(tmp_path / "output.csv")
+    assert [(row["workload"], row["bufferSize"]) for row in rows] == [
+        ("scan", "5"),
+        ("scan", "10"),
+        ("scan", "15"),
+        ("reads", "1"),
+        ("reads", "2"),
+        ("reads", "3"),
+    ]
+    cells = read_csv(tmp_path / "cells.csv")
+    assert len(cells) == len(rows) * 2
+    assert {
+        (cell["workload"], cell["bufferSize"], cell["policy"]): float(cell["faultRate"]) for cell in cells
+    } == {
+        (row["workload"], row["bufferSize"], policy): float(row[policy])
+        for row in rows
+        for policy in ("FIFO", "LRU2")
+    }
+
+
+def test_dry_run_does_not_import_numpy(tmp_path):
+    spec_filename = tmp_path / "spec.toml"
+    spec_filename.write_text(SPEC)
+    src = os.path.dirname(os.path.abspath(__file__))
+
+    output = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys, experiment; experiment.main(sys.argv[1:]); print('numpy' in sys.modules)",
+            str(spec_filename),
+            "--dry-run",
+        ],
+        cwd=src,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+
+    assert output.startswith("2 workloads x 3 fractions of the working set x 2 policies")
+    assert output.strip().endswith("False")
@@ -0,0 +1,48 @@
+import pytest
+
+from fault_log import ArrayFaultLog, BitmapFaultLog, WindowedFaultLog
+from memory_manager import FifoMemoryManager, MemoryManagerException
+
+PAGES = [0, 1, 0, 2, 3, 0, 1, 1, 2, 4]
+
+
+def replay(fault_log):
+    m = FifoMemoryManager(2, 5, fault_log=fault_log)
+    m.run(PAGES)
+    return m
+
+
+def test_array_fault_log():
+    m = replay(ArrayFaultLog())
+
+    assert m.page_faults == [1, 2, 4, 5, 6, 7, 9, 10]
+    assert m.fault_log.to_numpy().tolist() == m.page_faults
+
+
+def test_bitmap_fault_log():
+    m = replay(BitmapFaultLog())
+
+    assert m.page_faults == [1, 2, 4, 5, 6, 7, 9, 10]
+    assert m.fault_log.faulted(4)
+    assert not m.fault_log.faulted(3)
+    assert not m.fault_log.faulted(1000)
+    assert m.fault_log.to_numpy(m.total_reads).tolist() == [
+        True, True, False, True, True, True, True, False, True, True
+    ]
+
+
+def test_windowed_fault_log():
+    m = replay(WindowedFaultLog(window=4))
+
+    assert m.fault_log.counts.tolist() == [3, 3, 2]
+    assert m.fault_log.fault_rates(m.total_reads) == [0.75, 0.75, 1.0]
+    with pytest.raises(TypeError):
+        m.page_faults
+
+
+def test_no_fault_log():
+    m = replay(None)
+
+    assert m.total_page_faults == 8
+    with pytest.raises(MemoryManagerException):
+        m.page_faults
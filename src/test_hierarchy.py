@@ -0,0 +1,46 @@
+import pytest
+
+from fault_log import ArrayFaultLog
+from hierarchy import HierarchyMemoryManager
+from memory_manager import LruMemoryManager, MemoryManagerException
+
+
+def test_lower_buffer_catches_upper_misses():
+    m = HierarchyMemoryManager(
+        1, 4, upper_policy=LruMemoryManager, lower_memory_page_count=2, fault_log=ArrayFaultLog()
+    )
+    for page in [0, 1, 0]:
+        m.read_page(page)
+
+    # Page 0 was evicted from the upper buffer but is still in the page cache
+    assert (m.upper_hits, m.lower_hits, m.total_page_faults) == (0, 1, 2)
+    assert m.page_faults == [1, 2]
+    assert m.upper_hit_rate == 0
+    assert m.lower_hit_rate == 1 / 3
+
+
+@pytest.mark.parametrize("exclusive, disk_reads", [(False, 3), (True, 2)])
+def test_exclusive_caching_avoids_double_caching(exclusive, disk_reads):
+    m = HierarchyMemoryManager(
+        1, 4, upper_policy=LruMemoryManager, lower_memory_page_count=1, exclusive=exclusive
+    )
+    m.run([0, 1, 0])
+
+    # Inclusive buffers both hold page 1, exclusive buffers hold pages 0 and 1 between them
+    assert m.total_page_faults == disk_reads
+
+
+def test_total_memory_is_split_between_buffers():
+    m = HierarchyMemoryManager(3, 10, total_memory_page_count=8)
+
+    assert m.upper.memory_page_count == 3
+    assert m.lower.memory_page_count == 5
+
+
+@pytest.mark.parametrize(
+    "kargs",
+    [{}, {"lower_memory_page_count": 2, "total_memory_page_count": 4}, {"total_memory_page_count": 2}],
+)
+def test_lower_buffer_size_is_required(kargs):
+    with pytest.raises(MemoryManagerException):
+        HierarchyMemoryManager(2, 10, **kargs)
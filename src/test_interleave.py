@@ -0,0 +1,124 @@
+import random
+
+import numpy as np
+import pytest
+
+from fault_log import ArrayFaultLog
+from interleave import (
+    replay_interleaved,
+    round_robin_schedule,
+    split_backend_trace,
+    timestamp_schedule,
+    weighted_schedule,
+)
+from memory_manager import ClockSweepMemoryManager, LruMemoryManager
+from page_ids import PageIdIndex
+from trace_stream import ArrayTraceStream, FileTraceStream
+
+
+@pytest.fixture()
+def streams():
+    rng = random.Random(0)
+    return [[rng.randint(0, 80) for _ in range(rng.randint(0, 700))] for _ in range(4)]
+
+
+def interleaved(batches):
+    return [(page, owner) for pages, owners in batches for page, owner in zip(pages.tolist(), owners.tolist())]
+
+
+@pytest.mark.parametrize("batch_size", [1, 5, 64, 1 << 16])
+def test_weighted_schedule(streams, batch_size):
+    weights = [1, 3, 2, 1]
+    expected = []
+    positions = [0] * len(streams)
+    while any(position < len(stream) for position, stream in zip(positions, streams)):
+        for stream_index, weight in enumerate(weights):
+            for _ in range(weight):
+                if positions[stream_index] < len(streams[stream_index]):
+                    expected.append((streams[stream_index][positions[stream_index]], stream_index))
+                    positions[stream_index] += 1
+
+    assert interleaved(weighted_schedule(streams, weights, batch_size)) == expected
+
+
+def test_round_robin_schedule():
+    streams = [ArrayTraceStream(np.array([0, 1, 2]), chunk_size=2), [10], [20, 21]]
+
+    assert [page for page, _ in interleaved(round_robin_schedule(streams))] == [0, 10, 20, 1, 21, 2]
+
+
+@pytest.mark.parametrize("batch_size", [1, 7, 1 << 16])
+def test_timestamp_schedule(streams, batch_size):
+    rng = random.Random(1)
+    timestamps = [sorted(rng.randint(0, 5000) for _ in stream) for stream in streams]
+
+    read_times = []
+    positions = [0] * len(streams)
+    for page, owner in interleaved(timestamp_schedule(streams, timestamps, batch_size)):
+        # Every stream keeps its own order
+        assert streams[owner][positions[owner]] == page
+        read_times.append(timestamps[owner][positions[owner]])
+        positions[owner] += 1
+
+    assert positions == [len(stream) for stream in streams]
+    assert read_times == sorted(read_times)
+
+
+def test_timestamps_must_not_go_backwards():
+    with pytest.raises(ValueError):
+        list(timestamp_schedule([[0, 1]], [[5, 4]]))
+
+
+def test_replay_interleaved_splits_faults_by_stream(streams):
+    m = ClockSweepMemoryManager(20, 81, fault_log=ArrayFaultLog())
+    stats = replay_interleaved(m, round_robin_schedule(streams, quantum=2, batch_size=50), "abcd")
+
+    single = ClockSweepMemoryManager(20, 81)
+    faults = [0] * len(streams)
+    for page, owner in interleaved(round_robin_schedule(streams, quantum=2)):
+        faults[owner] += single.read_page(page)
+
+    assert [s.total_reads for s in stats] == [len(stream) for stream in streams]
+    assert [s.total_page_faults for s in stats] == faults
+    # The memory manager's own fault log still sees every fault
+    assert len(m.fault_log) == m.total_page_faults == sum(faults)
+
+
+def test_backends_share_page_ids(tmp_path):
+    trace = tmp_path / "reads"
+    trace.write_text(
+        "7 100 1663 5 16400 0 3\n"
+        "8 150 1663 5 16400 0 9\n"
+        "7 200 1663 5 16400 0 9\n"
+        "8 250 1663 5 16400 0 3\n"
+    )
+    backend_traces = split_backend_trace(str(trace), str(tmp_path / "backends"))
+    page_index = PageIdIndex()
+    backends = [FileTraceStream(backend_trace, page_index=page_index) for backend_trace in backend_traces]
+
+    assert [list(stream.timestamps()) for stream in backends] == [[100, 200], [150, 250]]
+
+    batches = timestamp_schedule(backends, [stream.timestamps() for stream in backends])
+    stats = replay_interleaved(LruMemoryManager(2, 2), batches, backend_traces)
+
+    # Each backend hits the page the other one loaded
+    assert [(s.total_reads, s.total_page_faults) for s in stats] == [(2, 1), (2, 1)]
+
+
+def test_split_traces_with_the_same_pids_do_not_overwrite_each_other(tmp_path):
+    for name, timestamp in (("monday", 100), ("tuesday", 200)):
+        (tmp_path / name).write_text(f"7 {timestamp} 1663 5 16400 0 3\n8 {timestamp} 1663 5 16400 0 9\n")
+
+    backend_traces = [
+        backend_trace
+        for name in ("monday", "tuesday")
+        for backend_trace in split_backend_trace(str(tmp_path / name), str(tmp_path / "backends"))
+    ]
+
+    assert len(set(backend_traces)) == 4
+    assert [list(FileTraceStream(backend_trace).timestamps()) for backend_trace in backend_traces] == [
+        [100],
+        [100],
+        [200],
+        [200],
+    ]
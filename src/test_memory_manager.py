@@ -1,11 +1,32 @@
+import os
+import random
+
+import numpy as np
 import pytest
 
-from src.memory_manager import (
+from fault_log import ArrayFaultLog
+from memory_manager import (
     PageRead,
     RandomReplacementMemoryManager,
+    LruMemoryManager,
+    MruMemoryManager,
+    LfuMemoryManager,
+    LruKMemoryManager,
+    LruKVariantSimulator,
+    FifoMemoryManager,
+    ClockMemoryManager,
+    ClockSweepMemoryManager,
+    TwoQueueMemoryManager,
+    ArcMemoryManager,
+    LirsMemoryManager,
+    BeladyMemoryManager,
+    next_use_indices,
     MemoryManager,
+    MemoryManagerException,
     InvalidPageNumber,
 )
+from page_access_generators import TRACE_FILES, WorkloadType
+from trace_stream import FileTraceStream
 
 
 @pytest.fixture()
@@ -58,3 +79,360 @@ def test_memory_read_greater_than():
     assert a <= c
     assert a < c
     assert c > a
+
+
+def test_lru_evicts_least_recently_used():
+    m = LruMemoryManager(2, 4)
+    for page in [0, 1, 0, 2]:
+        m.read_page(page)
+
+    # Page 1 was evicted, page 0 is still resident
+    assert m.read_page(0) is False
+    assert m.read_page(1) is True
+
+
+def test_mru_evicts_most_recently_used():
+    m = MruMemoryManager(2, 4)
+    for page in [0, 1, 0, 2]:
+        m.read_page(page)
+
+    # Page 0 was evicted, page 1 is still resident
+    assert m.read_page(1) is False
+    assert m.read_page(0) is True
+
+
+def test_lfu_evicts_least_frequently_used():
+    m = LfuMemoryManager(2, 4)
+    for page in [0, 0, 1, 2]:
+        m.read_page(page)
+
+    # Page 1 was evicted, page 0 is still resident
+    assert m.read_page(0) is False
+    assert m.read_page(1) is True
+
+
+def test_lfu_breaks_ties_by_load_time():
+    m = LfuMemoryManager(2, 4)
+    for page in [0, 1, 1, 0, 2]:
+        m.read_page(page)
+
+    # Both pages had a frequency of two, page 0 was loaded first
+    assert m.read_page(1) is False
+    assert m.read_page(0) is True
+
+
+def test_lru_k_evicts_oldest_kth_reference():
+    m = LruKMemoryManager(2, 4, k=2)
+    for page in [0, 1, 1, 2]:
+        m.read_page(page)
+
+    # Page 0 only had one reference, so its second backward reference is the oldest
+    assert m.read_page(1) is False
+    assert m.read_page(0) is True
+
+
+def test_lru_k_skips_pages_in_correlated_reference_period():
+    m = LruKMemoryManager(2, 4, k=1, c_ref_period=1)
+    for page in [0, 1, 2]:
+        m.read_page(page)
+
+    # Page 0 was the least recently used page outside of the correlated reference period
+    assert m.read_page(1) is False
+
+
+def test_lru_k_retained_information_period():
+    m = LruKMemoryManager(1, 4, k=2, retained_information_period=2)
+    for page in [0, 1, 2, 3]:
+        m.read_page(page)
+
+    # History of page 0 has expired while history of page 2 is retained
+    assert not m.has_history(0)
+    assert m.has_history(2)
+
+
+def test_lru_k_evicts_oldest_page_when_all_are_correlated():
+    m = LruKMemoryManager(2, 4, k=2, c_ref_period=100)
+    for page in [0, 1, 1, 2]:
+        m.read_page(page)
+
+    # Both pages were inside their correlated reference period, page 0 has the oldest history
+    assert m.read_page(1) is False
+    assert m.read_page(0) is True
+
+
+def scan_lru_k_page_faults(pages: list[int], buffer_size: int, k: int, c_ref_period: int) -> int:
+    """Page faults of LRU-K found by scanning every resident page on each eviction"""
+    memory_pages = set()
+    history = {}
+    last = {}
+    page_faults = 0
+    for read_time, page in enumerate(pages):
+        if page in memory_pages:
+            if read_time - last[page] > c_ref_period:
+                # Close the correlated reference period of the page, zero is no reference
+                times = history[page]
+                if times[0] != 0:
+                    period = last[page] - times[0]
+                    for i in range(k - 1, 0, -1):
+                        if times[i - 1] != 0:
+                            times[i] = times[i - 1] + period
+                times[0] = read_time
+            last[page] = read_time
+            continue
+
+        if len(memory_pages) >= buffer_size:
+            # Oldest k-th backward reference, then oldest most recent reference, among the pages
+            # outside of their correlated reference period, or among all pages if there are none
+            eligible = [q for q in memory_pages if read_time + 1 - last[q] > c_ref_period]
+            candidates = eligible or memory_pages
+            victim = min(candidates, key=lambda q: (history[q][k - 1], history[q][0], q))
+            memory_pages.remove(victim)
+
+        memory_pages.add(page)
+        page_faults += 1
+        history[page] = [read_time] + history.get(page, [0] * k)[:-1]
+        last[page] = read_time
+
+    return page_faults
+
+
+LRU_K_CELLS = [
+    (buffer_size, k, c_ref_period)
+    for buffer_size in (50, 150, 450)
+    for k in (1, 2, 3)
+    for c_ref_period in (0, 20, 1000)
+]
+
+
+TPCH_TRACE = TRACE_FILES[WorkloadType.postgres_trace_tpch]
+
+
+@pytest.mark.skipif(not os.path.exists(TPCH_TRACE), reason="needs the TPC-H trace")
+def test_lru_k_matches_scan_on_tpch():
+    pages = np.concatenate(list(FileTraceStream(TPCH_TRACE).chunks())).tolist()
+    disk_page_count = max(pages) + 1
+
+    variants = [(buffer_size, {"k": k, "c_ref_period": c_ref_period}) for buffer_size, k, c_ref_period in LRU_K_CELLS]
+    simulator = LruKVariantSimulator(disk_page_count, variants)
+    simulator.run(pages)
+
+    for (buffer_size, k, c_ref_period), variant in zip(LRU_K_CELLS, simulator.memory_managers):
+        m = LruKMemoryManager(buffer_size, disk_page_count, k=k, c_ref_period=c_ref_period)
+        m.run(pages)
+        expected = scan_lru_k_page_faults(pages, buffer_size, k, c_ref_period)
+        assert m.total_page_faults == expected, (buffer_size, k, c_ref_period)
+        assert variant.total_page_faults == expected, (buffer_size, k, c_ref_period)
+
+
+@pytest.mark.parametrize("c_ref_period", [0, 3, 50])
+@pytest.mark.parametrize("k", [1, 2, 3])
+def test_lru_k_matches_scan_on_ties(k, c_ref_period):
+    # Few pages read many times, so many pages share a k-th backward reference
+    rng = random.Random(k * 100 + c_ref_period)
+    pages = [rng.randint(0, 30) for _ in range(3000)]
+
+    m = LruKMemoryManager(10, 31, k=k, c_ref_period=c_ref_period)
+    m.run(pages)
+    assert m.total_page_faults == scan_lru_k_page_faults(pages, 10, k, c_ref_period)
+
+
+def test_lru_k_variants_match_separate_managers():
+    rng = random.Random(0)
+    pages = [rng.randint(0, 50) for _ in range(2000)]
+    variants = [
+        (buffer_size, {"k": k, "c_ref_period": c_ref_period})
+        for buffer_size in (5, 20)
+        for k in (1, 2, 3)
+        for c_ref_period in (0, 5, 100)
+    ]
+
+    simulator = LruKVariantSimulator(51, variants)
+    simulator.run(pages)
+
+    for (buffer_size, kargs), m in zip(variants, simulator.memory_managers):
+        single = LruKMemoryManager(buffer_size, 51, **kargs)
+        single.run(pages)
+        assert m.total_reads == single.total_reads
+        assert m.total_page_faults == single.total_page_faults
+
+
+def test_lru_k_variants_can_not_retain_information():
+    with pytest.raises(MemoryManagerException):
+        LruKVariantSimulator(4, [(2, {"k": 2, "retained_information_period": 10})])
+
+
+def test_clock_gives_referenced_pages_one_chance():
+    m = ClockMemoryManager(2, 4)
+    for page in [0, 0, 0, 1, 2]:
+        m.read_page(page)
+
+    # The sweep cleared both reference bits and came back around to page 0
+    assert m.read_page(1) is False
+    assert m.read_page(0) is True
+
+
+def test_clock_sweep_keeps_pages_with_high_usage_count():
+    m = ClockSweepMemoryManager(2, 4)
+    for page in [0, 0, 0, 1, 2]:
+        m.read_page(page)
+
+    # Page 0 had a usage count of 3, so page 1 reached zero first
+    assert m.read_page(0) is False
+    assert m.read_page(1) is True
+
+
+def test_two_queue_scan_does_not_flush_pages_read_twice():
+    m = TwoQueueMemoryManager(4, 8)
+    for page in [0, 1, 2, 3, 4, 0, 5, 6, 7]:
+        m.read_page(page)
+
+    # Page 0 was promoted to Am when read again from A1out, the scan only cycled A1in
+    assert m.read_page(0) is False
+
+
+def test_arc_adapts_to_ghost_hits():
+    m = ArcMemoryManager(2, 8)
+    for page in [0, 0, 1, 2, 3]:
+        m.read_page(page)
+
+    # Page 0 is frequently used and survived the pages read once
+    assert m.read_page(0) is False
+
+    # Page 2 is remembered in B1, so reading it grows T1 at the expense of page 0 in T2
+    assert m.read_page(2) is True
+    assert m.read_page(3) is False
+    assert m.read_page(0) is True
+
+
+def test_lirs_promotes_pages_read_again_within_the_stack():
+    m = LirsMemoryManager(2, 8)
+    for page in [0, 1, 2, 1, 3]:
+        m.read_page(page)
+
+    # Page 1 became LIR when read again while in the stack, demoting page 0 to be evicted
+    assert m.read_page(1) is False
+    assert m.read_page(0) is True
+
+
+def test_lirs_needs_two_pages():
+    with pytest.raises(MemoryManagerException):
+        LirsMemoryManager(1, 4)
+
+
+def test_next_use_indices():
+    assert next_use_indices([3, 1, 3, 3, 1]).tolist() == [2, 4, 3, 5, 5]
+    assert next_use_indices([]).tolist() == []
+
+
+def test_belady_evicts_page_read_furthest_in_future():
+    pages = [0, 1, 2, 0, 1]
+    m = BeladyMemoryManager(2, 4, pages)
+    for page in pages[:3]:
+        m.read_page(page)
+
+    # Page 1 is read after page 0, so it was evicted for page 2
+    assert m.read_page(0) is False
+    assert m.read_page(1) is True
+
+
+def test_belady_run_matches_read_page():
+    rng = random.Random(0)
+    pages = [rng.randint(0, 50) for _ in range(2000)]
+
+    single = BeladyMemoryManager(10, 51, pages)
+    for page in pages:
+        single.read_page(page)
+
+    batched = BeladyMemoryManager(10, 51, pages)
+    batched.run(pages)
+
+    assert batched.total_page_faults == single.total_page_faults
+    # Nothing can do better than the optimal policy
+    lru = LruMemoryManager(10, 51)
+    lru.run(pages)
+    assert single.total_page_faults <= lru.total_page_faults
+
+
+def test_belady_reads_must_follow_trace():
+    m = BeladyMemoryManager(2, 4, [0, 1])
+    with pytest.raises(MemoryManagerException):
+        m.read_page(1)
+
+
+@pytest.mark.parametrize(
+    "memory_manager, kargs",
+    [
+        (RandomReplacementMemoryManager, {}),
+        (FifoMemoryManager, {}),
+        (LruMemoryManager, {}),
+        (MruMemoryManager, {}),
+        (LfuMemoryManager, {}),
+        (LruKMemoryManager, {"k": 2, "c_ref_period": 5, "retained_information_period": 50}),
+        (ClockMemoryManager, {}),
+        (ClockSweepMemoryManager, {}),
+        (TwoQueueMemoryManager, {}),
+        (ArcMemoryManager, {}),
+        (LirsMemoryManager, {}),
+    ],
+)
+def test_invalidate_page(memory_manager, kargs):
+    rng = random.Random(0)
+    m = memory_manager(10, 51, **kargs)
+
+    for _ in range(2000):
+        page = rng.randint(0, 50)
+        if rng.random() < 0.1:
+            resident = page in m._memory_pages
+            assert m.invalidate_page(page) is resident
+            assert m.read_page(page) is True
+        else:
+            m.read_page(page)
+        assert len(m._memory_pages) <= m.memory_page_count
+
+
+@pytest.mark.parametrize(
+    "memory_manager, kargs",
+    [
+        (FifoMemoryManager, {}),
+        (LruMemoryManager, {}),
+        (MruMemoryManager, {}),
+        (LfuMemoryManager, {}),
+        (LruKMemoryManager, {"k": 2, "c_ref_period": 5}),
+        (LruKMemoryManager, {"k": 3, "c_ref_period": 100}),
+        (ClockMemoryManager, {}),
+        (ClockSweepMemoryManager, {}),
+        (TwoQueueMemoryManager, {}),
+        (ArcMemoryManager, {}),
+        (LirsMemoryManager, {}),
+    ],
+)
+def test_run_matches_read_page(memory_manager, kargs):
+    rng = random.Random(0)
+    pages = [rng.randint(0, 50) for _ in range(2000)]
+
+    single = memory_manager(10, 51, fault_log=ArrayFaultLog(), **kargs)
+    for page in pages:
+        single.read_page(page)
+
+    batched = memory_manager(10, 51, fault_log=ArrayFaultLog(), **kargs)
+    hits, faults = batched.run(pages)
+
+    assert faults == single.total_page_faults
+    assert hits == single.total_reads - single.total_page_faults
+    assert batched.page_faults == single.page_faults
+
+
+def test_read_pages_invalid_page(basic_memory_manager):
+    with pytest.raises(InvalidPageNumber):
+        basic_memory_manager.read_pages([0, basic_memory_manager.disk_page_count])
+
+    # Nothing in the batch was read
+    assert basic_memory_manager.total_reads == 0
+
+
+def test_page_faults_not_recorded_by_default(basic_memory_manager):
+    basic_memory_manager.read_pages([0, 1, 2])
+
+    assert basic_memory_manager.total_page_faults == 3
+    with pytest.raises(MemoryManagerException):
+        basic_memory_manager.page_faults
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from page_access_generators import (
+    SYNTHETIC_WORKLOADS,
+    WorkloadType,
+    generate_page_access_array,
+    generate_page_accesses,
+)
+
+
+@pytest.mark.parametrize("workload", sorted(SYNTHETIC_WORKLOADS, key=lambda w: w.value))
+def test_synthetic_workload_bounds(workload):
+    read_order = generate_page_access_array(100, 10000, workload, seed=0)
+
+    assert len(read_order) == 10000
+    assert read_order.dtype == np.int32
+    assert read_order.min() >= 0
+    assert read_order.max() < 100
+
+
+def test_seeded_workload_is_reproducible():
+    a = generate_page_access_array(100, 1000, WorkloadType.zipfian, seed=42)
+    b = generate_page_access_array(100, 1000, WorkloadType.zipfian, seed=42)
+
+    assert np.array_equal(a, b)
+
+
+def test_only_seeded_workloads_are_cached():
+    assert generate_page_accesses(1000, 1000, WorkloadType.random, seed=1) == generate_page_accesses(
+        1000, 1000, WorkloadType.random, seed=1
+    )
+    assert generate_page_accesses(1000, 1000, WorkloadType.random) != generate_page_accesses(
+        1000, 1000, WorkloadType.random
+    )
+
+
+def test_scan_workload_wraps():
+    read_order = generate_page_access_array(3, 7, WorkloadType.scan)
+
+    assert read_order.tolist() == [0, 1, 2, 0, 1, 2, 0]
+
+
+def test_trace_workload_is_not_synthetic():
+    with pytest.raises(ValueError):
+        generate_page_access_array(100, 1000, WorkloadType.postgres_trace_tpch)
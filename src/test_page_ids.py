@@ -0,0 +1,122 @@
+import random
+
+import numpy as np
+import pytest
+
+from memory_manager import LruMemoryManager
+from page_ids import PageIdIndex, parse_tagged_lines, relation_hit_ratios, relation_name
+from page_access_generators import read_trace_from_file
+from sweep import simulate_relation_hit_ratios
+from trace_format import convert_text_trace, open_binary_trace
+from trace_stream import FileTraceStream
+
+
+@pytest.fixture()
+def tags():
+    rng = random.Random(0)
+    relations = [(1663, 16384, 2619, 0), (1663, 16384, 2619, 1), (1663, 16384, 16400, 0), (1664, 0, 1262, 0)]
+    return np.array([(*rng.choice(relations), rng.randint(0, 50)) for _ in range(3000)])
+
+
+@pytest.fixture()
+def tagged_trace(tmp_path, tags):
+    filename = tmp_path / "reads"
+    filename.write_text("".join(" ".join(map(str, tag)) + "\n" for tag in tags.tolist()))
+    return str(filename)
+
+
+def test_same_block_of_different_relations_are_different_pages():
+    index = PageIdIndex()
+    pages = index.intern(
+        parse_tagged_lines(["1663 5 100 0 412", "1663 5 200 0 412", "1663 5 100 1 412", "1663 5 100 0 412"])
+    )
+
+    assert pages.tolist() == [0, 1, 2, 0]
+    assert len(index) == 3
+    assert index.tag(2) == (1663, 5, 100, 1, 412)
+
+
+def test_page_ids_do_not_depend_on_chunking(tags):
+    whole = PageIdIndex().intern(tags)
+
+    index = PageIdIndex()
+    chunked = np.concatenate([index.intern(tags[start : start + 7]) for start in range(0, len(tags), 7)])
+
+    assert chunked.tolist() == whole.tolist()
+    # Ids are dense, in the order pages are first read
+    assert whole.max() + 1 == len(index) == len({tuple(tag) for tag in tags.tolist()})
+    first_reads = whole[np.sort(np.unique(whole, return_index=True)[1])]
+    assert first_reads.tolist() == list(range(len(index)))
+
+
+def test_sparse_relations_do_not_allocate_up_to_their_largest_block():
+    rng = random.Random(0)
+    # A dense relation that later reads a block far past the others, and one that is sparse
+    # from the start
+    blocks = [(0, block) for block in range(2000)] + [(0, 2**40), (1, 2**35), (1, 7)]
+    blocks += [(relation, 2**40 - block) for relation, block in rng.sample(blocks, 500)]
+    tags = np.array([(1663, 5, relation, 0, block) for relation, block in blocks])
+
+    index = PageIdIndex()
+    chunks = [tags[start : start + 100] for start in range(0, len(tags), 100)]
+    chunked = np.concatenate([index.intern(chunk) for chunk in chunks])
+
+    first_reads = {}
+    expected = [first_reads.setdefault(tuple(tag), len(first_reads)) for tag in tags.tolist()]
+    assert chunked.tolist() == expected
+    assert index.tags(chunked).tolist() == tags.tolist()
+    assert all(isinstance(block_pages, dict) for block_pages in index._block_pages)
+
+
+def test_index_round_trips_through_metadata(tags):
+    index = PageIdIndex()
+    pages = index.intern(tags)
+
+    restored = PageIdIndex.from_metadata(index.to_metadata())
+    assert restored.relations == index.relations
+    assert restored.page_blocks().tolist() == index.page_blocks().tolist()
+    assert restored.intern(tags).tolist() == pages.tolist()
+
+
+def test_tagged_text_trace_streams_and_converts(tagged_trace, tags):
+    pages = PageIdIndex().intern(tags).tolist()
+
+    stream = FileTraceStream(tagged_trace, chunk_size=100)
+    assert list(stream) == pages
+    assert len(stream.page_index) == max(pages) + 1
+    assert read_trace_from_file(tagged_trace) == pages
+
+    trace = open_binary_trace(convert_text_trace(tagged_trace))
+    assert trace.pages.tolist() == pages
+    assert trace.page_index.relations == stream.page_index.relations
+
+
+def test_relation_hit_ratios(tagged_trace):
+    trace_filename = convert_text_trace(tagged_trace)
+    trace = open_binary_trace(trace_filename)
+    hit_ratios = simulate_relation_hit_ratios(trace_filename, LruMemoryManager, {}, 50)
+
+    assert sum(reads for reads, _ in hit_ratios.values()) == len(trace)
+    assert list(hit_ratios)[0] in trace.page_index.relations
+
+    m = LruMemoryManager(50, len(trace.page_index))
+    m.run(trace.pages)
+    hits = sum(reads * hit_ratio for reads, hit_ratio in hit_ratios.values())
+    assert hits == pytest.approx(m.total_reads - m.total_page_faults)
+
+
+def test_relation_hit_ratios_per_relation():
+    index = PageIdIndex()
+    pages = index.intern([[1663, 5, 100, 0, 0], [1663, 5, 200, 0, 0], [1663, 5, 100, 0, 0], [1663, 5, 100, 0, 0]])
+
+    # The first read of each page faulted
+    hit_ratios = relation_hit_ratios(pages, [1, 2], index)
+
+    assert hit_ratios == {(1663, 5, 100, 0): (3, 2 / 3), (1663, 5, 200, 0): (1, 0.0)}
+
+
+def test_relation_name():
+    assert relation_name((1663, 16384, 2619, 0)) == "base/16384/2619"
+    assert relation_name((1663, 16384, 2619, 2)) == "base/16384/2619_vm"
+    assert relation_name((1664, 0, 1262, 0)) == "global/1262"
+    assert relation_name((16500, 16384, 2619, 0)) == "pg_tblspc/16500/16384/2619"
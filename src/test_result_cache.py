@@ -0,0 +1,84 @@
+import os
+
+import numpy as np
+
+import result_cache
+import stack_distance
+from hierarchy import HierarchyMemoryManager
+from memory_manager import FifoMemoryManager, LruKMemoryManager, LruMemoryManager
+from result_cache import ResultCache, trace_hash
+
+
+def test_trace_hash_ignores_integer_width():
+    pages = [3, 1, 4, 1, 5]
+
+    assert trace_hash(np.array(pages, dtype=np.int32)) == trace_hash(np.array(pages, dtype=np.int64))
+    assert trace_hash(np.array(pages)) != trace_hash(np.array(pages[::-1]))
+
+
+def test_key_depends_on_every_part():
+    key = ResultCache.key("trace", LruKMemoryManager, {"k": 2, "c_ref_period": 5}, 100)
+
+    # Keyword argument order does not matter
+    assert key == ResultCache.key("trace", LruKMemoryManager, {"c_ref_period": 5, "k": 2}, 100)
+    assert key != ResultCache.key("other", LruKMemoryManager, {"k": 2, "c_ref_period": 5}, 100)
+    assert key != ResultCache.key("trace", LruMemoryManager, {"k": 2, "c_ref_period": 5}, 100)
+    assert key != ResultCache.key("trace", LruKMemoryManager, {"k": 2, "c_ref_period": 20}, 100)
+    assert key != ResultCache.key("trace", LruKMemoryManager, {"k": 2, "c_ref_period": 5}, 200)
+
+
+def test_key_depends_on_the_source_of_the_policy(monkeypatch):
+    hierarchy_kargs = {"total_memory_page_count": 500, "lower_policy": LruKMemoryManager}
+    keys = {
+        "LRU-K": ResultCache.key("trace", LruKMemoryManager, {"k": 2}, 100),
+        "Hierarchy": ResultCache.key("trace", HierarchyMemoryManager, hierarchy_kargs, 100),
+        "LRU": ResultCache.key("trace", LruMemoryManager, {}, 100),
+        "LRU curve": ResultCache.key("trace", LruMemoryManager, {}, 100, sources=[stack_distance]),
+    }
+
+    # Edit LRU-K, which is also the lower tier of the hierarchy, and the miss ratio curve
+    source_digest = result_cache._source_digest
+
+    def edited_source_digest(source):
+        if source in (LruKMemoryManager, stack_distance):
+            return "edited"
+        return source_digest(source)
+
+    monkeypatch.setattr(result_cache, "_source_digest", edited_source_digest)
+
+    assert keys["LRU-K"] != ResultCache.key("trace", LruKMemoryManager, {"k": 2}, 100)
+    assert keys["Hierarchy"] != ResultCache.key(
+        "trace", HierarchyMemoryManager, hierarchy_kargs, 100
+    )
+    assert keys["LRU curve"] != ResultCache.key(
+        "trace", LruMemoryManager, {}, 100, sources=[stack_distance]
+    )
+    # Policies defined next to LRU-K keep their cached results
+    assert keys["LRU"] == ResultCache.key("trace", LruMemoryManager, {}, 100)
+
+
+def test_results_persist(tmp_path):
+    key = ResultCache.key("trace", LruMemoryManager, {}, 100)
+    ResultCache(str(tmp_path)).put(key, 0.25, policy="LRU")
+
+    cache = ResultCache(str(tmp_path))
+    assert cache.get(key) == 0.25
+    assert cache.get(ResultCache.key("trace", LruMemoryManager, {}, 200)) is None
+
+
+def test_least_recently_used_results_are_evicted(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=100)
+    keys = [ResultCache.key("trace", LruMemoryManager, {}, buffer_size) for buffer_size in range(10)]
+    for i, key in enumerate(keys):
+        cache.put(key, i / 10)
+        # Keep the first result in use. Access times are set explicitly, as results written
+        # within the timestamp resolution of the file system would otherwise tie.
+        cache.get(keys[0])
+        for used, used_key in enumerate([key, keys[0]]):
+            if os.path.exists(cache._path(used_key)):
+                os.utime(cache._path(used_key), (2 * i + used, 2 * i + used))
+
+    assert 0 < len(cache) < len(keys)
+    assert cache.get(keys[0]) == 0
+    assert cache.get(keys[-1]) == 0.9
+    assert cache.get(keys[1]) is None
@@ -0,0 +1,45 @@
+import random
+
+import pytest
+
+from memory_manager import LruMemoryManager
+from stack_distance import lru_miss_ratio_curve, shards_miss_ratio_curve
+
+
+@pytest.fixture()
+def page_accesses():
+    rng = random.Random(0)
+    return [int(rng.gauss(100, 30)) % 200 for _ in range(5000)]
+
+
+def test_lru_curve_matches_simulation(page_accesses):
+    curve = lru_miss_ratio_curve(page_accesses)
+
+    for buffer_size in [1, 10, 50, 100, 200]:
+        m = LruMemoryManager(buffer_size, 200)
+        for page in page_accesses:
+            m.read_page(page)
+
+        assert curve.page_faults(buffer_size) == m.total_page_faults
+
+
+def test_lru_curve_cold_misses():
+    curve = lru_miss_ratio_curve([0, 1, 2, 0, 1, 2])
+
+    assert curve.cold_misses == 3
+    assert curve.page_faults(2) == 6
+    assert curve.page_faults(3) == 3
+    assert curve.fault_rate(3) == 0.5
+
+
+def test_shards_full_sample_is_exact(page_accesses):
+    exact = lru_miss_ratio_curve(page_accesses)
+    sampled = shards_miss_ratio_curve(page_accesses, sample_rate=1)
+
+    for buffer_size in [1, 10, 50, 100, 200]:
+        assert sampled.page_faults(buffer_size) == exact.page_faults(buffer_size)
+
+
+def test_shards_invalid_sample_rate(page_accesses):
+    with pytest.raises(ValueError):
+        shards_miss_ratio_curve(page_accesses, sample_rate=0)
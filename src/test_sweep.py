@@ -0,0 +1,176 @@
+import csv
+import json
+
+import pytest
+
+from cost_model import LatencyModel
+from memory_manager import BeladyMemoryManager, FifoMemoryManager, LruKMemoryManager, LruMemoryManager
+from page_access_generators import WorkloadType, generate_page_access_array
+from result_cache import ResultCache, trace_hash
+from sweep import cell_sources, is_lru_equivalent, prepare_trace, run_sweep, simulate_cell
+from trace_format import open_binary_trace, write_binary_trace
+
+
+@pytest.fixture()
+def policies():
+    return [
+        (FifoMemoryManager, {}, "FIFO"),
+        (LruKMemoryManager, {"k": 1, "c_ref_period": 0}, "LRU1"),
+        (LruKMemoryManager, {"k": 2, "c_ref_period": 0}, "LRU2-0"),
+    ]
+
+
+def read_output(output_filename):
+    with open(output_filename, newline="") as csv_file:
+        return list(csv.DictReader(csv_file))
+
+
+def test_is_lru_equivalent():
+    assert is_lru_equivalent(LruMemoryManager, {})
+    assert is_lru_equivalent(LruKMemoryManager, {"k": 1, "c_ref_period": 0})
+    assert not is_lru_equivalent(LruKMemoryManager, {"k": 2, "c_ref_period": 0})
+    assert not is_lru_equivalent(FifoMemoryManager, {})
+
+
+def test_simulate_cell_gives_belady_the_trace(tmp_path):
+    trace_filename = str(tmp_path / "reads.trace")
+    write_binary_trace(trace_filename, [0, 1, 2, 0, 1])
+
+    # Only page 2 displaces page 1, which is read again
+    assert simulate_cell(trace_filename, BeladyMemoryManager, {}, 2) == 4 / 5
+
+
+def test_sweep_matches_serial_simulation(tmp_path, policies):
+    output_filename = str(tmp_path / "output.csv")
+    run_sweep(
+        [WorkloadType.scan], [5, 10], policies, output_filename, total_page_count=20, total_reads=200, max_workers=2
+    )
+
+    rows = read_output(output_filename)
+    assert [(row["workload"], row["bufferSize"]) for row in rows] == [("scan", "5"), ("scan", "10")]
+
+    page_accesses = generate_page_access_array(20, 200, WorkloadType.scan).tolist()
+    for row in rows:
+        for memory_manager, kargs, name in policies:
+            m = memory_manager(int(row["bufferSize"]), 20, **kargs)
+            for page in page_accesses:
+                m.read_page(page)
+            assert float(row[name]) == m.total_page_faults / m.total_reads
+
+    # Only the output and the traces it was simulated on are left to resume from
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["output.csv", "output.csv.run"]
+
+
+def write_progress(output_filename, **cell):
+    with open(output_filename + ".progress", "a") as progress_file:
+        progress_file.write(json.dumps(cell) + "\n")
+
+
+def test_sweep_resume_skips_completed_cells(tmp_path, policies):
+    output_filename = str(tmp_path / "output.csv")
+    digest = trace_hash(generate_page_access_array(20, 200, WorkloadType.scan))
+    cell = {"workload": "scan", "buffer_size": 5, "policy": "FIFO", "fault_rate": 0.5}
+    write_progress(output_filename, **cell, trace_digest=digest, metric=None)
+
+    run_sweep(
+        [WorkloadType.scan], [5], policies, output_filename, total_page_count=20, total_reads=200, resume=True
+    )
+
+    assert read_output(output_filename)[0]["FIFO"] == "0.5"
+
+
+def test_sweep_resume_ignores_cells_of_other_runs(tmp_path, policies):
+    output_filename = str(tmp_path / "output.csv")
+    digest = trace_hash(generate_page_access_array(20, 200, WorkloadType.scan))
+    cell = {"workload": "scan", "buffer_size": 5, "policy": "FIFO", "fault_rate": 0.5}
+    # Another trace, another metric, and a log from before cells were tagged
+    write_progress(output_filename, **cell, trace_digest="0" * 40, metric=None)
+    write_progress(output_filename, **cell, trace_digest=digest, metric={"write_fraction": 0.5})
+    write_progress(output_filename, **cell)
+
+    run_sweep(
+        [WorkloadType.scan], [5], policies, output_filename, total_page_count=20, total_reads=200, resume=True
+    )
+    assert read_output(output_filename)[0]["FIFO"] == "1.0"
+
+    # The finished output is resumed only with the same metric, every fault now costs 2us
+    latency_model = LatencyModel(read=2e-6, write=0, hit=0)
+    run_sweep(
+        [WorkloadType.scan],
+        [5],
+        policies,
+        output_filename,
+        total_page_count=20,
+        total_reads=200,
+        resume=True,
+        latency_model=latency_model,
+    )
+    assert float(read_output(output_filename)[0]["FIFO"]) == pytest.approx(2.0)
+
+
+def test_prepared_traces_follow_the_workload_parameters(tmp_path):
+    trace_dir = str(tmp_path / "traces")
+    trace_filename = prepare_trace(WorkloadType.random, trace_dir, 20, 200, seed=0)
+    assert prepare_trace(WorkloadType.random, trace_dir, 20, 200, seed=0) == trace_filename
+
+    # A resume with other parameters does not replay the trace streamed before
+    for page_count, reads, seed in [(20, 200, 1), (20, 100, 0), (30, 200, 0)]:
+        other_filename = prepare_trace(WorkloadType.random, trace_dir, page_count, reads, seed)
+        assert other_filename != trace_filename
+        expected = generate_page_access_array(page_count, reads, WorkloadType.random, seed)
+        assert open_binary_trace(other_filename).pages.tolist() == expected.tolist()
+
+
+def test_sweep_keeps_traces_with_the_same_file_name_apart(tmp_path):
+    for directory, pages in (("a", "0\n1\n0\n1\n"), ("b", "0\n1\n2\n3\n")):
+        (tmp_path / directory).mkdir()
+        (tmp_path / directory / "reads").write_text(pages)
+    workloads = [str(tmp_path / "a" / "reads"), str(tmp_path / "b" / "reads")]
+    output_filename = str(tmp_path / "output.csv")
+
+    run_sweep(workloads, [2], [(FifoMemoryManager, {}, "FIFO")], output_filename, backend="serial")
+
+    rows = read_output(output_filename)
+    assert [(row["workload"], row["FIFO"]) for row in rows] == [(workloads[0], "0.5"), (workloads[1], "1.0")]
+
+
+def test_sweep_uses_cached_results(tmp_path, policies):
+    output_filename = str(tmp_path / "output.csv")
+    cache = ResultCache(str(tmp_path / "cache"))
+    digest = trace_hash(generate_page_access_array(20, 200, WorkloadType.scan))
+    sources = cell_sources(FifoMemoryManager, {})
+    cache.put(ResultCache.key(digest, FifoMemoryManager, {}, 5, sources=sources), 0.5)
+
+    run_sweep(
+        [WorkloadType.scan], [5, 10], policies, output_filename, total_page_count=20, total_reads=200, cache=cache
+    )
+
+    # The cached cell was not simulated, every other cell was added to the cache
+    assert read_output(output_filename)[0]["FIFO"] == "0.5"
+    assert len(cache) == len(policies) * 2
+
+
+def test_sweep_with_a_latency_model_writes_io_time(tmp_path, policies):
+    output_filename = str(tmp_path / "output.csv")
+    latency_model = LatencyModel(read=1e-6, write=0, hit=0)
+    cache = ResultCache(str(tmp_path / "cache"))
+    digest = trace_hash(generate_page_access_array(20, 200, WorkloadType.scan))
+    cache.put(ResultCache.key(digest, FifoMemoryManager, {}, 5), 0.5)
+
+    run_sweep(
+        [WorkloadType.scan],
+        [5],
+        policies,
+        output_filename,
+        total_page_count=20,
+        total_reads=200,
+        cache=cache,
+        latency_model=latency_model,
+    )
+
+    # Without writes every fault costs a microsecond, and fault rates cached without the
+    # latency model are not reused
+    row = read_output(output_filename)[0]
+    m = FifoMemoryManager(5, 20)
+    m.run(generate_page_access_array(20, 200, WorkloadType.scan))
+    assert float(row["FIFO"]) == pytest.approx(m.total_page_faults / m.total_reads)
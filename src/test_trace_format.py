@@ -0,0 +1,102 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from page_access_generators import read_trace_array
+from trace_format import (
+    BinaryTraceWriter,
+    TraceFormatException,
+    convert_json_trace,
+    convert_text_trace,
+    converted_trace_filename,
+    is_binary_trace,
+    open_binary_trace,
+    write_binary_trace,
+)
+from trace_stream import FileTraceStream
+
+
+def test_write_and_open_binary_trace(tmp_path):
+    filename = str(tmp_path / "pages.trace")
+    write_binary_trace(filename, [3, 1, 4, 1, 5], source="test")
+
+    trace = open_binary_trace(filename)
+    assert is_binary_trace(filename)
+    assert trace.pages.tolist() == [3, 1, 4, 1, 5]
+    assert trace.width == 4
+    assert trace.source == "test"
+    assert trace.metadata["max_page"] == 5
+
+
+def test_wide_page_numbers(tmp_path):
+    filename = str(tmp_path / "pages.trace")
+    write_binary_trace(filename, [0, 2**40])
+
+    trace = open_binary_trace(filename)
+    assert trace.width == 8
+    assert trace.pages.dtype == np.dtype("<i8")
+    assert trace.pages.tolist() == [0, 2**40]
+
+
+def test_empty_binary_trace(tmp_path):
+    filename = str(tmp_path / "pages.trace")
+    write_binary_trace(filename, [])
+
+    assert len(open_binary_trace(filename)) == 0
+
+
+def test_convert_text_trace(tmp_path):
+    text_filename = tmp_path / "reads"
+    text_filename.write_text("8446\n412\n698\n")
+
+    binary_filename = convert_text_trace(str(text_filename))
+    assert binary_filename == str(text_filename) + ".trace"
+    assert open_binary_trace(binary_filename).pages.tolist() == [8446, 412, 698]
+
+
+def test_convert_json_trace(tmp_path):
+    json_filename = tmp_path / "pages_requested"
+    json_filename.write_text(json.dumps([7, 8, 9]))
+
+    binary_filename = convert_json_trace(str(json_filename))
+    assert open_binary_trace(binary_filename).pages.tolist() == [7, 8, 9]
+
+
+def test_open_text_trace_as_binary(tmp_path):
+    text_filename = tmp_path / "reads"
+    text_filename.write_text("1\n2\n")
+
+    assert not is_binary_trace(str(text_filename))
+    with pytest.raises(TraceFormatException):
+        open_binary_trace(str(text_filename))
+
+
+def test_failed_conversion_leaves_no_trace(tmp_path, monkeypatch):
+    text_filename = tmp_path / "reads"
+    text_filename.write_text("1\n2\n3\n")
+
+    def fail(self, pages):
+        raise TraceFormatException("disk full")
+
+    monkeypatch.setattr(BinaryTraceWriter, "write", fail)
+    with pytest.raises(TraceFormatException):
+        convert_text_trace(str(text_filename))
+
+    assert os.listdir(tmp_path) == ["reads"]
+    assert FileTraceStream(str(text_filename)).binary_filename() is None
+
+
+def test_trace_older_than_its_text_is_ignored(tmp_path):
+    text_filename = tmp_path / "reads"
+    text_filename.write_text("1\n2\n3\n")
+    binary_filename = convert_text_trace(str(text_filename))
+
+    # The text trace is edited after it was converted
+    text_filename.write_text("4\n5\n")
+    os.utime(binary_filename, (1_000_000_000, 1_000_000_000))
+
+    assert converted_trace_filename(str(text_filename)) is None
+    assert read_trace_array(str(text_filename)).tolist() == [4, 5]
+    assert np.concatenate(list(FileTraceStream(str(text_filename)).chunks())).tolist() == [4, 5]
@@ -0,0 +1,91 @@
+import json
+import random
+
+import numpy as np
+import pytest
+
+from stack_distance import lru_miss_ratio_curve
+from trace_stats import TraceStatistics, previous_read_indices, trace_statistics
+from trace_stream import ArrayTraceStream
+
+
+@pytest.fixture()
+def page_accesses():
+    rng = random.Random(0)
+    return [int(rng.expovariate(0.02)) for _ in range(5000)]
+
+
+def test_previous_read_indices():
+    last_read = np.full(4, -1, dtype=np.int64)
+    last_read[1] = 2
+
+    previous = previous_read_indices(np.array([3, 1, 3, 3, 1]), 10, last_read)
+
+    assert previous.tolist() == [-1, 2, 10, 12, 11]
+    assert last_read.tolist() == [-1, 14, -1, 13]
+
+
+@pytest.mark.parametrize("chunk_size", [7, 1000, 1 << 16])
+def test_statistics_match_brute_force(page_accesses, chunk_size):
+    statistics = trace_statistics(ArrayTraceStream(np.array(page_accesses), chunk_size=chunk_size), window=100)
+
+    assert statistics.total_reads == len(page_accesses)
+    assert statistics.unique_pages == len(set(page_accesses))
+    assert statistics.page_counts[0] == page_accesses.count(0)
+
+    gaps = np.zeros_like(statistics.gap_histogram)
+    last_read = {}
+    for time, page in enumerate(page_accesses):
+        if page in last_read:
+            gaps[(time - last_read[page]).bit_length() - 1] += 1
+        last_read[page] = time
+    assert statistics.gap_histogram.tolist() == gaps.tolist()
+
+    working_set_sizes = [len(set(page_accesses[i : i + 100])) for i in range(0, len(page_accesses), 100)]
+    assert statistics.working_set_sizes.tolist() == working_set_sizes
+
+
+def test_reuse_distances_are_exact_without_sampling(page_accesses):
+    statistics = trace_statistics(page_accesses, sample_rate=1)
+    curve = lru_miss_ratio_curve(page_accesses)
+
+    for buffer_size in [1, 10, 50, 100]:
+        assert statistics.reuse_curve.page_faults(buffer_size) == curve.page_faults(buffer_size)
+    assert statistics.reuse_distance_histogram().sum() == len(page_accesses) - curve.cold_misses
+
+
+def test_zipf_fit():
+    ranks = np.arange(1, 1001)
+    counts = np.round(100000 / ranks).astype(np.int64)
+    page_accesses = np.repeat(np.arange(1000), counts)
+    np.random.default_rng(0).shuffle(page_accesses)
+
+    exponent, r_squared = trace_statistics(ArrayTraceStream(page_accesses)).zipf_fit()
+
+    assert exponent == pytest.approx(1, abs=0.01)
+    assert r_squared > 0.99
+
+
+def test_page_cdf():
+    statistics = trace_statistics([0, 0, 1, 3])
+    page_numbers, fractions = statistics.page_cdf(points=4)
+
+    assert page_numbers.tolist() == [0, 1, 2, 3]
+    assert fractions.tolist() == [0.5, 0.75, 0.75, 1.0]
+
+
+def test_statistics_are_json_serializable(page_accesses):
+    statistics = trace_statistics(page_accesses)
+
+    exported = json.loads(json.dumps(statistics.to_dict()))
+    assert exported["total_reads"] == len(page_accesses)
+    assert sum(exported["inter_reference_gaps"].values()) == len(page_accesses) - len(set(page_accesses))
+
+
+def test_empty_trace():
+    statistics = TraceStatistics()
+
+    assert statistics.total_reads == 0
+    assert statistics.max_page == -1
+    assert statistics.zipf_fit() == (0.0, 1.0)
+    json.dumps(statistics.to_dict())
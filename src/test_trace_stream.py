@@ -0,0 +1,61 @@
+import gzip
+
+import numpy as np
+import pytest
+
+from page_access_generators import WorkloadType, generate_page_access_array
+from trace_format import write_binary_trace
+from trace_stream import ArrayTraceStream, FileTraceStream, SyntheticTraceStream
+
+
+@pytest.fixture()
+def text_trace(tmp_path):
+    filename = tmp_path / "reads"
+    filename.write_text("".join(f"{page}\n" for page in range(10)))
+    return str(filename)
+
+
+def test_text_trace_stream(text_trace):
+    stream = FileTraceStream(text_trace, chunk_size=3)
+
+    assert [len(chunk) for chunk in stream.chunks()] == [3, 3, 3, 1]
+    assert list(stream) == list(range(10))
+    assert stream.max_page() == 9
+
+
+def test_gzip_trace_stream(tmp_path):
+    filename = str(tmp_path / "reads.gz")
+    with gzip.open(filename, "wt") as trace_file:
+        trace_file.write("5\n6\n7\n")
+
+    assert list(FileTraceStream(filename)) == [5, 6, 7]
+
+
+def test_binary_trace_stream(tmp_path):
+    filename = str(tmp_path / "reads.trace")
+    write_binary_trace(filename, [4, 2, 4])
+
+    assert list(FileTraceStream(filename, max_reads=2)) == [4, 2]
+
+
+def test_converted_trace_preferred(text_trace):
+    write_binary_trace(text_trace + ".trace", [1, 1, 1])
+
+    assert list(FileTraceStream(text_trace)) == [1, 1, 1]
+
+
+def test_array_trace_stream_max_reads():
+    stream = ArrayTraceStream(range(100), chunk_size=30, max_reads=50)
+
+    assert len(stream) == 50
+    assert list(stream) == list(range(50))
+
+
+def test_synthetic_trace_stream_is_repeatable():
+    stream = SyntheticTraceStream(100, 1000, WorkloadType.hot_cold, chunk_size=64)
+
+    assert list(stream) == list(stream)
+    assert np.array_equal(
+        np.concatenate(list(stream.chunks())),
+        generate_page_access_array(100, 1000, WorkloadType.hot_cold, seed=stream.seed),
+    )
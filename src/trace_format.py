@@ -0,0 +1,309 @@
+"""Compact binary page trace format.
+
+A binary trace is a 64 byte header followed by fixed width little-endian page numbers and a
+JSON metadata trailer. The page numbers are opened with numpy.memmap, so loading a trace does
+not parse or copy it and worker processes reading the same file share its pages.
+
+Header layout, little-endian:
+
+    magic            8 bytes   b"PGTRACE\\0"
+    version          uint16
+    width            uint16    bytes per page number, 4 or 8
+    reserved         uint32
+    count            uint64    number of page reads
+    metadata offset  uint64    byte offset of the JSON metadata
+    metadata length  uint64
+"""
+import argparse
+import json
+import os
+import struct
+from typing import Iterable
+
+import numpy as np
+
+from page_ids import PageIdIndex, is_tagged_line, line_prefix, parse_tagged_lines, strip_prefix
+
+MAGIC = b"PGTRACE\0"
+VERSION = 1
+HEADER_SIZE = 64
+_HEADER_STRUCT = struct.Struct("<8sHHIQQQ")
+
+# Binary traces converted from a text trace are stored next to it with this suffix
+BINARY_TRACE_SUFFIX = ".trace"
+
+# Approximate bytes of a text trace parsed at a time during conversion
+CONVERSION_CHUNK_BYTES = 1 << 24
+
+
+class TraceFormatException(Exception):
+    pass
+
+
+class BinaryTrace:
+    """A binary trace opened for reading. The pages are memory mapped, not loaded."""
+
+    def __init__(self, filename: str):
+        self.filename = filename
+
+        with open(filename, "rb") as trace_file:
+            header = trace_file.read(HEADER_SIZE)
+            if len(header) < HEADER_SIZE or not header.startswith(MAGIC):
+                raise TraceFormatException(f"{filename} is not a binary trace")
+
+            _, version, width, _, count, metadata_offset, metadata_length = _HEADER_STRUCT.unpack(
+                header[: _HEADER_STRUCT.size]
+            )
+            if version != VERSION:
+                raise TraceFormatException(f"Unsupported binary trace version {version}")
+            if width not in (4, 8):
+                raise TraceFormatException(f"Unsupported page number width {width}")
+
+            trace_file.seek(metadata_offset)
+            self.metadata: dict = json.loads(trace_file.read(metadata_length) or b"{}")
+
+        self.width = width
+        dtype = np.dtype(f"<i{width}")
+        if count == 0:
+            self.pages = np.empty(0, dtype=dtype)
+        else:
+            self.pages = np.memmap(filename, dtype=dtype, mode="r", offset=HEADER_SIZE, shape=(count,))
+
+    @property
+    def source(self) -> str | None:
+        return self.metadata.get("source")
+
+    @property
+    def page_index(self) -> PageIdIndex | None:
+        """How the page ids of a trace of buffer tags were interned, None for plain page numbers"""
+        if "page_index" not in self.metadata:
+            return None
+        return PageIdIndex.from_metadata(self.metadata["page_index"])
+
+    def __len__(self) -> int:
+        return len(self.pages)
+
+
+def is_binary_trace(filename: str) -> bool:
+    with open(filename, "rb") as trace_file:
+        return trace_file.read(len(MAGIC)) == MAGIC
+
+
+def is_json_trace(filename: str) -> bool:
+    """Whether a text trace is a JSON list of page numbers rather than one page per line"""
+    with open(filename) as trace_file:
+        return trace_file.read(64).lstrip().startswith("[")
+
+
+def open_binary_trace(filename: str) -> BinaryTrace:
+    return BinaryTrace(filename)
+
+
+def converted_trace_filename(filename: str) -> str | None:
+    """The binary trace converted from a text trace and stored next to it, if there is one.
+
+    A binary trace older than its text trace was converted from an earlier version of it and
+    is ignored.
+
+    :param filename: The text trace
+    :type filename: str
+    :return: The name of the binary trace, None if there is none or it is out of date
+    :rtype: str | None
+    """
+    binary_filename = filename + BINARY_TRACE_SUFFIX
+    try:
+        binary_mtime = os.path.getmtime(binary_filename)
+    except FileNotFoundError:
+        return None
+
+    try:
+        if os.path.getmtime(filename) > binary_mtime:
+            return None
+    except FileNotFoundError:
+        # Only the binary trace was kept
+        pass
+
+    return binary_filename if is_binary_trace(binary_filename) else None
+
+
+class BinaryTraceWriter:
+    """Writes a binary trace incrementally, filling in the header when closed.
+
+    :param filename: Where to write the trace
+    :type filename: str
+    :param width: Bytes per page number, 4 or 8
+    :type width: int
+    :param metadata: Extra JSON serializable metadata, such as the source of the trace
+    :type metadata: dict | None
+    """
+
+    def __init__(self, filename: str, width: int = 4, metadata: dict | None = None):
+        if width not in (4, 8):
+            raise TraceFormatException(f"Unsupported page number width {width}")
+
+        self.filename = filename
+        self.width = width
+        self.metadata = dict(metadata or {})
+        self.count = 0
+        self.max_page = -1
+        self._dtype = np.dtype(f"<i{width}")
+        self._file = open(filename, "wb")
+        self._file.write(bytes(HEADER_SIZE))
+
+    def write(self, pages: Iterable[int]):
+        pages = np.asarray(pages, dtype=np.int64)
+        if len(pages) == 0:
+            return
+
+        if pages.min() < 0 or pages.max() > np.iinfo(self._dtype).max:
+            raise TraceFormatException(
+                f"Page numbers do not fit in a {self.width} byte binary trace"
+            )
+
+        self._file.write(pages.astype(self._dtype).tobytes())
+        self.count += len(pages)
+        self.max_page = max(self.max_page, int(pages.max()))
+
+    def close(self):
+        self.metadata["max_page"] = self.max_page
+        encoded_metadata = json.dumps(self.metadata).encode()
+        metadata_offset = self._file.tell()
+        self._file.write(encoded_metadata)
+
+        self._file.seek(0)
+        self._file.write(
+            _HEADER_STRUCT.pack(
+                MAGIC, VERSION, self.width, 0, self.count, metadata_offset, len(encoded_metadata)
+            )
+        )
+        self._file.close()
+
+    def discard(self):
+        """Close the trace without finishing it and delete what was written"""
+        self._file.close()
+        os.remove(self.filename)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        # A trace cut short by an error has no header and must not be mistaken for a whole one
+        if exc_info[0] is not None:
+            self.discard()
+        else:
+            self.close()
+
+
+def write_binary_trace(
+    filename: str, page_accesses: Iterable[int], source: str | None = None, width: int | None = None
+):
+    """Write a whole trace to a binary trace file.
+
+    :param filename: Where to write the trace
+    :type filename: str
+    :param page_accesses: The pages read, in order
+    :type page_accesses: Iterable[int]
+    :param source: Where the trace came from, kept in the metadata
+    :type source: str | None
+    :param width: Bytes per page number. Defaults to the smallest width that fits.
+    :type width: int | None
+    """
+    pages = np.asarray(page_accesses, dtype=np.int64)
+    if width is None:
+        width = 4 if len(pages) == 0 or pages.max() <= np.iinfo(np.int32).max else 8
+
+    with BinaryTraceWriter(filename, width, {"source": source}) as writer:
+        writer.write(pages)
+
+
+def convert_text_trace(text_filename: str, binary_filename: str | None = None, width: int = 4) -> str:
+    """Convert a text trace with one page number per line, streaming it in chunks.
+
+    Traces of buffer tags, as printed by page_reads.stp, are interned to dense page ids and the
+    index is kept in the metadata.
+
+    :param text_filename: The text trace to convert
+    :type text_filename: str
+    :param binary_filename: Where to write the binary trace. Defaults to the text trace's
+        name with BINARY_TRACE_SUFFIX appended.
+    :type binary_filename: str | None
+    :param width: Bytes per page number, 4 or 8
+    :type width: int
+    :return: The name of the binary trace
+    :rtype: str
+    """
+    binary_filename = binary_filename or text_filename + BINARY_TRACE_SUFFIX
+    partial_filename = binary_filename + ".partial"
+
+    with open(text_filename) as text_file, BinaryTraceWriter(
+        partial_filename, width, {"source": os.path.basename(text_filename)}
+    ) as writer:
+        page_index = None
+        tagged = prefix = None
+        while lines := text_file.readlines(CONVERSION_CHUNK_BYTES):
+            lines = [line for line in lines if line.strip()]
+            if not lines:
+                continue
+            if prefix is None:
+                prefix = line_prefix(lines[0])
+            lines = strip_prefix(lines, prefix)
+            if tagged is None:
+                tagged = is_tagged_line(lines[0])
+                page_index = PageIdIndex() if tagged else None
+            if tagged:
+                writer.write(page_index.intern(parse_tagged_lines(lines)))
+            else:
+                writer.write(np.fromiter((int(line) for line in lines), dtype=np.int64))
+
+        if page_index is not None:
+            writer.metadata["page_index"] = page_index.to_metadata()
+    os.replace(partial_filename, binary_filename)
+
+    return binary_filename
+
+
+def convert_json_trace(json_filename: str, binary_filename: str | None = None, width: int = 4) -> str:
+    """Convert a trace stored as a JSON list of page numbers, like the pgbench pages_requested file.
+
+    :param json_filename: The JSON trace to convert
+    :type json_filename: str
+    :param binary_filename: Where to write the binary trace. Defaults to the JSON trace's
+        name with BINARY_TRACE_SUFFIX appended.
+    :type binary_filename: str | None
+    :param width: Bytes per page number, 4 or 8
+    :type width: int
+    :return: The name of the binary trace
+    :rtype: str
+    """
+    binary_filename = binary_filename or json_filename + BINARY_TRACE_SUFFIX
+
+    with open(json_filename) as json_file:
+        pages = json.load(json_file)
+
+    partial_filename = binary_filename + ".partial"
+    with BinaryTraceWriter(
+        partial_filename, width, {"source": os.path.basename(json_filename)}
+    ) as writer:
+        writer.write(pages)
+    os.replace(partial_filename, binary_filename)
+
+    return binary_filename
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert page traces to the binary trace format")
+    parser.add_argument("traces", nargs="+", help="Text or JSON traces to convert")
+    parser.add_argument("--width", type=int, default=4, choices=(4, 8), help="Bytes per page number")
+    args = parser.parse_args()
+
+    for trace in args.traces:
+        if is_json_trace(trace):
+            binary_filename = convert_json_trace(trace, width=args.width)
+        else:
+            binary_filename = convert_text_trace(trace, width=args.width)
+
+        print(f"Converted {trace} to {binary_filename} ({len(open_binary_trace(binary_filename))} reads)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+"""Reuse and popularity statistics of a trace, computed in one streaming pass.
+
+Every statistic is vectorized over the chunks of a TraceStream, so traces of hundreds of
+millions of reads are profiled without holding them in memory. Reuse distances are the one
+exception that needs a per-read loop, so only the reads of a SHARDS sample of pages are
+tracked. For example
+
+    python trace_stats.py postgres_trace_tpch --output tpch_stats.json --plot tpch_stats.png
+
+from src/ writes the statistics as JSON and plots them without a GUI backend.
+"""
+import argparse
+import json
+from typing import Iterable
+
+import numpy as np
+
+from page_access_generators import WorkloadType
+from stack_distance import MissRatioCurve, sampled_miss_ratio_curve, shards_sample_mask
+from trace_stream import ArrayTraceStream, FileTraceStream, TraceStream, workload_trace_stream
+
+# Reads per window of the working set size over time
+DEFAULT_WINDOW = 10000
+
+# Gaps and distances are bucketed by powers of two, bucket b holds values in [2^b, 2^(b+1))
+_LOG2_BUCKETS = 64
+
+
+def _log2_histogram(values: np.ndarray, weights: np.ndarray | None = None) -> np.ndarray:
+    buckets = np.frexp(values.astype(np.float64))[1] - 1
+    return np.bincount(buckets, weights=weights, minlength=_LOG2_BUCKETS)[:_LOG2_BUCKETS]
+
+
+def _grow(array: np.ndarray, size: int, fill: int) -> np.ndarray:
+    if size <= len(array):
+        return array
+    grown = np.full(max(size, 2 * len(array)), fill, dtype=array.dtype)
+    grown[: len(array)] = array
+    return grown
+
+
+def previous_read_indices(pages: np.ndarray, start: int, last_read: np.ndarray) -> np.ndarray:
+    """The index of the previous read of the page at every read of a chunk, or -1 if there was none
+
+    :param pages: The pages read in this chunk
+    :type pages: numpy.ndarray
+    :param start: The index in the trace of the first read of the chunk
+    :type start: int
+    :param last_read: The index of the last read of every page before the chunk, or -1. Updated
+        to the last read of every page read in the chunk.
+    :type last_read: numpy.ndarray
+    :return: The index in the trace of the previous read of each page read
+    :rtype: numpy.ndarray
+    """
+    order = np.argsort(pages, kind="stable")
+    sorted_pages = pages[order]
+    first = np.empty(len(pages), dtype=bool)
+    first[0] = True
+    np.not_equal(sorted_pages[1:], sorted_pages[:-1], out=first[1:])
+
+    previous = np.empty(len(pages), dtype=np.int64)
+    repeats = np.flatnonzero(~first)
+    previous[order[repeats]] = order[repeats - 1] + start
+    previous[order[first]] = last_read[sorted_pages[first]]
+
+    final = np.empty(len(pages), dtype=bool)
+    final[-1] = True
+    final[:-1] = first[1:]
+    last_read[sorted_pages[final]] = order[final] + start
+    return previous
+
+
+class TraceStatistics:
+    """Reuse and popularity statistics of a trace
+
+    :param window: Reads per window of the working set size over time
+    :type window: int
+    :param sample_rate: Fraction of pages whose reuse distances are tracked
+    :type sample_rate: float
+    """
+
+    def __init__(self, window: int = DEFAULT_WINDOW, sample_rate: float = 0.01):
+        if window < 1:
+            raise ValueError("window must be at least one read")
+        if not 0 < sample_rate <= 1:
+            raise ValueError("sample_rate must be in (0, 1]")
+
+        self.window = window
+        self.sample_rate = sample_rate
+
+        self.total_reads: int = 0
+        self.unique_pages: int = 0
+        # Reads of every page, indexed by page number
+        self.page_counts = np.zeros(0, dtype=np.int64)
+        # Reads since the previous read of the same page, bucketed by powers of two
+        self.gap_histogram = np.zeros(_LOG2_BUCKETS, dtype=np.int64)
+        # Distinct pages read in each window of consecutive reads, the last may be partial
+        self.working_set_sizes = np.zeros(0, dtype=np.int64)
+
+        self._last_read = np.zeros(0, dtype=np.int64)
+        self._sampled_chunks: list[np.ndarray] = []
+        self._reuse_curve: MissRatioCurve | None = None
+
+    def add_chunk(self, pages: np.ndarray):
+        """Add the next reads of the trace
+
+        :param pages: The pages read, in order
+        :type pages: numpy.ndarray
+        """
+        pages = np.asarray(pages, dtype=np.int64)
+        if not len(pages):
+            return
+        if pages.min() < 0:
+            raise ValueError("Page numbers can not be negative")
+
+        size = int(pages.max()) + 1
+        self._last_read = _grow(self._last_read, size, -1)
+        self.page_counts = _grow(self.page_counts, size, 0)
+
+        start = self.total_reads
+        previous = previous_read_indices(pages, start, self._last_read)
+        self.total_reads += len(pages)
+
+        self.page_counts[: size] += np.bincount(pages, minlength=size)
+        self.unique_pages += int(np.count_nonzero(previous < 0))
+
+        reads = np.arange(start, self.total_reads)
+        reused = previous >= 0
+        self.gap_histogram += _log2_histogram(reads[reused] - previous[reused]).astype(np.int64)
+
+        # A read adds to its window's working set if the page was not read earlier in the window
+        windows = reads // self.window
+        first_in_window = previous < windows * self.window
+        window_count = int(windows[-1]) + 1
+        self.working_set_sizes = np.pad(self.working_set_sizes, (0, window_count - len(self.working_set_sizes)))
+        self.working_set_sizes[int(windows[0]):] += np.bincount(
+            windows[first_in_window] - windows[0], minlength=window_count - int(windows[0])
+        )
+
+        self._sampled_chunks.append(pages[shards_sample_mask(pages, self.sample_rate)])
+        self._reuse_curve = None
+
+    def add_trace(self, trace: TraceStream | Iterable[int]):
+        """Add every read of a trace
+
+        :param trace: The pages read, as a stream or in order
+        :type trace: TraceStream | Iterable[int]
+        """
+        if not isinstance(trace, TraceStream):
+            trace = ArrayTraceStream(np.fromiter(trace, dtype=np.int64))
+        for chunk in trace.chunks():
+            self.add_chunk(chunk)
+
+    @property
+    def reuse_curve(self) -> MissRatioCurve:
+        """The LRU miss ratio curve of the trace, exact when sample_rate is 1"""
+        if self._reuse_curve is None:
+            sampled = np.concatenate(self._sampled_chunks) if self._sampled_chunks else np.zeros(0, np.int64)
+            self._sampled_chunks = [sampled]
+            self._reuse_curve = sampled_miss_ratio_curve(sampled.tolist(), self.total_reads, self.sample_rate)
+        return self._reuse_curve
+
+    def reuse_distance_histogram(self) -> np.ndarray:
+        """Reads by the number of distinct pages read since the previous read of the same page,
+        bucketed by powers of two. A distance of 1 means no other page was read in between.
+        Reads of pages never read before are left out.
+
+        :return: The (scaled) number of reads in each bucket
+        :rtype: numpy.ndarray
+        """
+        distance_counts = self.reuse_curve.distance_counts
+        distances = np.fromiter(distance_counts.keys(), dtype=np.int64, count=len(distance_counts))
+        counts = np.fromiter(distance_counts.values(), dtype=np.float64, count=len(distance_counts))
+        return _log2_histogram(distances, counts)
+
+    def popularity(self) -> np.ndarray:
+        """Reads of every page read, most popular first"""
+        counts = self.page_counts[self.page_counts > 0]
+        return -np.sort(-counts)
+
+    def zipf_fit(self) -> tuple[float, float]:
+        """Fits page popularity to a Zipf distribution, with a least squares line through the
+        log rank against the log number of reads.
+
+        :return: The Zipf exponent and the r squared of the fit
+        :rtype: tuple[float, float]
+        """
+        counts = self.popularity()
+        if len(counts) < 2:
+            return 0.0, 1.0
+        log_ranks = np.log(np.arange(1, len(counts) + 1))
+        log_counts = np.log(counts)
+        slope, intercept = np.polyfit(log_ranks, log_counts, 1)
+        residuals = log_counts - (slope * log_ranks + intercept)
+        total = np.sum((log_counts - log_counts.mean()) ** 2)
+        r_squared = 1 - np.sum(residuals**2) / total if total else 1.0
+        return float(-slope), float(r_squared)
+
+    def page_cdf(self, points: int = 100) -> tuple[np.ndarray, np.ndarray]:
+        """The fraction of reads of pages up to each page number
+
+        :param points: How many page numbers to sample the CDF at
+        :type points: int
+        :return: The page numbers and the fraction of reads of pages up to them
+        :rtype: tuple[numpy.ndarray, numpy.ndarray]
+        """
+        counts = self.page_counts[: self.max_page + 1]
+        if not len(counts):
+            return np.zeros(0, np.int64), np.zeros(0)
+        page_numbers = np.unique(np.linspace(0, len(counts) - 1, points).astype(np.int64))
+        return page_numbers, np.cumsum(counts)[page_numbers] / self.total_reads
+
+    @property
+    def max_page(self) -> int:
+        """The largest page number read"""
+        read = np.flatnonzero(self.page_counts)
+        return int(read[-1]) if len(read) else -1
+
+    def to_dict(self) -> dict:
+        """The statistics as JSON serializable values"""
+        zipf_exponent, zipf_r_squared = self.zipf_fit()
+        page_numbers, page_cdf = self.page_cdf()
+        gap_histogram = self.gap_histogram
+        reuse_histogram = self.reuse_distance_histogram()
+        return {
+            "total_reads": self.total_reads,
+            "unique_pages": self.unique_pages,
+            "max_page": self.max_page,
+            "zipf_exponent": zipf_exponent,
+            "zipf_r_squared": zipf_r_squared,
+            "sample_rate": self.sample_rate,
+            # Buckets are keyed by their smallest value and only buckets with reads are kept
+            "inter_reference_gaps": {1 << int(b): int(gap_histogram[b]) for b in np.flatnonzero(gap_histogram)},
+            "reuse_distances": {1 << int(b): float(reuse_histogram[b]) for b in np.flatnonzero(reuse_histogram)},
+            "window": self.window,
+            "working_set_sizes": self.working_set_sizes.tolist(),
+            "page_cdf": {"page_numbers": page_numbers.tolist(), "fractions": page_cdf.tolist()},
+        }
+
+    def plot(self, filename: str, title: str | None = None):
+        """Plots the statistics to an image file, without needing a display
+
+        :param filename: Where to save the plot, its extension picks the format
+        :type filename: str
+        :param title: Title of the figure
+        :type title: str | None
+        """
+        import matplotlib
+
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+
+        figure, axes = plt.subplots(2, 2, figsize=(12, 8))
+        if title:
+            figure.suptitle(title)
+
+        counts = self.popularity()
+        axes[0][0].loglog(np.arange(1, len(counts) + 1), counts)
+        zipf_exponent, _ = self.zipf_fit()
+        axes[0][0].set_title(f"Popularity (Zipf exponent {zipf_exponent:.2f})")
+        axes[0][0].set_xlabel("Rank")
+        axes[0][0].set_ylabel("Reads")
+
+        for histogram, label in [
+            (self.gap_histogram, "Inter-reference gap"),
+            (self.reuse_distance_histogram(), "Reuse distance"),
+        ]:
+            total = histogram.sum()
+            if total:
+                buckets = np.flatnonzero(histogram)
+                axes[0][1].step(2.0 ** buckets, np.cumsum(histogram[buckets]) / total, where="post", label=label)
+        axes[0][1].set_xscale("log")
+        axes[0][1].set_title("Reuse")
+        axes[0][1].set_xlabel("Reads or distinct pages")
+        axes[0][1].set_ylabel("Fraction of reuses")
+        axes[0][1].legend()
+
+        axes[1][0].plot(np.arange(len(self.working_set_sizes)) * self.window, self.working_set_sizes)
+        axes[1][0].set_title(f"Working set size per {self.window} reads")
+        axes[1][0].set_xlabel("Read")
+        axes[1][0].set_ylabel("Distinct pages")
+
+        page_numbers, page_cdf = self.page_cdf()
+        axes[1][1].plot(page_numbers, page_cdf)
+        axes[1][1].set_title("Page number CDF")
+        axes[1][1].set_xlabel("Page number")
+        axes[1][1].set_ylabel("Fraction of reads")
+
+        figure.tight_layout()
+        figure.savefig(filename)
+        plt.close(figure)
+
+
+def trace_statistics(
+    trace: TraceStream | Iterable[int], window: int = DEFAULT_WINDOW, sample_rate: float = 0.01
+) -> TraceStatistics:
+    """Computes the reuse and popularity statistics of a trace in one pass
+
+    :param trace: The pages read, as a stream or in order
+    :type trace: TraceStream | Iterable[int]
+    :param window: Reads per window of the working set size over time
+    :type window: int
+    :param sample_rate: Fraction of pages whose reuse distances are tracked, 1 tracks all of them
+    :type sample_rate: float
+    :return: The statistics of the trace
+    :rtype: TraceStatistics
+    """
+    statistics = TraceStatistics(window, sample_rate)
+    statistics.add_trace(trace)
+    return statistics
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reuse and popularity statistics of a trace")
+    parser.add_argument("trace", help="A workload name, such as postgres_trace_tpch, or a trace file")
+    parser.add_argument("--total-page-count", type=int, default=10000, help="Pages synthetic workloads access")
+    parser.add_argument("--total-reads", type=int, default=1000000, help="Reads of synthetic workloads")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for synthetic workloads")
+    parser.add_argument("--window", type=int, default=DEFAULT_WINDOW, help="Reads per working set window")
+    parser.add_argument("--sample-rate", type=float, default=0.01, help="Fraction of pages sampled for reuse distances")
+    parser.add_argument("--output", help="Where to write the statistics as JSON")
+    parser.add_argument("--plot", help="Where to save a plot of the statistics")
+    args = parser.parse_args()
+
+    if args.trace in WorkloadType.__members__:
+        trace = workload_trace_stream(WorkloadType[args.trace], args.total_page_count, args.total_reads, args.seed)
+    else:
+        trace = FileTraceStream(args.trace)
+
+    statistics = trace_statistics(trace, args.window, args.sample_rate)
+    zipf_exponent, zipf_r_squared = statistics.zipf_fit()
+    print(f"{statistics.total_reads:,} reads of {statistics.unique_pages:,} unique pages")
+    print(f"Zipf exponent {zipf_exponent:.3f} (r squared {zipf_r_squared:.3f})")
+    if len(statistics.working_set_sizes):
+        print(
+            f"Working set per {args.window} reads: mean {statistics.working_set_sizes.mean():,.0f}, "
+            f"max {statistics.working_set_sizes.max():,}"
+        )
+    gaps = statistics.gap_histogram
+    if gaps.sum():
+        median_bucket = int(np.searchsorted(np.cumsum(gaps), gaps.sum() / 2))
+        print(f"Median inter-reference gap between {2**median_bucket} and {2**(median_bucket + 1) - 1} reads")
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(statistics.to_dict(), output_file, indent=2)
+    if args.plot:
+        statistics.plot(args.plot, title=args.trace)
+
+
+if __name__ == "__main__":
+    main()
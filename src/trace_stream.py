@@ -0,0 +1,323 @@
+import gzip
+import io
+import json
+import random
+from typing import Iterable, Iterator
+
+import numpy as np
+
+from page_access_generators import (
+    SYNTHETIC_WORKLOADS,
+    TRACE_FILES,
+    WorkloadType,
+    generate_page_access_chunks,
+)
+from page_ids import OPS, PageIdIndex, is_tagged_line, line_prefix, parse_tagged_lines, strip_prefix
+from trace_format import converted_trace_filename, is_binary_trace, is_json_trace, open_binary_trace
+
+# Number of page reads held in memory at a time while streaming
+DEFAULT_CHUNK_SIZE = 1 << 16
+
+# Approximate bytes of a text trace read at a time
+_TEXT_CHUNK_BYTES = 1 << 20
+
+
+class TraceStream:
+    """A trace that is read incrementally, one chunk of page reads at a time.
+
+    Iterating a stream yields page numbers as ints, so any MemoryManager can consume it with
+    read_page. A stream can be iterated several times and yields the same reads each time.
+
+    :param max_reads: Stop after this many reads. None streams the whole trace.
+    :type max_reads: int | None
+    """
+
+    def __init__(self, max_reads: int | None = None):
+        self.max_reads = max_reads
+        self._max_page: int | None = None
+
+    def _chunks(self) -> Iterator[np.ndarray]:
+        raise NotImplementedError()
+
+    def chunks(self) -> Iterator[np.ndarray]:
+        """Yields the trace as NumPy arrays of page numbers"""
+        remaining = self.max_reads
+        for chunk in self._chunks():
+            if remaining is not None:
+                if remaining <= 0:
+                    return
+                chunk = chunk[:remaining]
+                remaining -= len(chunk)
+            if len(chunk):
+                yield chunk
+
+    def __iter__(self) -> Iterator[int]:
+        for chunk in self.chunks():
+            yield from chunk.tolist()
+
+    def max_page(self) -> int:
+        """The largest page number read, found with a pass over the stream the first time"""
+        if self._max_page is None:
+            self._max_page = max((int(chunk.max()) for chunk in self.chunks()), default=-1)
+        return self._max_page
+
+    def __len__(self) -> int:
+        return sum(len(chunk) for chunk in self.chunks())
+
+
+class ArrayTraceStream(TraceStream):
+    """Streams a trace that is already in memory, or memory mapped"""
+
+    def __init__(
+        self,
+        page_accesses: Iterable[int],
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        max_reads: int | None = None,
+    ):
+        super().__init__(max_reads)
+        self.page_accesses = np.asarray(page_accesses)
+        self.chunk_size = chunk_size
+
+    def _chunks(self) -> Iterator[np.ndarray]:
+        for start in range(0, len(self.page_accesses), self.chunk_size):
+            yield self.page_accesses[start : start + self.chunk_size]
+
+    def __len__(self) -> int:
+        if self.max_reads is None:
+            return len(self.page_accesses)
+        return min(self.max_reads, len(self.page_accesses))
+
+
+class FileTraceStream(TraceStream):
+    """Streams a trace file.
+
+    Binary traces are memory mapped and read a slice at a time. Text traces with one page per
+    line are parsed a chunk at a time, and may be gzip (.gz) or zstandard (.zst) compressed.
+    JSON traces can not be parsed incrementally and are loaded whole.
+
+    Text traces of buffer tags are interned to dense page ids as they are read. page_index is
+    how they were interned, once the stream has been read, or None for traces of plain page
+    numbers. Traces of different backends of one database can share a page index, so the
+    same page gets the same id in all of them.
+
+    :param page_index: Index to intern buffer tags into, shared with other streams. Binary
+        traces that were interned on their own are remapped into it.
+    :type page_index: PageIdIndex | None
+    """
+
+    def __init__(
+        self,
+        filename: str,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        max_reads: int | None = None,
+        page_index: PageIdIndex | None = None,
+    ):
+        super().__init__(max_reads)
+        self.filename = filename
+        self.chunk_size = chunk_size
+        self.page_index: PageIdIndex | None = None
+        self._shared_page_index = page_index
+
+    def _chunks(self) -> Iterator[np.ndarray]:
+        binary_filename = self.binary_filename()
+        if binary_filename:
+            trace = open_binary_trace(binary_filename)
+            trace_index = trace.page_index
+            remap = trace_index is not None and self._shared_page_index is not None
+            self.page_index = self._shared_page_index if remap else trace_index
+            pages = trace.pages
+            for start in range(0, len(pages), self.chunk_size):
+                chunk = pages[start : start + self.chunk_size]
+                if remap:
+                    chunk = self.page_index.intern(trace_index.tags(chunk))
+                yield chunk
+            return
+
+        if not self.filename.endswith((".gz", ".zst")) and is_json_trace(self.filename):
+            with open(self.filename) as trace_file:
+                pages = json.load(trace_file)
+            yield from ArrayTraceStream(pages, self.chunk_size).chunks()
+            return
+
+        with self._open_text() as trace_file:
+            yield from self._text_chunks(trace_file)
+
+    def timestamps(self) -> "TraceFieldStream":
+        """The timestamps of a text trace whose lines start with one"""
+        return TraceFieldStream(self, "timestamp")
+
+    def writes(self) -> "TraceFieldStream":
+        """Whether each access of a text trace with R and W ops wrote the page, as 1 or 0"""
+        return TraceFieldStream(self, "op")
+
+    def binary_filename(self) -> str | None:
+        """The binary version of the trace, if there is one"""
+        if self.filename.endswith((".gz", ".zst")):
+            return None
+        converted_filename = converted_trace_filename(self.filename)
+        if converted_filename:
+            return converted_filename
+        if is_binary_trace(self.filename):
+            return self.filename
+        return None
+
+    def _open_text(self) -> io.TextIOBase:
+        if self.filename.endswith(".gz"):
+            return gzip.open(self.filename, "rt")
+
+        if self.filename.endswith(".zst"):
+            try:
+                import zstandard
+            except ImportError as e:
+                raise ImportError("Reading .zst traces requires the zstandard package") from e
+
+            compressed_file = open(self.filename, "rb")
+            return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(compressed_file))
+
+        return open(self.filename)
+
+    def _text_chunks(self, trace_file: io.TextIOBase) -> Iterator[np.ndarray]:
+        # Every pass interns afresh, which hands out the same page ids
+        self.page_index = None
+        tagged = prefix = None
+        pending: list[int] = []
+        while lines := trace_file.readlines(_TEXT_CHUNK_BYTES):
+            lines = [line for line in lines if line.strip()]
+            if not lines:
+                continue
+            if prefix is None:
+                prefix = line_prefix(lines[0])
+            lines = strip_prefix(lines, prefix)
+            if tagged is None:
+                tagged = is_tagged_line(lines[0])
+                if not tagged:
+                    self.page_index = None
+                elif self._shared_page_index is not None:
+                    self.page_index = self._shared_page_index
+                else:
+                    self.page_index = PageIdIndex()
+            if tagged:
+                pending.extend(self.page_index.intern(parse_tagged_lines(lines)).tolist())
+            else:
+                pending.extend(int(line) for line in lines)
+            while len(pending) >= self.chunk_size:
+                yield np.array(pending[: self.chunk_size], dtype=np.int64)
+                del pending[: self.chunk_size]
+
+        if pending:
+            yield np.array(pending, dtype=np.int64)
+
+
+class TraceFieldStream(TraceStream):
+    """Streams the timestamp or the op that starts every line of a text trace, one per read.
+    Ops are streamed as 1 for writes and 0 for reads.
+
+    :param trace: The text trace
+    :type trace: FileTraceStream
+    :param field: "timestamp" or "op"
+    :type field: str
+    """
+
+    def __init__(self, trace: FileTraceStream, field: str):
+        if field not in ("timestamp", "op"):
+            raise ValueError(f"Unknown trace field {field}")
+        super().__init__(trace.max_reads)
+        self.trace = trace
+        self.field = field
+
+    def _chunks(self) -> Iterator[np.ndarray]:
+        if not self.trace.filename.endswith((".gz", ".zst")) and is_binary_trace(self.trace.filename):
+            raise ValueError(f"{self.trace.filename} is a binary trace, which has no {self.field}s")
+
+        pending: list[int] = []
+        column = None
+        with self.trace._open_text() as trace_file:
+            while lines := trace_file.readlines(_TEXT_CHUNK_BYTES):
+                lines = [line for line in lines if line.strip()]
+                if not lines:
+                    continue
+                if column is None:
+                    timestamped, has_op = line_prefix(lines[0])
+                    if not (timestamped if self.field == "timestamp" else has_op):
+                        raise ValueError(f"The lines of {self.trace.filename} have no {self.field}")
+                    column = 1 if self.field == "op" and timestamped else 0
+
+                fields = [line.split(maxsplit=column + 1)[column] for line in lines]
+                if self.field == "op":
+                    pending.extend(OPS[op] for op in fields)
+                else:
+                    pending.extend(int(timestamp) for timestamp in fields)
+                while len(pending) >= self.trace.chunk_size:
+                    yield np.array(pending[: self.trace.chunk_size], dtype=np.int64)
+                    del pending[: self.trace.chunk_size]
+
+        if pending:
+            yield np.array(pending, dtype=np.int64)
+
+
+class SyntheticTraceStream(TraceStream):
+    """Streams a synthetic workload, generating each chunk as it is needed.
+
+    Unseeded streams pick a seed when created, so every pass over the stream yields the
+    same workload.
+    """
+
+    def __init__(
+        self,
+        total_page_count: int,
+        total_reads: int,
+        workload: WorkloadType,
+        seed: int | None = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        **workload_parameters,
+    ):
+        if workload not in SYNTHETIC_WORKLOADS:
+            raise ValueError(f"{workload.name} is not a synthetic workload")
+
+        super().__init__()
+        self.total_page_count = total_page_count
+        self.total_reads = total_reads
+        self.workload = workload
+        self.seed = seed if seed is not None else random.getrandbits(64)
+        self.chunk_size = chunk_size
+        self.workload_parameters = workload_parameters
+
+    def _chunks(self) -> Iterator[np.ndarray]:
+        return generate_page_access_chunks(
+            self.total_page_count,
+            self.total_reads,
+            self.workload,
+            self.seed,
+            self.chunk_size,
+            **self.workload_parameters,
+        )
+
+    def __len__(self) -> int:
+        return self.total_reads
+
+
+def workload_trace_stream(
+    workload: WorkloadType,
+    total_page_count: int = 0,
+    total_reads: int = 0,
+    seed: int | None = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> TraceStream:
+    """Streams a workload without materializing it.
+
+    :param workload: The type of page accesses that will occur
+    :type workload: WorkloadType
+    :param total_page_count: The total number of pages a synthetic workload will access.
+    :type total_page_count: int
+    :param total_reads: The number of reads of a synthetic workload. Traces are streamed whole.
+    :type total_reads: int
+    :param seed: Seed for synthetic workloads
+    :type seed: int | None
+    :param chunk_size: Number of page reads held in memory at a time
+    :type chunk_size: int
+    :return: The stream of page reads
+    :rtype: TraceStream
+    """
+    if workload in SYNTHETIC_WORKLOADS:
+        return SyntheticTraceStream(total_page_count, total_reads, workload, seed, chunk_size)
+    return FileTraceStream(TRACE_FILES[workload], chunk_size)